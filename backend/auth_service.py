@@ -0,0 +1,218 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import httpx
+import jwt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
+SUPABASE_JWKS_URL = os.environ.get("SUPABASE_JWKS_URL") or (
+    f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else None
+)
+JWT_AUDIENCE = os.environ.get("SUPABASE_JWT_AUDIENCE", "authenticated")
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.environ.get("TOKEN_CACHE_TTL", "300"))
+JWKS_MIN_REFRESH_SECONDS = 30  # Bound key refetches when tokens carry junk key IDs
+
+SYMMETRIC_ALGORITHMS = ["HS256"]
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256"]
+
+
+class TokenError(Exception):
+    pass
+
+
+def api_key_role(key):
+    """Postgres role a Supabase API key acts as ("anon", "service_role"), None if it can't be told"""
+    if key.startswith("sb_secret_"):
+        return "service_role"
+    if key.startswith("sb_publishable_"):
+        return "anon"
+    try:
+        # Legacy keys are JWTs; only their claims matter here, PostgREST checks the signature
+        return jwt.decode(key, options={"verify_signature": False}).get("role")
+    except jwt.PyJWTError:
+        return None
+
+
+@dataclass
+class AuthenticatedUser:
+    """The verified subject of a Supabase access token."""
+    id: str
+    email: str = None
+    role: str = None
+    claims: dict = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_claims(cls, claims):
+        return cls(id=claims.get("sub"), email=claims.get("email"), role=claims.get("role"), claims=claims)
+
+
+class TokenVerifier:
+    """
+    Verifies Supabase JWTs locally (signature, `exp`, `aud`).
+    HS256 tokens are checked against the project JWT secret and asymmetric
+    tokens against cached JWKS keys. Already-validated tokens are kept in a
+    bounded TTL cache, so a steady client costs one dict lookup per request.
+    The network is only touched when a token names a key we don't know:
+    first the JWKS is refetched, then `remote_verify` (the auth server) is asked.
+    """
+
+    def __init__(self, secret=None, jwks_url=None, audience=JWT_AUDIENCE, cache_size=TOKEN_CACHE_SIZE,
+                 cache_ttl=TOKEN_CACHE_TTL, jwks_fetcher=None, remote_verify=None, leeway=10):
+        self.secret = secret
+        self.jwks_url = jwks_url
+        self.audience = audience
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.leeway = leeway
+        self._jwks_fetcher = jwks_fetcher
+        self._remote_verify = remote_verify
+        self._keys = {}
+        self._jwks_fetched_at = None
+        self._jwks_lock = asyncio.Lock()
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.jwks_fetches = 0
+        self.remote_fallbacks = 0
+        self.rejected = 0
+
+    # --- Signing keys ---
+
+    async def _fetch_jwks(self):
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            res = await client.get(self.jwks_url)
+            res.raise_for_status()
+            return res.json()
+
+    def load_jwks(self, jwks):
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            try:
+                keys[jwk.get("kid")] = jwt.PyJWK(jwk)
+            except Exception as e:
+                print(f"Skipping unusable JWK {jwk.get('kid')}: {e}")
+        self._keys = keys
+
+    async def _refresh_jwks(self):
+        fetcher = self._jwks_fetcher or (self._fetch_jwks if self.jwks_url else None)
+        if fetcher is None:
+            return
+        async with self._jwks_lock:
+            now = time.monotonic()
+            if self._jwks_fetched_at is not None and now - self._jwks_fetched_at < JWKS_MIN_REFRESH_SECONDS:
+                return
+            self._jwks_fetched_at = now
+            self.jwks_fetches += 1
+            try:
+                self.load_jwks(await fetcher())
+            except Exception as e:
+                print(f"JWKS fetch failed: {e}")
+
+    async def _signing_key(self, header):
+        alg = header.get("alg")
+        if alg in SYMMETRIC_ALGORITHMS:
+            return self.secret
+        if alg not in ASYMMETRIC_ALGORITHMS:
+            raise TokenError(f"Unsupported token algorithm: {alg}")
+        kid = header.get("kid")
+        jwk = self._keys.get(kid)
+        if jwk is None:
+            await self._refresh_jwks()
+            jwk = self._keys.get(kid)
+        return jwk.key if jwk else None
+
+    # --- Token cache ---
+
+    def _cache_get(self, token):
+        entry = self._cache.get(token)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if time.time() >= expires_at:
+            del self._cache[token]
+            return None
+        self._cache.move_to_end(token)
+        return user
+
+    def _cache_put(self, token, user, exp):
+        expires_at = time.time() + self.cache_ttl
+        if exp:
+            expires_at = min(expires_at, exp)
+        self._cache[token] = (user, expires_at)
+        self._cache.move_to_end(token)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # --- Verification ---
+
+    async def verify(self, token):
+        user = self._cache_get(token)
+        if user is not None:
+            self.hits += 1
+            return user
+        self.misses += 1
+
+        try:
+            header = jwt.get_unverified_header(token)
+            key = await self._signing_key(header)
+        except TokenError:
+            self.rejected += 1
+            raise
+        except jwt.PyJWTError as e:
+            self.rejected += 1
+            raise TokenError(str(e))
+
+        if key is None:
+            return await self._verify_remote(token)
+
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=[header["alg"]],
+                audience=self.audience,
+                leeway=self.leeway,
+                options={"require": ["exp", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            self.rejected += 1
+            raise TokenError(str(e))
+
+        user = AuthenticatedUser.from_claims(claims)
+        self._cache_put(token, user, claims.get("exp"))
+        return user
+
+    async def _verify_remote(self, token):
+        """Ask the auth server about a token signed with a key we can't resolve locally."""
+        if not self._remote_verify:
+            self.rejected += 1
+            raise TokenError("Unknown signing key")
+        self.remote_fallbacks += 1
+        user = await self._remote_verify(token)
+        if user is None:
+            self.rejected += 1
+            raise TokenError("Invalid or expired token")
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+        self._cache_put(token, user, exp)
+        return user
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "cached_tokens": len(self._cache),
+            "known_keys": len(self._keys),
+            "jwks_fetches": self.jwks_fetches,
+            "remote_fallbacks": self.remote_fallbacks,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,93 @@
+"""
+The /recommend scoring loop from before the catalog snapshot (backend/main.py
+at the baseline commit), copied verbatim: the oracle bench/check_scoring_parity.py
+checks the engines against. Only the row source and the result limit are
+parameters.
+"""
+
+
+def baseline_recommend(all_movies, keywords, target_genre, target_language, limit=10):
+    """(scored_movies, top_movies) as the original handler computed them for one parsed mood"""
+    scored_movies = []
+    non_english_triggers = ["bollywood", "tollywood", "hindi", "telugu", "tamil", "kannada", "malayalam", "korean", "japanese", "spanish", "french"]
+
+    for movie in all_movies:
+        score = 0
+        movie_features = set()
+        if movie['genre']: movie_features.add(movie['genre'].lower())
+        if movie['mood_tags']: 
+            for t in movie['mood_tags']: movie_features.add(t.lower())
+
+        full_text = (f"{movie['title']} {movie['description'] or ''} {movie['genre'] or ''}").lower()
+        title_lower = movie['title'].lower()
+
+        # Improved Scoring Logic
+        for k in keywords:
+            k_lower = k.lower()
+            # Mood tag match (highest priority for vibe)
+            if k_lower in movie_features:
+                score += 7
+            # Title match (important for specific movie requests)
+            elif k_lower in title_lower:
+                score += 5
+            # Description match (contextual relevance)
+            elif k_lower in full_text:
+                score += 2
+
+        # Genre match (strong signal)
+        if target_genre and target_genre.lower() != "general":
+             if target_genre.lower() in (movie['genre'] or '').lower():
+                 score += 10
+             elif (movie['genre'] or '').lower().startswith(target_genre.lower()):
+                 score += 8
+
+        # --- LANGUAGE LOGIC (STRICT) ---
+        movie_langs = movie.get('languages') or []
+        if isinstance(movie_langs, str): movie_langs = [movie_langs] # Fallback
+        movie_langs = [l.lower() for l in movie_langs]
+
+        if target_language and target_language.lower() != "any":
+            req_lang = target_language.lower()
+
+            # Case 1: English Requested
+            if req_lang == "english":
+                # If it has English in its list of languages, it's good
+                if "english" in movie_langs:
+                    score += 5
+                # If it has NO English but has other languages, it's a mismatch
+                elif len(movie_langs) > 0:
+                    score = -100
+                # Safety loop for description triggers
+                elif any(t in full_text for t in non_english_triggers):
+                    score = -100
+
+            # Case 2: Specific Foreign Language Requested (e.g., Telugu)
+            elif req_lang in movie_langs:
+                # NATIVE BOOST: If it's the original language, give massive priority
+                movie_orig = (movie.get('original_language') or '').lower()
+                if req_lang == movie_orig:
+                    score += 50
+                else:
+                    score += 5
+
+            # Case 3: Foreign requested, but movie doesn't support it
+            elif req_lang in non_english_triggers:
+                if len(movie_langs) > 0 and req_lang not in movie_langs:
+                    score = -100 # Strict separation
+
+        if score > 0:
+            scored_movies.append((score, movie))
+
+    # Sort by score descending
+    scored_movies.sort(key=lambda x: x[0], reverse=True)
+
+    # Dedup and Limit
+    seen_titles = set()
+    top_movies = []
+    for score, movie in scored_movies:
+        if movie['title'] not in seen_titles:
+            top_movies.append(movie)
+            seen_titles.add(movie['title'])
+        if len(top_movies) >= limit: break
+
+    return scored_movies, top_movies
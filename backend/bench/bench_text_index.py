@@ -0,0 +1,117 @@
+"""
+Text matching benchmark: the original per-movie substring loop, the
+vectorized substring engine and the BM25 index, on a synthetic catalog.
+Also checks that an incrementally updated BM25 index scores exactly like
+one rebuilt from scratch.
+
+    cd backend
+    python bench/bench_text_index.py --movies 100000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from bench.catalog_gen import CatalogGenerator
+from bench.baseline import baseline_recommend
+from bench.fakes import fake_intent
+from catalog_service import CatalogEntry
+from scoring import ScoringEngine
+from text_index import BM25Index
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def ms(samples):
+    ordered = sorted(samples)
+    return (f"p50 {statistics.median(ordered) * 1000:8.2f} ms  "
+            f"p95 {ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000:8.2f} ms")
+
+
+def check_incremental(movies, rng, changed, appended):
+    """Scores from with_changes() must equal a full rebuild over the same rows."""
+    generator = CatalogGenerator(rng.randint(0, 10 ** 6))
+    updated = list(movies)
+    changes = []
+    for pos in rng.sample(range(len(movies)), changed):
+        row = {**generator.movie(pos), "id": movies[pos]["id"]}
+        changes.append((pos, movies[pos], row))
+        updated[pos] = row
+    for i in range(appended):
+        row = {**generator.movie(len(updated)), "id": len(movies) + i + 1}
+        changes.append((len(updated), None, row))
+        updated.append(row)
+
+    base = BM25Index.build(movies)
+    incremental, update_time = timed(base.with_changes, changes, len(updated))
+    rebuilt, rebuild_time = timed(BM25Index.build, updated)
+
+    probe_terms = list(rebuilt.postings)[:300] + [t for _, _, row in changes for t in BM25Index.terms(row["title"])]
+    for term in probe_terms:
+        a_rows, a_scores = incremental.term_scores(term)
+        b_rows, b_scores = rebuilt.term_scores(term)
+        assert np.array_equal(a_rows, b_rows) and np.allclose(a_scores, b_scores), term
+        assert np.array_equal(incremental.title_hits([term]), rebuilt.title_hits([term])), term
+    return update_time, rebuild_time, len(probe_terms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--movies", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--loop-queries", type=int, default=10, help="The original loop is slow; time fewer queries")
+    parser.add_argument("--changed", type=int, default=100)
+    parser.add_argument("--appended", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    generator = CatalogGenerator(args.seed)
+    movies = list(generator.movies(args.movies))
+    intents = [fake_intent(generator.mood()) for _ in range(args.queries)]
+    queries = [(i["keywords"], i["target_genre"], i["target_language"]) for i in intents]
+
+    print(f"Catalog: {args.movies} movies, {args.queries} moods")
+    entries, entries_time = timed(lambda: [CatalogEntry(m) for m in movies])
+    substring_engine, substring_build = timed(ScoringEngine, entries)
+    index, index_build = timed(BM25Index.build, movies)
+    bm25_engine, bm25_engine_build = timed(ScoringEngine, entries, index)
+    print(f"\nBuild")
+    print(f"  catalog entries            {entries_time:8.2f} s")
+    print(f"  substring engine           {substring_build:8.2f} s")
+    print(f"  BM25 index                 {index_build:8.2f} s  ({len(index.postings)} terms)")
+    print(f"  BM25 engine (given index)  {bm25_engine_build:8.2f} s")
+
+    loop_times = [timed(baseline_recommend, movies, *q)[1] for q in queries[:args.loop_queries]]
+    substring_times = [timed(substring_engine.rank, *q, limit=10)[1] for q in queries]
+    bm25_times = [timed(bm25_engine.rank, *q, limit=10)[1] for q in queries]
+    search_times = [timed(index.search, " ".join(q[0]), 10)[1] for q in queries]
+    print(f"\nQuery (rank top 10)")
+    print(f"  original substring loop    {ms(loop_times)}  ({len(loop_times)} moods)")
+    print(f"  vectorized substring       {ms(substring_times)}")
+    print(f"  vectorized BM25            {ms(bm25_times)}")
+    print(f"  BM25Index.search top 10    {ms(search_times)}")
+
+    update_time, rebuild_time, probed = check_incremental(movies, rng, args.changed, args.appended)
+    print(f"\nIncremental update ({args.changed} changed + {args.appended} new movies)")
+    print(f"  with_changes               {update_time:8.3f} s")
+    print(f"  full rebuild               {rebuild_time:8.3f} s")
+    print(f"  {probed} terms checked against the rebuild: identical")
+
+    substring_war = int(np.count_nonzero(substring_engine.score(["war"], None, None) > 0))
+    bm25_war = int(np.count_nonzero(bm25_engine.score(["war"], None, None) > 0))
+    print(f"\nMovies matching 'war': substring {substring_war} (includes 'reward'), BM25 {bm25_war}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Synthetic movie catalog generator for benchmarks.
+
+Produces rows shaped like the movies table, with skewed (Zipf-like) genre,
+mood tag and language distributions so index and cache behaviour look like
+a real catalog rather than uniform noise.
+
+    cd backend
+    python bench/catalog_gen.py --movies 100000 --output /tmp/catalog.jsonl
+
+The JSONL output can also be loaded with `python seed.py --from-file`.
+"""
+import sys
+import json
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+# (genre, weight)
+GENRES = [
+    ("Drama", 22), ("Comedy", 16), ("Action", 14), ("Thriller", 10), ("Romance", 8), ("Horror", 7),
+    ("Sci-Fi", 5), ("Animation", 4), ("Fantasy", 4), ("Crime", 4), ("Documentary", 2), ("Biography", 2),
+    ("Musical", 1), ("Western", 1),
+]
+# (original language, weight, languages it is commonly dubbed/subtitled into)
+LANGUAGES = [
+    ("English", 45, ["Spanish", "French", "Hindi"]),
+    ("Hindi", 12, ["English", "Tamil", "Telugu"]),
+    ("Telugu", 6, ["Hindi", "Tamil", "Malayalam", "Kannada"]),
+    ("Tamil", 5, ["Telugu", "Hindi", "Malayalam"]),
+    ("Korean", 5, ["English"]),
+    ("Japanese", 5, ["English"]),
+    ("Spanish", 5, ["English"]),
+    ("French", 4, ["English"]),
+    ("Malayalam", 3, ["Tamil", "Hindi"]),
+    ("Kannada", 2, ["Telugu", "Hindi"]),
+    ("Italian", 2, ["English"]),
+    ("German", 2, ["English"]),
+    ("Cantonese", 2, ["Mandarin", "English"]),
+    ("Danish", 1, ["English"]),
+    ("Swedish", 1, ["English"]),
+]
+MOOD_TAGS = [
+    "emotional", "intense", "funny", "dark", "inspiring", "romantic", "epic", "feel-good", "suspense",
+    "sad", "classic", "violent", "whimsical", "mystical", "family", "action", "twist", "gritty", "quirky",
+    "beautiful", "scary", "hopeful", "nostalgic", "thought-provoking", "cozy", "revenge", "sports",
+    "musical", "historic", "supernatural", "zombies", "cyberpunk", "heist", "friendship", "coming-of-age",
+    "slow-burn", "satire", "survival", "psychological", "mind-bending", "wholesome", "bittersweet",
+]
+TITLE_WORDS = [
+    "night", "city", "love", "last", "river", "shadow", "king", "dream", "war", "heart", "storm", "empire",
+    "return", "road", "secret", "fire", "moon", "silent", "golden", "broken", "wild", "lost", "house",
+    "summer", "ghost", "blood", "star", "garden", "winter", "edge", "echo", "paper", "glass", "iron",
+]
+DESCRIPTION_WORDS = TITLE_WORDS + [
+    "a", "the", "of", "and", "in", "to", "young", "family", "friends", "village", "detective", "team",
+    "journey", "mystery", "past", "future", "revenge", "town", "reward", "struggle", "finds", "must",
+    "discovers", "fight", "survive", "escape", "power", "truth", "world", "life", "story", "unlikely",
+    "forbidden", "legendary", "hidden", "dangerous", "cricket", "wrestler", "zombie", "robot", "heist",
+    "bollywood", "tollywood", "korean", "french", "spanish",
+]
+
+
+def _zipf_weights(n, s=1.1):
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+class CatalogGenerator:
+    def __init__(self, seed=42):
+        self.rng = random.Random(seed)
+        self.genres = [g for g, _ in GENRES]
+        self.genre_weights = [w for _, w in GENRES]
+        self.languages = LANGUAGES
+        self.language_weights = [w for _, w, _ in LANGUAGES]
+        self.tag_weights = _zipf_weights(len(MOOD_TAGS))
+        self.word_weights = _zipf_weights(len(DESCRIPTION_WORDS), 0.9)
+        self.base_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def movie(self, i):
+        rng = self.rng
+        original, _, dubs = rng.choices(self.languages, weights=self.language_weights)[0]
+        languages = [original] + [l for l in dubs if rng.random() < 0.5]
+        if rng.random() < 0.03:
+            languages = []  # Some rows have no language data at all
+        tags = set(rng.choices(MOOD_TAGS, weights=self.tag_weights, k=rng.randint(2, 5)))
+        title_len = rng.choices([1, 2, 3, 4], weights=[2, 5, 3, 1])[0]
+        title = " ".join(rng.choice(TITLE_WORDS) for _ in range(title_len)).title()
+        if rng.random() < 0.3:
+            title = f"{title} {i}"  # Keep most titles unique, allow some collisions
+        description = " ".join(rng.choices(DESCRIPTION_WORDS, weights=self.word_weights, k=rng.randint(12, 35)))
+        return {
+            "id": i + 1,
+            "title": title,
+            "genre": rng.choices(self.genres, weights=self.genre_weights)[0],
+            "languages": languages,
+            "original_language": original,
+            "mood_tags": sorted(tags),
+            "poster_url": f"https://placehold.co/600x900/1e293b/ffffff?text=Movie+{i + 1}",
+            "description": description.capitalize() + ".",
+            "updated_at": (self.base_time + timedelta(seconds=i)).isoformat(),
+        }
+
+    def movies(self, count):
+        for i in range(count):
+            yield self.movie(i)
+
+    def history(self, movies, user_ids, ratings_per_user=40, watchlist_per_user=10):
+        """
+        (user_movie_ratings rows, user_watchlist rows). Each user has a favourite
+        genre they rate 4-5 stars and watchlist; everything else gets 1-3 stars.
+        """
+        rng = self.rng
+        ratings, watchlist = [], []
+        for n, user_id in enumerate(user_ids):
+            favourite = rng.choices(self.genres, weights=self.genre_weights)[0]
+            liked = [m for m in movies if m["genre"] == favourite] or movies
+            picked = rng.sample(movies, min(ratings_per_user // 2, len(movies)))
+            picked += rng.sample(liked, min(ratings_per_user - len(picked), len(liked)))
+            seen = set()
+            for i, movie in enumerate(picked):
+                if movie["id"] in seen:
+                    continue
+                seen.add(movie["id"])
+                stars = rng.randint(4, 5) if movie["genre"] == favourite else rng.randint(1, 3)
+                stamp = (self.base_time + timedelta(days=1, seconds=n * 1000 + i)).isoformat()
+                ratings.append({"user_id": user_id, "movie_id": movie["id"], "rating": stars,
+                                "watched_at": stamp, "updated_at": stamp})
+            for i, movie in enumerate(rng.sample(liked, min(watchlist_per_user, len(liked)))):
+                if movie["id"] not in seen:
+                    stamp = (self.base_time + timedelta(days=2, seconds=n * 1000 + i)).isoformat()
+                    watchlist.append({"user_id": user_id, "movie_id": movie["id"], "added_at": stamp})
+        return ratings, watchlist
+
+    def mood(self):
+        """A mood sentence in the style users type."""
+        rng = self.rng
+        parts = rng.sample(MOOD_TAGS[:20], rng.randint(1, 3))
+        if rng.random() < 0.5:
+            parts.append(rng.choices(self.genres, weights=self.genre_weights)[0].lower())
+        if rng.random() < 0.3:
+            parts.append(rng.choices([l for l, _, _ in self.languages], weights=self.language_weights)[0])
+        return f"something {' '.join(parts)} tonight"
+
+
+def generate(count, seed=42):
+    return list(CatalogGenerator(seed).movies(count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic movie catalog as JSONL.")
+    parser.add_argument("--movies", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="File to write (default: stdout)")
+    args = parser.parse_args()
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for movie in CatalogGenerator(args.seed).movies(args.movies):
+            out.write(json.dumps(movie) + "\n")
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Checks the shared catalog store (CATALOG_STORE_PATH):
+
+- a MappedSnapshot read from the store file ranks exactly like the
+  in-memory CatalogSnapshot it was written from (BM25 and substring
+  matching, with and without a user profile),
+- memory: worker processes that map the file share one copy, compared with
+  workers that each hold the catalog as Python rows (Pss from smaps_rollup),
+- a loader and a follower CatalogService against the fake PostgREST: the
+  follower maps every version the loader publishes, including deltas, gets
+  watchmode_id write-backs without a new version, and takes over loading
+  when the loader stops.
+
+    cd backend
+    python bench/check_catalog_store.py --movies 50000 --workers 4
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supabase import create_client
+
+from bench.catalog_gen import CatalogGenerator
+from bench.fakes import FakeServer, Upstream, supabase_app, fake_intent
+from catalog_service import CatalogSnapshot, CatalogService, MappedSnapshot
+from catalog_store import ColumnFile, write_columns
+from profile_service import UserProfile, PROFILE_WEIGHT
+
+
+def random_profile(rng, snapshot):
+    genres = {g: rng.uniform(-1, 1) for g in rng.sample(snapshot.engine.genre_vocab, 3)}
+    tags = {t: rng.uniform(-1, 1) for t in rng.sample(snapshot.engine.tag_vocab, 4)}
+    languages = {l: rng.uniform(-1, 1) for l in rng.sample(snapshot.engine.language_vocab, 2)}
+    watched = {snapshot.movies[rng.randrange(len(snapshot))]["id"] for _ in range(30)}
+    return UserProfile(genres, tags, languages, watched)
+
+
+def check_parity(movies, generator, queries, path):
+    rng = random.Random(7)
+    intents = [fake_intent(generator.mood()) for _ in range(queries)]
+    for text_match in ("bm25", "substring"):
+        memory = CatalogSnapshot(movies, version=3, text_match=text_match)
+        started = time.perf_counter()
+        columns, meta = memory.to_columns()
+        size = write_columns(path, columns, meta)
+        write_time = time.perf_counter() - started
+        started = time.perf_counter()
+        mapped = MappedSnapshot(ColumnFile(path))
+        map_time = time.perf_counter() - started
+
+        assert mapped.database_info() == memory.database_info()
+        assert len(mapped) == len(memory) and mapped.version == memory.version
+        for movie in rng.sample(movies, 50):
+            assert mapped.movie(movie["id"]) == memory.movie(movie["id"])
+        assert mapped.movie(-5) is None
+
+        timings = {"memory": [], "mapped": []}
+        for intent in intents:
+            query = (intent["keywords"], intent["target_genre"], intent["target_language"])
+            profile = random_profile(rng, memory) if rng.random() < 0.5 else None
+            results = []
+            for name, snapshot in (("memory", memory), ("mapped", mapped)):
+                started = time.perf_counter()
+                results.append(snapshot.engine.rank(*query, limit=10, profile=profile, profile_weight=PROFILE_WEIGHT))
+                timings[name].append(time.perf_counter() - started)
+            assert results[0] == results[1], (query, results)
+        print(f"{text_match}: {len(intents)} rankings identical; store {size / 1e6:.1f} MB written in "
+              f"{write_time:.2f} s, mapped in {map_time * 1000:.1f} ms; rank p50 memory "
+              f"{statistics.median(timings['memory']) * 1000:.2f} ms, mapped {statistics.median(timings['mapped']) * 1000:.2f} ms")
+
+
+def worker(args):
+    """One simulated uvicorn worker: load the catalog one way, rank a few moods, report memory."""
+    generator = CatalogGenerator(args.seed)
+    if args.worker == "mapped":
+        snapshot = MappedSnapshot(ColumnFile(args.store))
+    elif args.worker == "memory":
+        snapshot = CatalogSnapshot(list(generator.movies(args.movies)))
+    else:
+        snapshot = None
+    if snapshot is not None:
+        for _ in range(200):
+            intent = fake_intent(generator.mood())
+            snapshot.engine.rank(intent["keywords"], intent["target_genre"], intent["target_language"], limit=10)
+    with open("/proc/self/smaps_rollup") as f:
+        fields = dict(line.split(":", 1) for line in f if ":" in line and not line.startswith(("0", "7", "f")))
+    print(int(fields["Pss"].split()[0]), int(fields["Rss"].split()[0]))
+
+
+def check_memory(args, path):
+    results = {}
+    for mode in ("none", "memory", "mapped"):
+        procs = [subprocess.Popen([sys.executable, __file__, "--worker", mode, "--store", path, "--movies", str(args.movies),
+                                   "--seed", str(args.seed)], stdout=subprocess.PIPE, text=True)
+                 for _ in range(args.workers)]
+        # Report once all of them hold the catalog, so shared pages are split between them
+        outputs = [p.communicate()[0].split() for p in procs]
+        results[mode] = [(int(pss), int(rss)) for pss, rss in outputs]
+    base = statistics.median(pss for pss, _ in results["none"])
+    for mode in ("memory", "mapped"):
+        catalog = sum(pss - base for pss, _ in results[mode]) / 1024
+        print(f"{args.workers} workers, {mode}: catalog adds {catalog:.0f} MB Pss in total "
+              f"({catalog / args.workers:.0f} MB per worker)")
+
+
+def check_memory_available():
+    return os.path.exists("/proc/self/smaps_rollup")
+
+
+async def check_service(movies, path):
+    server = FakeServer(supabase_app(movies, Upstream(0.002))).start()
+    try:
+        loader = CatalogService(create_client(server.url, "bench"), store_path=path, store_poll_seconds=0.05)
+        follower = CatalogService(create_client(server.url, "bench"), store_path=path, store_poll_seconds=0.05)
+        await loader.start()
+        await follower.start()
+        assert loader.stats()["role"] == "loader" and follower.stats()["role"] == "follower"
+        assert isinstance(follower.snapshot, MappedSnapshot)
+        assert follower.snapshot.version == loader.snapshot.version
+        first = loader.snapshot.version
+
+        # Delta refresh on the loader reaches the follower through the file
+        movie = movies[len(movies) // 2]
+        movie["description"] = "A quokkamancer haunts the lighthouse."
+        movie["updated_at"] = "2999-01-01T00:00:00"
+        await loader.refresh()
+        await follower.refresh()
+        assert follower.snapshot.version == loader.snapshot.version == first + 1
+        second = loader.snapshot
+
+        # A watchmode_id write-back (the trigger moves updated_at too) is not a new version,
+        # but the loader's rows and, through a rewritten store, the follower's pick it up
+        movie["watchmode_id"] = "12345"
+        movie["updated_at"] = "2999-01-02T00:00:00"
+        await loader.refresh()
+        await follower.refresh()
+        assert loader.snapshot is second and loader.stats()["store_writes"] == 3
+        assert loader.snapshot.movie(movie["id"])["watchmode_id"] == "12345"
+        assert follower.snapshot.version == second.version
+        picked, _ = follower.snapshot.engine.rank(["quokkamancer"], None, None, limit=5)
+        assert [(m["id"], m["watchmode_id"]) for _, m in picked] == [(movie["id"], "12345")], picked
+
+        # A full reload that only differs in bookkeeping columns patches them in as well
+        movie["watchmode_id"] = "67890"
+        movie["updated_at"] = "2999-01-03T00:00:00"
+        await loader.refresh(full=True)
+        assert loader.snapshot is second and loader.snapshot.movie(movie["id"])["watchmode_id"] == "67890"
+
+        # Loader goes away: the follower's next refresh takes the lock and reloads from the table,
+        # which holds nothing new, so the version stays
+        await loader.stop()
+        await follower.refresh()
+        assert follower.stats()["role"] == "loader" and not isinstance(follower.snapshot, MappedSnapshot)
+        assert follower.snapshot.version == first + 1
+        await follower.stop()
+        print(f"Service: follower mapped versions {first}..{first + 1} from the loader (delta included), "
+              f"bookkeeping-only writes kept the version and reached both, took over loading at version {first + 1}")
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--movies", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--worker", choices=["none", "memory", "mapped"], help=argparse.SUPPRESS)
+    parser.add_argument("--store", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return worker(args)
+
+    generator = CatalogGenerator(args.seed)
+    movies = list(generator.movies(args.movies))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalog.bin")
+        check_parity(movies, generator, args.queries, path)
+        if check_memory_available():
+            write_columns(path, *CatalogSnapshot(movies).to_columns())
+            check_memory(args, path)
+        asyncio.run(check_service(movies[:2000], os.path.join(tmp, "service.bin")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Shows that /recommend requests overlap instead of queueing behind slow
+upstreams. Groq and Supabase are replaced by local stand-ins that sleep
+for a fixed latency (the Supabase one blocks its thread like the real SDK).
+
+    cd backend
+    python bench/check_concurrency.py --requests 8 --latency 0.5
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import jwt
+
+import main
+from auth_service import TokenVerifier, AuthenticatedUser
+from catalog_service import CatalogService
+from intent_service import IntentParser, IntentCache
+
+
+class SlowGroq:
+    """AsyncGroq look-alike whose completions take `latency` seconds."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        content = json.dumps({"target_genre": "Drama", "keywords": ["sad"], "target_language": "Any"})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class SlowSupabase:
+    """Blocking supabase look-alike: every execute() sleeps in the calling thread."""
+
+    def __init__(self, latency, movies):
+        self.latency = latency
+        self.movies = movies
+        self.auth = SimpleNamespace(get_user=self.get_user)
+
+    def get_user(self, token):
+        time.sleep(self.latency)
+        return SimpleNamespace(user=SimpleNamespace(id=token, email=None, role="authenticated"))
+
+    def table(self, name):
+        return self
+
+    def select(self, *args):
+        return self
+
+    def order(self, *args):
+        return self
+
+    def range(self, start, end):
+        return self
+
+    def execute(self):
+        time.sleep(self.latency)
+        return SimpleNamespace(data=self.movies)
+
+
+async def run(args):
+    movies = [{"id": i, "title": f"Movie {i}", "genre": "Drama", "mood_tags": ["sad"], "languages": ["English"],
+               "original_language": "English", "description": "A sad story"} for i in range(50)]
+    supabase = SlowSupabase(args.latency, movies)
+
+    async def remote_verify(token):
+        res = await main.db_executor.run(supabase.get_user, token)
+        return AuthenticatedUser(id=res.user.id, role=res.user.role)
+
+    main.supabase = supabase
+    main.catalog = CatalogService(supabase)
+    main.intent_parser = IntentParser(SlowGroq(args.latency), IntentCache(path=None))
+    main.token_verifier = TokenVerifier(remote_verify=remote_verify)
+
+    # Tokens signed with a key the verifier doesn't know go to the (blocking) auth server
+    tokens = [jwt.encode({"sub": f"user-{i}", "exp": int(time.time()) + 60}, "x" * 32) for i in range(args.requests)]
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/database-info", headers={"Authorization": f"Bearer {tokens[0]}"})  # Warm the catalog
+
+        async def one(i):
+            started = time.perf_counter()
+            res = await client.post(
+                "/recommend",
+                json={"mood": f"sad mood number {i}"},
+                headers={"Authorization": f"Bearer {tokens[i]}"},
+            )
+            res.raise_for_status()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*[one(i) for i in range(args.requests)])
+        wall = time.perf_counter() - started
+
+    serial = args.requests * 2 * args.latency  # auth round trip + LLM call per request
+    print(f"{args.requests} concurrent requests, {args.latency:.2f}s per upstream call")
+    print(f"  wall time {wall:.2f}s (fully serialized would be ~{serial:.2f}s)")
+    print(f"  slowest request {max(latencies):.2f}s")
+    print(f"  supabase executor {main.db_executor.stats()}")
+    overlapped = wall < serial / 2
+    print("  requests overlapped" if overlapped else "  requests were serialized")
+    return overlapped
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,129 @@
+"""
+Checks and times user preference profiles on a synthetic catalog and history:
+
+- the vectorized ScoringEngine.personalize scores every movie exactly like
+  UserProfile.rerank (the rpc-mode path) does,
+- personalized rankings never contain titles the user has rated,
+- an incremental ProfileService refresh builds the same profiles as a full
+  reload (run against the fake PostgREST from bench/fakes.py),
+- and what personalization adds to one ranking.
+
+    cd backend
+    python bench/check_profiles.py --movies 20000 --users 300
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from supabase import create_client
+
+from bench.catalog_gen import CatalogGenerator
+from bench.fakes import FakeServer, Upstream, supabase_app, fake_intent
+from catalog_service import CatalogSnapshot
+from profile_service import ProfileService, UserProfile, PROFILE_WEIGHT
+
+
+def check_parity(snapshot, profiles, intents):
+    engine = snapshot.engine
+    checked = 0
+    for profile, intent in zip(profiles, intents):
+        query = (intent["keywords"], intent["target_genre"], intent["target_language"])
+        base = engine.score(*query)
+        blended = engine.personalize(base, profile, PROFILE_WEIGHT)
+        scored = [(base[pos].item(), snapshot.movies[pos]) for pos in np.flatnonzero(base > 0)]
+        expected = {movie["id"]: score for score, movie in profile.rerank(scored, len(scored))}
+        got = {snapshot.movies[pos]["id"]: blended[pos].item() for pos in np.flatnonzero(blended > 0)}
+        assert expected.keys() == got.keys(), "different movies survive personalization"
+        for movie_id, score in expected.items():
+            assert abs(score - got[movie_id]) <= 1e-4 * max(1.0, abs(score)), (movie_id, score, got[movie_id])
+
+        picked, _ = engine.rank(*query, limit=10, profile=profile, profile_weight=PROFILE_WEIGHT)
+        assert not any(movie["id"] in profile.watched for _, movie in picked), "watched title recommended"
+        checked += 1
+    return checked
+
+
+def check_incremental(movies, ratings, watchlist):
+    """Full load of the first half of the history, delta of the rest == full load of everything"""
+    half_ratings = [r for r in ratings if r["updated_at"] <= ratings[len(ratings) // 2]["updated_at"]]
+    half_watchlist = watchlist[:len(watchlist) // 2]
+    before = FakeServer(supabase_app(movies, Upstream(), half_ratings, half_watchlist)).start()
+    after = FakeServer(supabase_app(movies, Upstream(), ratings, watchlist)).start()
+    try:
+        incremental = ProfileService(create_client(before.url, "bench"))
+        incremental._sync(full=True)
+        incremental.client = create_client(after.url, "bench")
+        started = time.perf_counter()
+        rows, users = incremental._sync(full=False)
+        delta_time = time.perf_counter() - started
+
+        full = ProfileService(create_client(after.url, "bench"))
+        started = time.perf_counter()
+        full._sync(full=True)
+        full_time = time.perf_counter() - started
+    finally:
+        before.stop()
+        after.stop()
+
+    assert incremental.profiles.keys() == full.profiles.keys()
+    for user_id, profile in full.profiles.items():
+        assert profile.to_dict() == incremental.profiles[user_id].to_dict(), user_id
+        assert profile.watched == incremental.profiles[user_id].watched, user_id
+    return rows, users, delta_time, full_time, len(full.profiles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--movies", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    generator = CatalogGenerator(args.seed)
+    movies = list(generator.movies(args.movies))
+    users = [f"user-{i}" for i in range(args.users)]
+    ratings, watchlist = generator.history(movies, users)
+    snapshot = CatalogSnapshot(movies, text_match="substring")
+    by_id = {m["id"]: m for m in movies}
+
+    user_ratings, user_watchlist = {}, {}
+    for row in ratings:
+        user_ratings.setdefault(row["user_id"], {})[row["movie_id"]] = row["rating"]
+    for row in watchlist:
+        user_watchlist.setdefault(row["user_id"], set()).add(row["movie_id"])
+    profiles = [UserProfile.build(user_ratings.get(u, {}), user_watchlist.get(u, set()), by_id) for u in users]
+
+    rng = random.Random(args.seed)
+    sample = [rng.choice(profiles) for _ in range(args.queries)]
+    intents = [fake_intent(generator.mood()) for _ in range(args.queries)]
+    print(f"Catalog: {args.movies} movies, {args.users} users, {len(ratings)} ratings, {len(watchlist)} watchlist rows")
+
+    checked = check_parity(snapshot, sample, intents)
+    print(f"Parity: {checked} personalized rankings match UserProfile.rerank, none contain watched titles")
+
+    plain, personal = [], []
+    for profile, intent in zip(sample, intents):
+        query = (intent["keywords"], intent["target_genre"], intent["target_language"])
+        started = time.perf_counter()
+        snapshot.engine.rank(*query, limit=10)
+        plain.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        snapshot.engine.rank(*query, limit=10, profile=profile, profile_weight=PROFILE_WEIGHT)
+        personal.append(time.perf_counter() - started)
+    print(f"Rank top 10: plain p50 {statistics.median(plain) * 1000:.2f} ms, "
+          f"personalized p50 {statistics.median(personal) * 1000:.2f} ms")
+
+    rows, users_rebuilt, delta_time, full_time, total = check_incremental(movies, ratings, watchlist)
+    print(f"Incremental refresh: {rows} new rows rebuilt {users_rebuilt} users in {delta_time:.2f} s "
+          f"(full reload of {total} users {full_time:.2f} s); profiles identical")
+
+
+if __name__ == "__main__":
+    main()
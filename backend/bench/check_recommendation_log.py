@@ -0,0 +1,116 @@
+"""
+Exercises RecommendationLog against the fake PostgREST from bench/fakes.py:
+
+- cost of `record` on the request path,
+- every recorded row is inserted, in batches, and `stop` drains the queue,
+- during an outage rows are spilled to the file and replayed on the next start,
+- a full queue spills (or drops, without a spill file) and every row is accounted for.
+
+    cd backend
+    python bench/check_recommendation_log.py
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supabase import create_client
+
+from bench.catalog_gen import CatalogGenerator
+from bench.fakes import FakeServer, Upstream, supabase_app
+from executor import BlockingExecutor
+from recommendation_log import RecommendationLog
+
+INTENT = {"keywords": ["dark", "epic"], "target_genre": "Horror", "target_language": "Any", "personalized": True}
+
+
+def served(movies, i):
+    return [(30.0 - rank, movies[(i * 6 + rank) % len(movies)]) for rank in range(6)]
+
+
+async def record_requests(log, movies, requests, per_tick=50):
+    timings = []
+    for i in range(requests):
+        started = time.perf_counter()
+        log.record(f"user-{i % 20}", served(movies, i), INTENT)
+        timings.append(time.perf_counter() - started)
+        if i % per_tick == 0:
+            await asyncio.sleep(0)  # Let the flusher run, as a server would between requests
+    return timings
+
+
+async def main_async(args):
+    movies = list(CatalogGenerator(args.seed).movies(1000))
+    upstream = Upstream(latency=0.01)
+    app = supabase_app(movies, upstream)
+    server = FakeServer(app).start()
+    client = create_client(server.url, "bench")
+    executor = BlockingExecutor(4, "bench-log")
+    spill_dir = tempfile.mkdtemp()
+    try:
+        # Steady state: everything lands, in batches
+        log = RecommendationLog(client, batch_size=args.batch_size, flush_seconds=0.05, executor=executor)
+        await log.start()
+        timings = await record_requests(log, movies, args.requests)
+        calls_before = upstream.calls
+        await log.stop()
+        rows = app.state.recommendation_rows
+        assert len(rows) == args.requests * 6, (len(rows), log.stats())
+        assert rows[0]["reason"].startswith('{"rank":1,')
+        print(f"Steady: {args.requests} requests -> {len(rows)} rows in {log.written // args.batch_size}+ batches "
+              f"({calls_before} inserts before stop); record() p50 {statistics.median(timings) * 1e6:.1f} us "
+              f"p99 {sorted(timings)[int(len(timings) * 0.99)] * 1e6:.1f} us")
+
+        # Outage: inserts fail, rows spill; the next start replays them
+        rows.clear()
+        spill_path = os.path.join(spill_dir, "recommendations.jsonl")
+        upstream.error_rate = 1.0
+        log = RecommendationLog(client, batch_size=args.batch_size, flush_seconds=0.05, spill_path=spill_path,
+                                executor=executor)
+        await log.start()
+        await record_requests(log, movies, 200)
+        await log.stop()
+        assert not rows and log.spilled == 200 * 6, log.stats()
+        upstream.error_rate = 0.0
+        log = RecommendationLog(client, batch_size=args.batch_size, flush_seconds=0.05, spill_path=spill_path,
+                                executor=executor)
+        await log.start()
+        await asyncio.sleep(0.5)
+        await log.stop()
+        assert len(rows) == 200 * 6 and log.replayed == len(rows), log.stats()
+        assert not os.path.exists(spill_path)
+        print(f"Outage: {200 * 6} rows spilled while inserts failed, all replayed on restart")
+
+        # Full queue with the flusher not running: overflow spills, or is dropped without a file
+        for path in (spill_path, None):
+            log = RecommendationLog(client, batch_size=args.batch_size, max_queue=600, spill_path=path, executor=executor)
+            await record_requests(log, movies, 500)
+            stats = log.stats()
+            assert stats["queued"] == 600 and stats["enqueued"] == 600, stats
+            await log.flush()
+            stats = log.stats()
+            assert stats["written"] + stats["spilled"] + stats["dropped"] == 500 * 6, stats
+            print(f"Full queue ({'spill file' if path else 'no spill file'}): "
+                  f"written {stats['written']}, spilled {stats['spilled']}, dropped {stats['dropped']}")
+            if path:
+                os.remove(path)
+    finally:
+        executor.shutdown()
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Runs the real app against the fakes from bench/fakes.py and degrades them
+at runtime to check the request deadlines, circuit breakers and admission
+control:
+
+- with Groq and Watchmode hung, /recommend still answers 200 within the
+  deadline (on-box intent, no streaming info) and both breakers open,
+- once they open, requests skip the dead upstreams instead of waiting,
+- after the reset interval a healthy upstream closes its breaker again,
+- past MAX_INFLIGHT_REQUESTS concurrent requests the rest get a fast 503,
+- /recommend/batch enriches for as long as its own deadline allows, not the
+  per-request streaming cap, and flags the movies it had to cut off.
+
+    cd backend
+    python bench/check_resilience.py
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from bench.catalog_gen import CatalogGenerator
+from bench.fakes import FakeServer, Upstream, supabase_app, groq_app, watchmode_app
+from bench.run import free_port, mint_token, start_app, wait_ready
+
+HUNG = 60.0  # Upstream latency that stands in for a call that never returns
+
+
+def novel_mood(tag, i):
+    # Mostly words the on-box parser doesn't know, so every mood needs Groq; "dark" still matches titles
+    return f"zorbly {tag} quandle {i} frimp dark"
+
+
+async def fire(client, moods, concurrency=None):
+    semaphore = asyncio.Semaphore(concurrency or len(moods))
+
+    async def one(mood):
+        async with semaphore:
+            started = time.perf_counter()
+            res = await client.post("/recommend", json={"mood": mood})
+            return res, time.perf_counter() - started
+    return await asyncio.gather(*[one(m) for m in moods])
+
+
+async def post_batch(client, moods):
+    started = time.perf_counter()
+    res = await client.post("/recommend/batch", json={"moods": moods})
+    res.raise_for_status()
+    movies = [m for result in res.json()["results"] for m in result.get("movies", [])]
+    return movies, time.perf_counter() - started
+
+
+async def breakers(client):
+    return (await client.get("/stats")).json()["breakers"]
+
+
+async def main_async(args):
+    generator = CatalogGenerator(args.seed)
+    movies = list(generator.movies(args.movies))
+    upstreams = {"supabase": Upstream(0.01), "groq": Upstream(0.05), "watchmode": Upstream(0.02)}
+    fakes = {
+        "supabase": FakeServer(supabase_app(movies, upstreams["supabase"])).start(),
+        "groq": FakeServer(groq_app(upstreams["groq"])).start(),
+        "watchmode": FakeServer(watchmode_app(upstreams["watchmode"])).start(),
+    }
+    env = {
+        "REQUEST_DEADLINE_SECONDS": str(args.deadline),
+        "BATCH_DEADLINE_SECONDS": str(args.batch_deadline),
+        "INTENT_TIMEOUT_SECONDS": "1.5",
+        "STREAMING_TIMEOUT_SECONDS": "1",
+        "BREAKER_FAILURES": "3",
+        "BREAKER_RESET_SECONDS": str(args.reset),
+        "MAX_INFLIGHT_REQUESTS": str(args.max_inflight),
+        "RECOMMENDATION_LOG_ENABLED": "0",
+    }
+    port = free_port()
+    log = open(args.app_log, "w")
+    proc = start_app(port, fakes["supabase"].url, fakes["groq"].url, fakes["watchmode"].url, log, extra_env=env)
+    headers = {"Authorization": f"Bearer {mint_token()}"}
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", headers=headers, timeout=120,
+                                     limits=httpx.Limits(max_connections=200)) as client:
+            await wait_ready(client, proc)
+            (await client.get("/database-info")).raise_for_status()
+
+            # Hung upstreams: every answer still arrives inside the deadline
+            upstreams["groq"].latency = HUNG
+            upstreams["watchmode"].latency = HUNG
+            results = await fire(client, [novel_mood("hung", i) for i in range(6)])
+            times = [t for _, t in results]
+            assert all(res.status_code == 200 and "error" not in res.json() for res, _ in results), \
+                [res.text[:200] for res, _ in results]
+            assert max(times) < args.deadline, times
+            await asyncio.sleep(0.5)  # Cut-off Watchmode lookups finish (time out) in the background
+            state = await breakers(client)
+            assert state["groq"]["state"] == "open" and state["watchmode"]["state"] == "open", state
+            print(f"Hung Groq/Watchmode: {len(results)} answered 200 in max {max(times):.2f} s "
+                  f"(deadline {args.deadline} s); groq and watchmode breakers open")
+
+            # Open breakers: no more waiting on the dead upstreams
+            calls_before = upstreams["groq"].calls
+            results = await fire(client, [novel_mood("open", i) for i in range(20)], args.max_inflight // 2)
+            times = [t for _, t in results]
+            assert all(res.status_code == 200 for res, _ in results)
+            assert upstreams["groq"].calls == calls_before, "open breaker let calls through"
+            state = await breakers(client)
+            print(f"Open breakers: 20 requests p50 {statistics.median(times) * 1000:.1f} ms, no calls to Groq "
+                  f"({state['groq']['rejected']} rejected by the breaker)")
+
+            # Recovery: healthy again, the trial call closes the breaker
+            upstreams["groq"].latency = 0.05
+            upstreams["watchmode"].latency = 0.02
+            await asyncio.sleep(args.reset + 0.2)
+            await fire(client, [novel_mood("recovered", 0)])
+            state = await breakers(client)
+            assert state["groq"]["state"] == "closed", state
+            print(f"Recovery: groq breaker closed again after {args.reset} s")
+
+            # Overload: past the in-flight limit requests are shed straight away
+            upstreams["groq"].latency = 1.0
+            results = await fire(client, [novel_mood("load", i) for i in range(args.max_inflight * 4)])
+            ok = [t for res, t in results if res.status_code == 200]
+            shed = [(res, t) for res, t in results if res.status_code == 503]
+            assert len(ok) + len(shed) == len(results), {res.status_code for res, _ in results}
+            assert len(ok) <= args.max_inflight and shed, (len(ok), len(shed))
+            assert all(res.headers.get("retry-after") for res, _ in shed)
+            shed_times = [t for _, t in shed]
+            admission = (await client.get("/stats")).json()["admission"]
+            print(f"Overload: {len(results)} concurrent -> {len(ok)} served (p50 {statistics.median(ok):.2f} s), "
+                  f"{len(shed)} shed with 503 (p50 {statistics.median(shed_times) * 1000:.1f} ms); {admission}")
+
+            # Batch: hundreds of lookups take longer than the streaming cap but fit the batch deadline
+            upstreams["groq"].latency = 0.05
+            upstreams["watchmode"].latency = 0.05
+            batch, took = await post_batch(client, [generator.mood() for _ in range(args.batch_moods)])
+            titles = {m["title"] for m in batch}
+            assert not any(m.get("ott_timed_out") for m in batch), "batch cut off inside its deadline"
+            assert sum("ott" in m for m in batch) > len(batch) * 0.8, "batch movies left without streaming info"
+            print(f"Batch: {len(titles)} titles enriched in {took:.2f} s (streaming cap 1 s, "
+                  f"batch deadline {args.batch_deadline} s), none cut off")
+
+            # Batch past its deadline: the lookups it didn't wait for are flagged, not silently missing
+            upstreams["watchmode"].latency = 0.9  # Slow but inside the client timeout, so no breaker
+            batch, took = await post_batch(client, [generator.mood() for _ in range(args.batch_moods)])
+            cut = [m for m in batch if m.get("ott_timed_out")]
+            assert cut and not any("ott" in m for m in cut), len(cut)
+            assert took < args.batch_deadline + 1, took
+            print(f"Slow Watchmode batch: answered in {took:.2f} s, {len(cut)} of {len(batch)} movies "
+                  f"flagged ott_timed_out")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        log.close()
+        for fake in fakes.values():
+            fake.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--movies", type=int, default=2000)
+    parser.add_argument("--deadline", type=float, default=3.0)
+    parser.add_argument("--reset", type=float, default=2.0)
+    parser.add_argument("--max-inflight", type=int, default=8)
+    parser.add_argument("--batch-deadline", type=float, default=6.0)
+    parser.add_argument("--batch-moods", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--app-log", default=os.devnull, help="Where the app's stdout goes")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Runs the real app against the fakes from bench/fakes.py and checks the
+precomputed responses:
+
+- /database-info carries an ETag and answers 304 to a matching If-None-Match,
+  and the ETag changes once the catalog content does,
+- repeated non-personalized /recommend intents are served from the result
+  cache with the same body, and the cache drops everything on a new
+  catalog version,
+- how much faster orjson serializes a /recommend body than json.dumps.
+
+    cd backend
+    python bench/check_response_cache.py --catalog-size 20000
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from bench.catalog_gen import CatalogGenerator
+from bench.fakes import FakeServer, Upstream, supabase_app, groq_app, watchmode_app
+from bench.run import free_port, mint_token, start_app, wait_ready
+from response_cache import dumps
+
+
+async def stats(client):
+    return (await client.get("/stats")).json()["result_cache"]
+
+
+async def timed_posts(client, moods):
+    timings, bodies = [], []
+    for mood in moods:
+        started = time.perf_counter()
+        res = await client.post("/recommend", json={"mood": mood})
+        timings.append(time.perf_counter() - started)
+        res.raise_for_status()
+        bodies.append(res.content)
+    return timings, bodies
+
+
+async def main_async(args):
+    generator = CatalogGenerator(args.seed)
+    movies = list(generator.movies(args.catalog_size))
+    fakes = {
+        "supabase": FakeServer(supabase_app(movies, Upstream(0.01))).start(),
+        "groq": FakeServer(groq_app(Upstream(0.05))).start(),
+        "watchmode": FakeServer(watchmode_app(Upstream(0.02))).start(),
+    }
+    env = {"CATALOG_REFRESH_SECONDS": "0.5", "RECOMMENDATION_LOG_ENABLED": "0"}
+    port = free_port()
+    log = open(args.app_log, "w")
+    proc = start_app(port, fakes["supabase"].url, fakes["groq"].url, fakes["watchmode"].url, log, extra_env=env)
+    headers = {"Authorization": f"Bearer {mint_token()}"}
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", headers=headers, timeout=60) as client:
+            await wait_ready(client, proc)
+
+            # /database-info: ETag round trip
+            first = await client.get("/database-info")
+            etag = first.headers["etag"]
+            again = await client.get("/database-info", headers={"If-None-Match": etag})
+            assert again.status_code == 304 and not again.content, again.status_code
+            assert (await client.get("/database-info", headers={"If-None-Match": '"other"'})).status_code == 200
+            print(f"/database-info: 200 with ETag {etag} ({len(first.content)} bytes), then 304 for If-None-Match")
+
+            # /recommend: misses, then hits with identical bodies
+            moods = [generator.mood() for _ in range(args.moods)]
+            miss_times, miss_bodies = await timed_posts(client, moods)
+            hit_times, hit_bodies = await timed_posts(client, moods)
+            assert hit_bodies == miss_bodies, "cached body differs"
+            cache = await stats(client)
+            assert cache["hits"] >= len(moods) - 1, cache
+            print(f"/recommend: {len(moods)} moods, first pass p50 {statistics.median(miss_times) * 1000:.1f} ms, "
+                  f"cached p50 {statistics.median(hit_times) * 1000:.1f} ms, bodies identical; {cache}")
+
+            # New catalog content: a genre changes, both caches follow
+            movie = random.Random(args.seed).choice(movies)
+            movie["genre"] = "Quokkacore"
+            movie["updated_at"] = "2999-01-01T00:00:00"
+            await asyncio.sleep(2)  # Catalog delta refresh
+            changed = await client.get("/database-info", headers={"If-None-Match": etag})
+            assert changed.status_code == 200 and changed.headers["etag"] != etag
+            assert "Quokkacore" in changed.json()["genres"]
+            await timed_posts(client, moods[:1])
+            after = await stats(client)
+            assert after["invalidations"] > cache["invalidations"], after
+            print(f"Catalog change: new ETag {changed.headers['etag']}, result cache invalidated "
+                  f"({after['invalidations']} invalidations)")
+
+            body = json.loads(miss_bodies[0])
+            loops = 2000
+            started = time.perf_counter()
+            for _ in range(loops):
+                json.dumps(body, default=str).encode()
+            std = (time.perf_counter() - started) / loops
+            started = time.perf_counter()
+            for _ in range(loops):
+                dumps(body)
+            fast = (time.perf_counter() - started) / loops
+            print(f"Serializing one /recommend body ({len(miss_bodies[0])} bytes): json {std * 1e6:.0f} us, "
+                  f"orjson {fast * 1e6:.0f} us")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        log.close()
+        for fake in fakes.values():
+            fake.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--catalog-size", type=int, default=20000)
+    parser.add_argument("--moods", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--app-log", default=os.devnull, help="Where the app's stdout goes")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Checks that the vectorized ScoringEngine ranks exactly like the original
+per-movie /recommend loop (bench/baseline.py) on randomized catalogs and moods.
+
+    cd backend
+    python bench/check_scoring_parity.py --movies 2000 --queries 5000
+"""
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.baseline import baseline_recommend
+from catalog_service import CatalogSnapshot
+
+GENRES = ["Action", "Comedy", "Drama", "Horror", "Romance", "Sci-Fi", "Thriller", "Animation", "Fantasy", "Biography", None]
+LANGUAGES = ["English", "Hindi", "Telugu", "Tamil", "Korean", "Japanese", "French", "Spanish", "Danish", "Malayalam"]
+TAGS = ["dark", "epic", "funny", "feel-good", "intense", "emotional", "sad", "war", "romantic", "Gritty", "sci-fi", "classic"]
+WORDS = ["a", "war", "reward", "love", "in", "the", "Tollywood", "zombie", "city", "dark", "sci-fi", "hero", "amélie", "3", "feel good"]
+# Multi-word keywords also match across the title/description boundary ("hero war" in "Dark Hero" + "war ...")
+KEYWORDS = WORDS + TAGS + ["", "-", "re", "x y", "O", "it's", "Action", "hero war", "city the", "love a"]
+TARGET_GENRES = [None, "General", "Action", "act", "Sci-Fi", "", "drama", "thriller", "Noir"]
+TARGET_LANGUAGES = [None, "Any", "English", "Telugu", "hindi", "Korean", "Danish", "Klingon", "french"]
+
+
+def random_movie(rng, i):
+    movie = {
+        "id": i,
+        "title": " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title(),
+        "genre": rng.choice(GENRES),
+        "mood_tags": rng.sample(TAGS, rng.randint(0, 4)),
+        "languages": rng.sample(LANGUAGES, rng.randint(0, 3)),
+        "original_language": rng.choice(LANGUAGES + [None]),
+        "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 12))) or None,
+    }
+    if rng.random() < 0.05:
+        movie["languages"] = rng.choice([None, "Hindi"])
+    if rng.random() < 0.05:
+        movie["mood_tags"] = None
+    return movie
+
+
+def reference_rank(movies, keywords, target_genre, target_language, limit):
+    scored_movies, top_movies = baseline_recommend(movies, keywords, target_genre, target_language, limit)
+    scores = {id(movie): score for score, movie in scored_movies}
+    return [(scores[id(movie)], movie['id']) for movie in top_movies]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--movies", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=3000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    movies = [random_movie(rng, i) for i in range(args.movies)]
+    # The original loop implements the substring rules
+    engine = CatalogSnapshot(movies, text_match="substring").engine
+
+    mismatches = 0
+    for _ in range(args.queries):
+        keywords = rng.sample(KEYWORDS, rng.randint(0, 5))
+        target_genre = rng.choice(TARGET_GENRES)
+        target_language = rng.choice(TARGET_LANGUAGES)
+
+        expected = reference_rank(movies, keywords, target_genre, target_language, args.limit)
+        picked, _ = engine.rank(keywords, target_genre, target_language, args.limit)
+        actual = [(score, movie['id']) for score, movie in picked]
+        if actual != expected:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"MISMATCH {keywords!r} {target_genre!r} {target_language!r}\n  expected {expected}\n  actual   {actual}")
+
+    print(f"{args.queries} queries over {args.movies} movies: {mismatches} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
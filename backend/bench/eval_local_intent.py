@@ -0,0 +1,120 @@
+"""
+Offline evaluation of LocalIntentParser against recorded LLM answers.
+
+Reads {"mood", "intent"} JSONL as written with INTENT_RECORD_PATH set,
+runs the local parser over every mood and reports how many it would answer
+on its own, how often those answers agree with the LLM on genre and
+language, keyword overlap, and per-parse latency.
+
+    cd backend
+    python bench/eval_local_intent.py --records intent_records.jsonl --catalog catalog.jsonl
+    python bench/eval_local_intent.py --synthetic 2000    # fake LLM answers, smoke test only
+
+--catalog (JSONL/CSV rows, as accepted by seed.py) supplies the mood tag
+vocabulary. Without it the synthetic generator's tags are used.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_intent import LocalIntentParser, INTENT_LOCAL_MIN_COVERAGE
+from bench.catalog_gen import CatalogGenerator, MOOD_TAGS
+from bench.fakes import fake_intent
+
+
+def load_records(path):
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                row = json.loads(line)
+                if isinstance(row.get("intent"), dict) and row.get("mood"):
+                    records.append((row["mood"], row["intent"]))
+    return records
+
+
+def catalog_tags(path):
+    from seed import read_dump
+    tags = set()
+    for movie in read_dump(path):
+        tags.update(movie.get("mood_tags") or ())
+    return sorted(tags)
+
+
+def same(a, b, default):
+    return (a or default).strip().lower() == (b or default).strip().lower()
+
+
+def keyword_overlap(local, remote):
+    a = {k.lower() for k in local or []}
+    b = {k.lower() for k in remote or []}
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def summarize(rows):
+    if not rows:
+        return "n/a"
+    genre = sum(r["genre"] for r in rows) / len(rows)
+    language = sum(r["language"] for r in rows) / len(rows)
+    both = sum(r["genre"] and r["language"] for r in rows) / len(rows)
+    overlap = statistics.fmean(r["overlap"] for r in rows)
+    return (f"{len(rows):6d} moods  genre {genre:6.1%}  language {language:6.1%}  "
+            f"both {both:6.1%}  keyword jaccard {overlap:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", help="JSONL of {mood, intent} recorded from the LLM")
+    parser.add_argument("--catalog", help="Movie dump to take the mood tag vocabulary from")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate this many moods with fake LLM answers")
+    parser.add_argument("--min-coverage", type=float, default=INTENT_LOCAL_MIN_COVERAGE)
+    parser.add_argument("--show", type=int, default=10, help="Print this many confident disagreements")
+    args = parser.parse_args()
+
+    records = load_records(args.records) if args.records else []
+    if args.synthetic:
+        generator = CatalogGenerator(7)
+        records += [(mood, fake_intent(mood)) for mood in (generator.mood() for _ in range(args.synthetic))]
+    if not records:
+        parser.error("No records: pass --records and/or --synthetic")
+
+    local = LocalIntentParser(min_coverage=args.min_coverage)
+    local.set_vocabulary(catalog_tags(args.catalog) if args.catalog else MOOD_TAGS)
+
+    confident_rows, all_rows, latencies, disagreements = [], [], [], []
+    for mood, remote in records:
+        started = time.perf_counter()
+        intent, confident = local.parse(mood)
+        latencies.append(time.perf_counter() - started)
+        row = {
+            "genre": same(intent["target_genre"], remote.get("target_genre"), "General"),
+            "language": same(intent["target_language"], remote.get("target_language"), "Any"),
+            "overlap": keyword_overlap(intent["keywords"], remote.get("keywords")),
+        }
+        all_rows.append(row)
+        if confident:
+            confident_rows.append(row)
+            if not (row["genre"] and row["language"]):
+                disagreements.append((mood, intent, remote))
+
+    latencies.sort()
+    print(f"{len(records)} recorded moods, min coverage {args.min_coverage}")
+    print(f"Answered locally: {len(confident_rows) / len(records):.1%} (the rest would go to the LLM)")
+    print(f"  confident  {summarize(confident_rows)}")
+    print(f"  all moods  {summarize(all_rows)}")
+    print(f"Latency per parse: p50 {latencies[len(latencies) // 2] * 1e6:.0f} us  "
+          f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6:.0f} us")
+
+    for mood, intent, remote in disagreements[:args.show]:
+        print(f"\n  {mood!r}\n    local {intent['target_genre']} / {intent['target_language']} {intent['keywords']}"
+              f"\n    llm   {remote.get('target_genre')} / {remote.get('target_language')} {remote.get('keywords')}")
+
+
+if __name__ == "__main__":
+    main()
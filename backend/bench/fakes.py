@@ -0,0 +1,274 @@
+"""
+Local stand-ins for Supabase (PostgREST + auth), Groq and Watchmode.
+
+Each fake speaks just enough of the real HTTP API for the backend's SDK
+calls, with configurable latency, jitter and error rate, and counts the
+calls it served. They run as uvicorn servers on background threads:
+
+    supabase = FakeServer(supabase_app(catalog, Upstream(latency=0.02)))
+    supabase.start()
+    ... point SUPABASE_URL at supabase.url ...
+    supabase.stop()
+"""
+import re
+import hashlib
+import json
+import time
+import random
+import asyncio
+import threading
+import zlib
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+
+class Upstream:
+    """Latency/error profile for one fake dependency, plus what it served."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    async def delay(self):
+        """Sleeps for one simulated round trip; returns True if this call should fail."""
+        self.calls += 1
+        wait = self.latency + (self.rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            return True
+        return False
+
+    def stats(self):
+        return {"latency": self.latency, "jitter": self.jitter, "error_rate": self.error_rate,
+                "calls": self.calls, "errors": self.errors}
+
+
+def _error():
+    return JSONResponse({"message": "injected failure"}, status_code=503)
+
+
+# --- Supabase ---
+
+def _select(rows, params, time_column):
+    """PostgREST-style `gt.` filter on `time_column`, `id=in.(...)`, offset and limit"""
+    result = rows
+    since = params.get(time_column, "")
+    if since.startswith("gt."):
+        result = [r for r in result if (r.get(time_column) or "") > since[3:]]
+    ids = params.get("id", "")
+    if ids.startswith("in.("):
+        wanted = {int(i) for i in ids[4:-1].split(",") if i}
+        result = [r for r in result if r["id"] in wanted]
+    offset = int(params.get("offset", 0))
+    limit = params.get("limit")
+    end = offset + int(limit) if limit else None
+    return Response(json.dumps(result[offset:end]), media_type="application/json")
+
+
+def supabase_app(movies, upstream, ratings=(), watchlist=()):
+    """
+    PostgREST `movies` table (select/order/offset/limit/updated_at and id filters/patch),
+    read-only `user_movie_ratings`/`user_watchlist`, inserts into `movie_recommendations`
+    (kept in `app.state.recommendation_rows`), the rank_movies/catalog_summary RPCs
+    and `/auth/v1/user`.
+    """
+    app = FastAPI()
+    rows = sorted(movies, key=lambda m: m["id"])
+    ratings = sorted(ratings, key=lambda r: (r["updated_at"], r["user_id"], r["movie_id"]))
+    watchlist = sorted(watchlist, key=lambda r: (r["added_at"], r["user_id"], r["movie_id"]))
+
+    @app.get("/rest/v1/movies")
+    async def select_movies(request: Request):
+        if await upstream.delay():
+            return _error()
+        return _select(rows, request.query_params, "updated_at")
+
+    @app.get("/rest/v1/user_movie_ratings")
+    async def select_ratings(request: Request):
+        if await upstream.delay():
+            return _error()
+        return _select(ratings, request.query_params, "updated_at")
+
+    app.state.recommendation_rows = []
+
+    @app.post("/rest/v1/movie_recommendations")
+    async def insert_recommendations(request: Request):
+        body = await request.json()
+        if await upstream.delay():
+            return _error()
+        app.state.recommendation_rows.extend(body if isinstance(body, list) else [body])
+        return Response(status_code=201)
+
+    @app.get("/rest/v1/user_watchlist")
+    async def select_watchlist(request: Request):
+        if await upstream.delay():
+            return _error()
+        return _select(watchlist, request.query_params, "added_at")
+
+    @app.patch("/rest/v1/movies")
+    async def update_movies(request: Request):
+        if await upstream.delay():
+            return _error()
+        return JSONResponse([])
+
+    snapshot = None
+
+    def ranking_snapshot():
+        nonlocal snapshot
+        if snapshot is None:
+            from catalog_service import CatalogSnapshot
+            snapshot = CatalogSnapshot(rows)
+        return snapshot
+
+    @app.post("/rest/v1/rpc/rank_movies")
+    async def rank_movies(request: Request):
+        # Same scores as the SQL function; built on first use
+        params = await request.json()
+        if await upstream.delay():
+            return _error()
+        picked, _ = ranking_snapshot().engine.rank(
+            params.get("keywords") or [], params.get("target_genre"), params.get("target_language"),
+            limit=params.get("limit_count", 10),
+        )
+        return Response(json.dumps([{"score": score, "movie": movie} for score, movie in picked]),
+                        media_type="application/json")
+
+    @app.post("/rest/v1/rpc/catalog_summary")
+    async def catalog_summary(request: Request):
+        if await upstream.delay():
+            return _error()
+        snapshot = ranking_snapshot()
+        info = snapshot.database_info()
+        # Stands in for max(content_updated_at): moves with content edits, not watchmode_id write-backs
+        from catalog_service import BOOKKEEPING_COLUMNS
+        content = [{k: v for k, v in m.items() if k not in BOOKKEEPING_COLUMNS} for m in movies]
+        last_updated = hashlib.blake2b(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+        return JSONResponse({**info, "genres": {str(g): n for g, n in info["genres"].items()},
+                             "mood_tags": snapshot.mood_tags, "last_updated": last_updated})
+
+    @app.get("/auth/v1/user")
+    async def get_user(request: Request):
+        if await upstream.delay():
+            return _error()
+        return JSONResponse({
+            "id": "00000000-0000-0000-0000-000000000001", "aud": "authenticated", "role": "authenticated",
+            "email": "bench@example.com", "app_metadata": {}, "user_metadata": {},
+            "created_at": "2024-01-01T00:00:00Z",
+        })
+
+    @app.get("/auth/v1/.well-known/jwks.json")
+    async def jwks():
+        return JSONResponse({"keys": []})
+
+    return app
+
+
+# --- Groq ---
+
+_GENRE_WORDS = {"horror": "Horror", "scary": "Horror", "comedy": "Comedy", "funny": "Comedy", "action": "Action",
+                "romance": "Romance", "romantic": "Romance", "sci": "Sci-Fi", "drama": "Drama", "thriller": "Thriller",
+                "animation": "Animation", "fantasy": "Fantasy", "crime": "Crime"}
+_LANGUAGE_WORDS = {"english", "hindi", "telugu", "tamil", "korean", "japanese", "spanish", "french", "malayalam",
+                   "kannada", "italian", "german", "cantonese", "danish", "swedish"}
+_FILLER = {"something", "tonight", "movie", "a", "the", "i", "want", "to", "watch", "in"}
+
+
+def fake_intent(mood):
+    """Deterministic stand-in for what the LLM would extract from a mood."""
+    words = re.findall(r"[a-z]+", mood.lower())
+    genre = next((_GENRE_WORDS[w] for w in words if w in _GENRE_WORDS), "General")
+    language = next((w.title() for w in words if w in _LANGUAGE_WORDS), "Any")
+    keywords = [w for w in words if w not in _FILLER and w not in _LANGUAGE_WORDS][:5]
+    return {"target_genre": genre, "keywords": keywords, "search_term": " ".join(keywords[:2]), "target_language": language}
+
+
+def groq_app(upstream):
+    """OpenAI-compatible chat completions endpoint answering the intent prompts."""
+    app = FastAPI()
+
+    @app.post("/openai/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        if await upstream.delay():
+            return _error()
+        prompt = body["messages"][-1]["content"]
+        batch = re.findall(r"^\s+(\d+): (\".*\")$", prompt, re.M)
+        if batch:
+            content = {"results": [{"index": int(i), **fake_intent(json.loads(m))} for i, m in batch]}
+        else:
+            match = re.search(r'Analyze the user mood: "(.*)"', prompt)
+            content = fake_intent(match.group(1) if match else prompt)
+        return JSONResponse({
+            "id": f"chatcmpl-{upstream.calls}", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": json.dumps(content)}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    return app
+
+
+# --- Watchmode ---
+
+_SERVICES = ["Netflix", "Prime Video", "Disney+ Hotstar", "Hulu", "Max", "Apple TV+"]
+
+
+def watchmode_app(upstream, not_found_rate=0.1):
+    app = FastAPI()
+
+    @app.get("/v1/search/")
+    async def search(search_value: str = ""):
+        if await upstream.delay():
+            return _error()
+        title_id = zlib.crc32(search_value.encode()) % 1_000_000
+        if title_id % 100 < not_found_rate * 100:
+            return JSONResponse({"title_results": []})
+        return JSONResponse({"title_results": [{"id": title_id, "name": search_value}]})
+
+    @app.get("/v1/title/{title_id}/sources/")
+    async def sources(title_id: int):
+        if await upstream.delay():
+            return _error()
+        picks = [_SERVICES[(title_id >> shift) % len(_SERVICES)] for shift in (0, 3, 6)]
+        return JSONResponse([{"name": name, "type": "sub"} for name in picks])
+
+    return app
+
+
+# --- Server runner ---
+
+class FakeServer:
+    """Runs an ASGI app with uvicorn on a background thread."""
+
+    def __init__(self, app, host="127.0.0.1", port=0):
+        self.config = uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="off")
+        self.server = uvicorn.Server(self.config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self):
+        sock = self.server.servers[0].sockets[0]
+        host, port = sock.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, timeout=10):
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
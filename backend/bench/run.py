@@ -0,0 +1,341 @@
+"""
+Reproducible benchmark for the recommendation backend.
+
+Generates a synthetic catalog, starts local fakes for Supabase, Groq and
+Watchmode, runs the real app against them in a uvicorn subprocess, and
+reports throughput and p50/p95/p99 latency for:
+
+  scoring        ScoringEngine in isolation (score / top_k / rank stages)
+  database-info  GET /database-info
+  recommend      POST /recommend (per-stage breakdown from Server-Timing when present)
+
+Results are written as JSON so runs can be diffed between commits:
+
+    cd backend
+    python bench/run.py --catalog-size 10000 --requests 300 --output bench-before.json
+    python bench/run.py --catalog-size 10000 --requests 300 --output bench-after.json --compare bench-before.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+import jwt
+
+from bench.catalog_gen import CatalogGenerator
+from bench.fakes import FakeServer, Upstream, supabase_app, groq_app, watchmode_app, fake_intent
+
+JWT_SECRET = "bench-secret-" + "x" * 32
+BENCH_USER = "bench-user"
+SCENARIOS = ["scoring", "database-info", "recommend"]
+
+
+def percentiles(samples):
+    """Summary in milliseconds for a list of durations in seconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered) * 1000, 3),
+        "p50": round(pick(0.50), 3),
+        "p95": round(pick(0.95), 3),
+        "p99": round(pick(0.99), 3),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+
+def parse_server_timing(header):
+    """{'stage': seconds} from a `Server-Timing: name;dur=12.3, ...` header."""
+    stages = {}
+    for part in header.split(","):
+        fields = [f.strip() for f in part.split(";")]
+        for f in fields[1:]:
+            if f.startswith("dur="):
+                stages[fields[0]] = float(f[4:]) / 1000
+    return stages
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def mint_token(sub=BENCH_USER, ttl=3600, role="authenticated"):
+    return jwt.encode({"sub": sub, "aud": "authenticated", "role": role,
+                       "exp": int(time.time()) + ttl}, JWT_SECRET, algorithm="HS256")
+
+
+# --- Scenario: scoring in isolation ---
+
+def bench_scoring(movies, moods, iterations):
+    from catalog_service import CatalogSnapshot
+
+    started = time.perf_counter()
+    snapshot = CatalogSnapshot(movies)
+    build = time.perf_counter() - started
+    engine = snapshot.engine
+
+    stages = {"score": [], "top_k": [], "rank": []}
+    started = time.perf_counter()
+    for i in range(iterations):
+        intent = fake_intent(moods[i % len(moods)])
+        args = (intent["keywords"], intent["target_genre"], intent["target_language"])
+        t0 = time.perf_counter()
+        scores = engine.score(*args)
+        t1 = time.perf_counter()
+        engine.top_k(scores, 10)
+        t2 = time.perf_counter()
+        engine.rank(*args, limit=10)
+        t3 = time.perf_counter()
+        stages["score"].append(t1 - t0)
+        stages["top_k"].append(t2 - t1)
+        stages["rank"].append(t3 - t2)
+    duration = time.perf_counter() - started
+
+    return {
+        "requests": iterations,
+        "errors": 0,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(iterations / duration, 2),
+        "latency_ms": percentiles(stages["rank"]),
+        "stages": {name: percentiles(samples) for name, samples in stages.items()},
+        "catalog_build_s": round(build, 3),
+    }
+
+
+# --- Scenarios against the running app ---
+
+async def drive(client, requests, concurrency, make_request):
+    """Issues `requests` calls with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, stage_samples, errors = [], {}, 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            t0 = time.perf_counter()
+            try:
+                res = await make_request(client, i)
+                ok = res.status_code < 400
+                timing = res.headers.get("server-timing")
+            except httpx.HTTPError:
+                ok, timing = False, None
+            latencies.append(time.perf_counter() - t0)
+            if not ok:
+                errors += 1
+            for stage, seconds in parse_server_timing(timing or "").items():
+                stage_samples.setdefault(stage, []).append(seconds)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    duration = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(requests / duration, 2),
+        "latency_ms": percentiles(latencies),
+        "stages": {stage: percentiles(samples) for stage, samples in sorted(stage_samples.items())},
+    }
+
+
+def start_app(port, supabase_url, groq_url, watchmode_url, log, catalog_mode="memory", extra_env=None):
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("SUPABASE", "GROQ", "WATCHMODE", "INTENT_CACHE"))}
+    env.update({
+        "SUPABASE_URL": supabase_url,
+        "SUPABASE_KEY": mint_token("service", role="service_role"),
+        "SUPABASE_JWT_SECRET": JWT_SECRET,
+        "GROQ_API_KEY": "bench",
+        "GROQ_BASE_URL": groq_url,
+        "WATCHMODE_API_KEY": "bench",
+        "WATCHMODE_BASE_URL": f"{watchmode_url}/v1",
+        "CATALOG_REFRESH_SECONDS": "3600",
+        "CATALOG_MODE": catalog_mode,
+        "PYTHONUNBUFFERED": "1",
+    })
+    env.update(extra_env or {})
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+async def wait_ready(client, proc, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("App exited during startup, see the bench log")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("App did not become ready")
+
+
+async def bench_endpoints(args, movies, moods, scenarios, history=((), ())):
+    upstreams = {
+        "supabase": Upstream(args.supabase_latency, args.jitter, args.error_rate, seed=1),
+        "groq": Upstream(args.groq_latency, args.jitter, args.error_rate, seed=2),
+        "watchmode": Upstream(args.watchmode_latency, args.jitter, args.error_rate, seed=3),
+    }
+    fakes = {
+        "supabase": FakeServer(supabase_app(movies, upstreams["supabase"], *history)).start(),
+        "groq": FakeServer(groq_app(upstreams["groq"])).start(),
+        "watchmode": FakeServer(watchmode_app(upstreams["watchmode"])).start(),
+    }
+    port = free_port()
+    log = open(args.app_log, "w")
+    proc = start_app(port, fakes["supabase"].url, fakes["groq"].url, fakes["watchmode"].url, log, args.catalog_mode)
+    headers = {"Authorization": f"Bearer {mint_token()}"}
+    results = {}
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency * 2)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", headers=headers,
+                                     timeout=120, limits=limits) as client:
+            await wait_ready(client, proc)
+            started = time.perf_counter()
+            (await client.get("/database-info")).raise_for_status()  # Loads the catalog
+            warmup = time.perf_counter() - started
+
+            if "database-info" in scenarios:
+                results["database-info"] = await drive(
+                    client, args.requests, args.concurrency, lambda c, i: c.get("/database-info"))
+
+            if "recommend" in scenarios:
+                results["recommend"] = await drive(
+                    client, args.requests, args.concurrency,
+                    lambda c, i: c.post("/recommend", json={"mood": moods[i % len(moods)]}))
+
+            app_stats = (await client.get("/stats")).json()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        log.close()
+        for fake in fakes.values():
+            fake.stop()
+
+    for result in results.values():
+        result["catalog_warmup_s"] = round(warmup, 3)
+    return results, {name: u.stats() for name, u in upstreams.items()}, app_stats
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {baseline['meta'].get('commit')}):")
+    for name, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if not before:
+            continue
+        rows = [("total", result["latency_ms"], before["latency_ms"])]
+        rows += [(stage, stats, before.get("stages", {}).get(stage)) for stage, stats in result.get("stages", {}).items()]
+        for stage, now, then in rows:
+            if not now or not then:
+                continue
+            deltas = "  ".join(f"{q} {then[q]:.2f} -> {now[q]:.2f} ms ({(now[q] - then[q]) / then[q] * 100 if then[q] else 0:+.1f}%)"
+                               for q in ("p50", "p95", "p99"))
+            print(f"  {name:14s} {stage:12s} {deltas}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation backend against local fakes.")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Run only these scenarios (repeatable)")
+    parser.add_argument("--catalog-size", type=int, default=10000)
+    parser.add_argument("--catalog-mode", choices=["memory", "rpc"], default="memory",
+                        help="Rank in the app (memory) or through the rank_movies RPC (rpc)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--distinct-moods", type=int, default=50, help="How many different moods the load cycles through")
+    parser.add_argument("--scoring-iterations", type=int, default=500)
+    parser.add_argument("--supabase-latency", type=float, default=0.02)
+    parser.add_argument("--groq-latency", type=float, default=0.3)
+    parser.add_argument("--watchmode-latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--profile-users", type=int, default=200,
+                        help="Users with rating/watchlist history besides the bench user (-1: no history at all)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--app-log", default=os.devnull, help="Where the app's stdout goes")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="Previous results JSON to diff against")
+    args = parser.parse_args()
+    scenarios = args.scenario or SCENARIOS
+
+    generator = CatalogGenerator(args.seed)
+    movies = list(generator.movies(args.catalog_size))
+    moods = [generator.mood() for _ in range(args.distinct_moods)]
+    random.Random(args.seed).shuffle(moods)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "args": vars(args),
+        },
+        "scenarios": {},
+    }
+
+    if "scoring" in scenarios:
+        print(f"Scoring {args.scoring_iterations} moods against {args.catalog_size} movies...", file=sys.stderr)
+        report["scenarios"]["scoring"] = bench_scoring(movies, moods, args.scoring_iterations)
+
+    endpoint_scenarios = [s for s in scenarios if s != "scoring"]
+    if endpoint_scenarios:
+        print(f"Driving {', '.join(endpoint_scenarios)} with {args.requests} requests "
+              f"at concurrency {args.concurrency}...", file=sys.stderr)
+        # The bench user plus background users, so personalization is on the measured path
+        users = [BENCH_USER] + [f"user-{i}" for i in range(args.profile_users)]
+        history = generator.history(movies, users) if args.profile_users >= 0 else ((), ())
+        results, upstreams, app_stats = asyncio.run(bench_endpoints(args, movies, moods, endpoint_scenarios, history))
+        report["scenarios"].update(results)
+        report["upstreams"] = upstreams
+        report["app_stats"] = app_stats
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    for name, result in report["scenarios"].items():
+        lat = result["latency_ms"]
+        print(f"{name:14s} {result['throughput_rps']:>9.1f} req/s  p50 {lat['p50']:.2f}  p95 {lat['p95']:.2f}  "
+              f"p99 {lat['p99']:.2f} ms  errors {result['errors']}", file=sys.stderr)
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
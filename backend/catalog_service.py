@@ -0,0 +1,562 @@
+import os
+import json
+import time
+import asyncio
+
+from scoring import ScoringEngine
+from text_index import BM25Index
+from executor import db_executor
+from metrics import upstream_call
+from profile_service import PROFILE_WEIGHT
+from resilience import CircuitOpenError
+from catalog_store import ColumnFile, LoaderLock, write_columns, file_identity, STORE_SUPPORTED
+
+CATALOG_REFRESH_SECONDS = float(os.environ.get("CATALOG_REFRESH_SECONDS", "60"))
+CATALOG_FULL_RELOAD_SECONDS = float(os.environ.get("CATALOG_FULL_RELOAD_SECONDS", "3600"))
+CATALOG_PAGE_SIZE = 1000  # PostgREST caps a single select at 1000 rows by default
+# "memory": load the table and rank in-process; "rpc": rank in Postgres with rank_movies()
+CATALOG_MODE = os.environ.get("CATALOG_MODE", "memory")
+# "bm25": keywords match stemmed terms, description hits weighted by BM25;
+# "substring": the original `keyword in text` rules (what rank_movies() implements)
+CATALOG_TEXT_MATCH = os.environ.get("CATALOG_TEXT_MATCH", "bm25")
+PROFILE_RPC_OVERFETCH = 3  # rpc mode fetches this many times `limit` rows for personalized requests
+# Columnar catalog file shared by the workers on one host (e.g. /dev/shm/cinevibe-catalog.bin): one worker
+# loads the table and writes it, the others memory-map it. Unset = every worker loads its own copy
+CATALOG_STORE_PATH = os.environ.get("CATALOG_STORE_PATH")
+CATALOG_STORE_POLL_SECONDS = float(os.environ.get("CATALOG_STORE_POLL_SECONDS", "2"))
+CATALOG_STORE_WAIT_SECONDS = 30  # How long a starting worker waits for the loader's first file
+# Columns rewritten without changing what a ranking or listing serves (the trigger's updated_at,
+# watchmode_id write-backs); rows differing only in these are patched into the served snapshot
+# instead of making a new catalog version
+BOOKKEEPING_COLUMNS = ("updated_at", "watchmode_id")
+
+
+def _content(row):
+    return {k: v for k, v in row.items() if k not in BOOKKEEPING_COLUMNS}
+
+
+class CatalogEntry:
+    """Precomputed lowercase fields for one movie row."""
+    __slots__ = ("movie", "title_lower", "genre_lower", "full_text", "features", "languages", "original_language")
+
+    def __init__(self, movie):
+        self.movie = movie
+        genre = movie.get('genre') or ''
+        self.title_lower = (movie.get('title') or '').lower()
+        self.genre_lower = genre.lower()
+        self.full_text = (f"{movie.get('title')} {movie.get('description') or ''} {genre}").lower()
+
+        features = set()
+        if genre:
+            features.add(self.genre_lower)
+        for tag in movie.get('mood_tags') or []:
+            features.add(tag.lower())
+        self.features = features
+
+        langs = movie.get('languages') or []
+        if isinstance(langs, str):
+            langs = [langs]
+        self.languages = [l.lower() for l in langs]
+        self.original_language = (movie.get('original_language') or '').lower()
+
+
+class CatalogSnapshot:
+    """
+    Immutable, process-local view of the movies table: the rows in catalog
+    order, the listings /database-info serves and the ScoringEngine that
+    ranks them.
+    """
+
+    def __init__(self, movies, version=0, watermark=None, text_index=None, text_match=CATALOG_TEXT_MATCH):
+        self.movies = movies
+        self.version = version
+        self.watermark = watermark
+        self.loaded_at = time.time()
+        self.entries = [CatalogEntry(m) for m in movies]
+
+        genre_counts = {}
+        languages = set()
+        mood_tags = set()
+        available_genres = set()
+
+        for movie in movies:
+            genre = movie.get('genre', 'Unknown')
+            genre_counts[genre] = genre_counts.get(genre, 0) + 1
+            if movie.get('genre'):
+                available_genres.add(movie['genre'])
+            if isinstance(movie.get('languages'), list):
+                languages.update(movie['languages'])
+            mood_tags.update(movie.get('mood_tags') or ())
+
+        self.genre_counts = genre_counts
+        self.sample_movies = [m['title'] for m in movies[:10]]
+        self.languages = sorted(languages)
+        self.mood_tags = sorted(mood_tags)
+        self.available_genres = list(available_genres)
+        self.available_languages = list(languages)
+        if text_index is None and text_match == "bm25":
+            text_index = BM25Index.build(movies)
+        self.text_index = text_index
+        self.engine = ScoringEngine(self.entries, text_index)
+
+    def __len__(self):
+        return len(self.movies)
+
+    def movie(self, movie_id):
+        pos = self.engine.position(movie_id)
+        return self.movies[pos] if pos is not None else None
+
+    def database_info(self):
+        return {
+            "total_movies": len(self.movies),
+            "genres": self.genre_counts,
+            "languages": self.languages,
+            "sample_movies": self.sample_movies
+        }
+
+    def to_columns(self):
+        """(columns, meta) for a catalog store file that MappedSnapshot reads back"""
+        columns = dict(self.engine.columns)
+        if self.text_index is not None:
+            columns.update(self.text_index.columns())
+        columns["rows"] = [json.dumps(m, separators=(",", ":"), default=str) for m in self.movies]
+        meta = {
+            "version": self.version,
+            "watermark": self.watermark,
+            "loaded_at": self.loaded_at,
+            "text_index": [self.text_index.k1, self.text_index.b] if self.text_index is not None else None,
+            "genre_counts": self.genre_counts,
+            "sample_movies": self.sample_movies,
+            "languages": self.languages,
+            "mood_tags": self.mood_tags,
+            "available_genres": self.available_genres,
+            "available_languages": self.available_languages,
+        }
+        return columns, meta
+
+
+class StoredRows:
+    """Movie rows of a catalog store file, decoded one at a time on access."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, pos):
+        return json.loads(self.table[pos])
+
+
+class StoredEntries:
+    """CatalogEntry per stored row, built on access (only rankings' winners are ever read)."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, pos):
+        return CatalogEntry(self.rows[pos])
+
+
+class MappedSnapshot:
+    """
+    CatalogSnapshot read from a catalog store file. The scoring columns are
+    views into a read-only memory mapping that every worker on the host
+    shares; movie dicts are only decoded for the rows a ranking returns.
+    """
+
+    def __init__(self, store):
+        meta = store.meta
+        self.store = store
+        self.version = meta["version"]
+        self.watermark = meta["watermark"]
+        self.loaded_at = meta["loaded_at"]
+        self.genre_counts = meta["genre_counts"]
+        self.sample_movies = meta["sample_movies"]
+        self.languages = meta["languages"]
+        self.mood_tags = meta["mood_tags"]
+        self.available_genres = meta["available_genres"]
+        self.available_languages = meta["available_languages"]
+        self.movies = StoredRows(store["rows"])
+        self.entries = StoredEntries(self.movies)
+        self.text_index = BM25Index.from_columns(store, *meta["text_index"]) if meta["text_index"] else None
+        self.engine = ScoringEngine(self.entries, self.text_index, columns=store)
+
+    def __len__(self):
+        return len(self.movies)
+
+    def movie(self, movie_id):
+        pos = self.engine.position(movie_id)
+        return self.movies[pos] if pos is not None else None
+
+    def database_info(self):
+        return {
+            "total_movies": len(self.movies),
+            "genres": self.genre_counts,
+            "languages": self.languages,
+            "sample_movies": self.sample_movies
+        }
+
+
+class CatalogService:
+    """
+    Loads the movies table once and keeps it fresh in the background.
+    Refreshes are delta-fetched by `updated_at`; a full reload runs periodically
+    (and whenever the table has no `updated_at` column) to pick up deletions.
+    Snapshots are built in a worker thread, and a new one (with a new
+    version) only when some row changed beyond BOOKKEEPING_COLUMNS; changes
+    to those alone are patched into the current snapshot's rows.
+
+    With a `store_path`, workers on one host share the catalog: the worker
+    holding the store's lock is the loader and writes every new snapshot to
+    the store file (atomically replaced); the others map the file read-only
+    (MappedSnapshot) and swap to a new version when the file changes. If
+    the loader exits, the next worker to poll takes the lock over.
+    """
+
+    def __init__(self, client, refresh_seconds=CATALOG_REFRESH_SECONDS, full_reload_seconds=CATALOG_FULL_RELOAD_SECONDS,
+                 executor=db_executor, store_path=CATALOG_STORE_PATH, store_poll_seconds=CATALOG_STORE_POLL_SECONDS):
+        self.client = client
+        self.executor = executor
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self.snapshot = None
+        self._delta_supported = True
+        self._last_full_reload = 0.0
+        self._lock = asyncio.Lock()
+        self._task = None
+        if store_path and not STORE_SUPPORTED:
+            print("CATALOG_STORE_PATH needs fcntl (POSIX); every worker will load its own catalog")
+            store_path = None
+        self.store_path = store_path
+        self.store_poll_seconds = store_poll_seconds
+        self._loader_lock = LoaderLock(store_path) if store_path else None
+        self._store_identity = None
+        self.store_writes = 0
+        self.store_maps = 0
+
+    # --- Shared store ---
+
+    def _is_loader(self):
+        """Whether this worker loads the table; takes the store lock over when it is free"""
+        return self._loader_lock is None or self._loader_lock.try_acquire()
+
+    def _write_store(self, snapshot):
+        columns, meta = snapshot.to_columns()
+        return write_columns(self.store_path, columns, meta)
+
+    async def _publish(self, snapshot):
+        if self._loader_lock is None or not self._loader_lock.held:
+            return
+        try:
+            started = time.perf_counter()
+            size = await asyncio.to_thread(self._write_store, snapshot)
+            self._store_identity = file_identity(self.store_path)
+            self.store_writes += 1
+            print(f"Catalog store written: version {snapshot.version}, {size / 1e6:.1f} MB "
+                  f"in {time.perf_counter() - started:.2f} s")
+        except Exception as e:
+            print(f"Catalog store write failed: {e}")
+
+    def _follow_store(self):
+        """Maps the store file if it was replaced since the last look; True when the snapshot changed"""
+        identity = file_identity(self.store_path)
+        if identity is None or identity == self._store_identity:
+            return False
+        try:
+            store = ColumnFile(self.store_path)
+            snapshot = MappedSnapshot(store)
+        except Exception as e:
+            print(f"Catalog store unreadable, keeping the current snapshot: {e}")
+            return False
+        self._store_identity = store.identity
+        self.snapshot = snapshot
+        self.store_maps += 1
+        print(f"Catalog store mapped: version {snapshot.version}, {len(snapshot)} movies")
+        return True
+
+    def _stored_version(self):
+        # A new loader continues the version sequence of the file it replaces
+        try:
+            return ColumnFile(self.store_path).meta["version"]
+        except Exception:
+            return 0
+
+    async def _wait_for_store(self):
+        deadline = time.monotonic() + CATALOG_STORE_WAIT_SECONDS
+        while time.monotonic() < deadline and not self._is_loader():
+            if self._follow_store():
+                return
+            await asyncio.sleep(0.1)
+
+    # --- Fetching (blocking supabase calls) ---
+
+    def _fetch_pages(self, since=None):
+        rows = []
+        start = 0
+        while True:
+            query = self.client.table("movies").select("*")
+            if since is not None:
+                query = query.gt("updated_at", since)
+            with upstream_call("supabase", "catalog_page"):
+                response = query.order("id").range(start, start + CATALOG_PAGE_SIZE - 1).execute()
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < CATALOG_PAGE_SIZE:
+                return rows
+            start += CATALOG_PAGE_SIZE
+
+    @staticmethod
+    def _max_updated_at(rows, current=None):
+        watermark = current
+        for row in rows:
+            updated = row.get('updated_at')
+            if updated and (watermark is None or updated > watermark):
+                watermark = updated
+        return watermark
+
+    def _merge(self, current, changed):
+        """Merged rows plus (position, old row or None, new row) for every change"""
+        by_id = {row.get('id'): row for row in changed}
+        movies, changes = [], []
+        for movie in current.movies:
+            row = by_id.pop(movie.get('id'), None)
+            if row is not None:
+                changes.append((len(movies), movie, row))
+            movies.append(row or movie)
+        for row in by_id.values():
+            changes.append((len(movies), None, row))
+            movies.append(row)
+        return movies, changes
+
+    @staticmethod
+    def _has_changes(current, changed):
+        """Whether any fetched row is new or differs from the current one outside the bookkeeping columns"""
+        for row in changed:
+            pos = current.engine.position(row.get('id'))
+            if pos is None or _content(current.movies[pos]) != _content(row):
+                return True
+        return False
+
+    @staticmethod
+    def _same_rows(movies, rows):
+        """Whether a full load returned the rows already served, in order, bookkeeping columns aside"""
+        return len(movies) == len(rows) and all(_content(movies[i]) == _content(row) for i, row in enumerate(rows))
+
+    @staticmethod
+    def _patch_bookkeeping(current, rows):
+        """Copies the bookkeeping columns of fetched rows into the served ones; True if any value moved"""
+        patched = False
+        for row in rows:
+            movie = current.movies[current.engine.position(row.get('id'))]
+            for column in BOOKKEEPING_COLUMNS:
+                if column in row and movie.get(column) != row[column]:
+                    movie[column] = row[column]
+                    patched = True
+        return patched
+
+    def _apply_delta(self, current, changed, watermark):
+        movies, changes = self._merge(current, changed)
+        # Only the changed movies are re-indexed for BM25
+        text_index = current.text_index.with_changes(changes, len(movies)) if current.text_index else None
+        return CatalogSnapshot(movies, current.version + 1, watermark, text_index)
+
+    # --- Refresh ---
+
+    async def refresh(self, full=False):
+        async with self._lock:
+            if not self._is_loader():
+                # Another worker loads the table; a private load only until its file exists
+                if self._follow_store() or self.snapshot is not None:
+                    return self.snapshot
+            current = self.snapshot
+            now = time.monotonic()
+            full = (
+                full or current is None or current.watermark is None or not self._delta_supported
+                or now - self._last_full_reload >= self.full_reload_seconds
+                or not isinstance(current, CatalogSnapshot)  # Took over from a mapped store: rows aren't in memory
+            )
+
+            if not full:
+                try:
+                    changed = await self.executor.run(self._fetch_pages, current.watermark)
+                except CircuitOpenError:
+                    raise  # Supabase is down, not the delta query; keep serving the current snapshot
+                except Exception as e:
+                    print(f"Catalog delta fetch failed, falling back to full reloads: {e}")
+                    self._delta_supported = False
+                    full = True
+                else:
+                    if not changed:
+                        return current
+                    watermark = self._max_updated_at(changed, current.watermark)
+                    if not self._has_changes(current, changed):
+                        # Only bookkeeping columns moved: same version (the caches stay valid), but the
+                        # rows pick up e.g. new watchmode_ids, and so do the followers through the store
+                        current.watermark = watermark
+                        if self._patch_bookkeeping(current, changed):
+                            await self._publish(current)
+                        return current
+                    # Built off the event loop; requests keep using the current snapshot meanwhile
+                    self.snapshot = await asyncio.to_thread(self._apply_delta, current, changed, watermark)
+                    print(f"Catalog delta applied: {len(changed)} changed, {len(self.snapshot)} total")
+                    await self._publish(self.snapshot)
+                    return self.snapshot
+
+            rows = await self.executor.run(self._fetch_pages)
+            watermark = self._max_updated_at(rows)
+            unchanged = current is not None and await asyncio.to_thread(self._same_rows, current.movies, rows)
+            self._last_full_reload = now
+            if unchanged and isinstance(current, CatalogSnapshot):
+                current.watermark = watermark
+                if await asyncio.to_thread(self._patch_bookkeeping, current, rows):
+                    await self._publish(current)
+                return current
+            if current:
+                # A loader taking over an unchanged mapped store keeps its version
+                version = current.version + (0 if unchanged else 1)
+            else:
+                version = (await asyncio.to_thread(self._stored_version) if self._loader_lock else 0) + 1
+            self.snapshot = await asyncio.to_thread(CatalogSnapshot, rows, version, watermark)
+            print(f"Catalog loaded: {len(rows)} movies (version {version})")
+            await self._publish(self.snapshot)
+            return self.snapshot
+
+    async def get_snapshot(self):
+        if self.snapshot is None:
+            await self.refresh(full=True)
+        return self.snapshot
+
+    async def rank(self, snapshot, keywords, target_genre, target_language, limit, profile=None):
+        """Best (score, movie) pairs for one parsed mood, duplicate titles dropped, personalized by `profile`"""
+        # Scored in a worker thread: a batch gathers hundreds of these, which would otherwise hold the event loop
+        scored, _ = await asyncio.to_thread(snapshot.engine.rank, keywords, target_genre, target_language, limit=limit,
+                                            profile=profile, profile_weight=PROFILE_WEIGHT)
+        return scored
+
+    async def _refresh_loop(self):
+        while True:
+            # Followers only stat the store file, so they look often
+            await asyncio.sleep(self.refresh_seconds if self._is_loader() else self.store_poll_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Catalog refresh error: {e}")
+
+    async def start(self):
+        try:
+            if not self._is_loader():
+                await self._wait_for_store()
+            await self.refresh(full=True)
+        except Exception as e:
+            # Requests will retry the load lazily
+            print(f"Initial catalog load failed: {e}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._loader_lock:
+            self._loader_lock.release()
+
+    def stats(self):
+        snapshot = self.snapshot
+        return {
+            "role": "loader" if self._loader_lock is None or self._loader_lock.held else "follower",
+            "version": snapshot.version if snapshot else None,
+            "movies": len(snapshot) if snapshot else 0,
+            "mapped": isinstance(snapshot, MappedSnapshot),
+            "store_writes": self.store_writes,
+            "store_maps": self.store_maps,
+        }
+
+
+class CatalogSummary:
+    """Catalog-wide facts from the catalog_summary() RPC, answering like a snapshot does."""
+
+    def __init__(self, data, version=0):
+        self.data = data
+        self.version = version
+        self.loaded_at = time.time()
+        self.total = data.get("total_movies", 0)
+        self.genre_counts = data.get("genres") or {}
+        self.languages = data.get("languages") or []
+        self.sample_movies = data.get("sample_movies") or []
+        self.mood_tags = data.get("mood_tags") or []
+        self.available_genres = [g for g in self.genre_counts if g != "Unknown"]
+        self.available_languages = list(self.languages)
+
+    def __len__(self):
+        return self.total
+
+    def database_info(self):
+        return {
+            "total_movies": self.total,
+            "genres": self.genre_counts,
+            "languages": self.languages,
+            "sample_movies": self.sample_movies
+        }
+
+
+class RemoteCatalog:
+    """
+    Ranks in Postgres with the rank_movies() RPC instead of holding the table
+    in memory, so only the top-k rows cross the network. Totals and genre and
+    language lists come from catalog_summary(), cached for `refresh_seconds`;
+    the version only moves when the summary (which carries the table's last
+    `updated_at`) does.
+    """
+
+    def __init__(self, client, refresh_seconds=CATALOG_REFRESH_SECONDS, executor=db_executor):
+        self.client = client
+        self.executor = executor
+        self.refresh_seconds = refresh_seconds
+        self.snapshot = None
+        self._lock = asyncio.Lock()
+
+    def _rpc(self, name, params=None):
+        with upstream_call("supabase", name):
+            return self.client.rpc(name, params or {}).execute().data
+
+    async def get_snapshot(self):
+        current = self.snapshot
+        if current is not None and time.time() - current.loaded_at < self.refresh_seconds:
+            return current
+        async with self._lock:
+            if self.snapshot is current:
+                data = await self.executor.run(self._rpc, "catalog_summary") or {}
+                if current is not None and data == current.data:
+                    # Nothing changed (last_updated only follows content edits, not watchmode_id
+                    # write-backs): same version, cached results stay valid
+                    current.loaded_at = time.time()
+                else:
+                    self.snapshot = CatalogSummary(data, current.version + 1 if current else 1)
+            return self.snapshot
+
+    async def rank(self, snapshot, keywords, target_genre, target_language, limit, profile=None):
+        # With a profile, over-fetch in the same call so watched titles can be dropped and the rest re-ordered
+        rows = await self.executor.run(self._rpc, "rank_movies", {
+            "keywords": list(keywords),
+            "target_genre": target_genre,
+            "target_language": target_language,
+            "limit_count": limit if profile is None else limit * PROFILE_RPC_OVERFETCH,
+        })
+        scored = [(row["score"], row["movie"]) for row in rows or []]
+        return scored if profile is None else profile.rerank(scored, limit)
+
+    async def start(self):
+        try:
+            await self.get_snapshot()
+        except Exception as e:
+            print(f"Initial catalog summary failed: {e}")
+
+    async def stop(self):
+        pass
+
+    def stats(self):
+        return {"role": "rpc", "version": self.snapshot.version if self.snapshot else None}
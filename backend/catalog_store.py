@@ -0,0 +1,177 @@
+import os
+import json
+import mmap
+import struct
+import bisect
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no shared store, every worker loads its own catalog
+    fcntl = None
+
+STORE_SUPPORTED = fcntl is not None
+
+MAGIC = b"CVCOLS01"
+_ALIGN = 64
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+class StringTable:
+    """
+    Read-only sequence of strings stored as one UTF-8 blob plus offsets.
+    Items are decoded on access; `find` binary-searches tables written sorted.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @staticmethod
+    def encode(strings):
+        """(data, offsets) arrays for a list of strings"""
+        encoded = [s.encode() for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode()
+
+    def find(self, s):
+        i = bisect.bisect_left(self, s)
+        return i if i < len(self) and self[i] == s else None
+
+
+def write_columns(path, columns, meta):
+    """
+    Writes named columns (numpy arrays, or lists of str stored as string
+    tables) and a JSON `meta` dict to `path`. The file is built next to
+    `path` and renamed over it, so readers see either the old or the new
+    version, never a partial one; mappings of the old file stay valid.
+    """
+    arrays, strings = {}, []
+    for name, values in columns.items():
+        if isinstance(values, np.ndarray):
+            arrays[name] = np.ascontiguousarray(values)
+        else:
+            strings.append(name)
+            arrays[f"{name}.data"], arrays[f"{name}.offsets"] = StringTable.encode(list(values))
+
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        offset = _aligned(offset)
+        layout[name] = [array.dtype.str, list(array.shape), offset]
+        offset += array.nbytes
+    header = json.dumps({"meta": meta, "strings": strings, "arrays": layout}).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name][2])
+                f.write(array.tobytes())
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return data_start + offset
+
+
+def file_identity(path):
+    """Changes whenever `path` is replaced; None if it doesn't exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class ColumnFile:
+    """
+    Read-only memory mapping of a file written by `write_columns`. Columns
+    are numpy views straight into the mapping, so every process mapping the
+    same file shares one copy in the page cache; the mapping stays alive for
+    as long as any view of it does.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a column file")
+        (header_len,) = struct.unpack_from("<Q", self._map, len(MAGIC))
+        header = json.loads(self._map[len(MAGIC) + 8:len(MAGIC) + 8 + header_len])
+        self._data_start = _aligned(len(MAGIC) + 8 + header_len)
+        self._layout = header["arrays"]
+        self._strings = set(header["strings"])
+        self.meta = header["meta"]
+        self.nbytes = len(self._map)
+
+    def array(self, name):
+        dtype, shape, offset = self._layout[name]
+        count = int(np.prod(shape))
+        if count == 0:
+            return np.zeros(shape, dtype=dtype)
+        array = np.frombuffer(self._map, dtype=dtype, count=count, offset=self._data_start + offset)
+        return array.reshape(shape)
+
+    def __getitem__(self, name):
+        if name in self._strings:
+            return StringTable(self.array(f"{name}.data"), self.array(f"{name}.offsets"))
+        return self.array(name)
+
+    def __contains__(self, name):
+        return name in self._strings or name in self._layout
+
+
+class LoaderLock:
+    """
+    Non-blocking exclusive lock next to the store file. The process holding
+    it builds the store; the others map it. The lock dies with its process,
+    so a follower can take over when the loader goes away.
+    """
+
+    def __init__(self, path):
+        self.path = f"{path}.lock"
+        self._file = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def try_acquire(self):
+        if self._file is not None:
+            return True
+        f = open(self.path, "a")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()  # Closing the descriptor drops the flock
+            self._file = None
@@ -0,0 +1,99 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from resilience import BREAKERS, is_client_error
+
+SUPABASE_EXECUTOR_WORKERS = int(os.environ.get("SUPABASE_EXECUTOR_WORKERS", "8"))
+
+
+class BlockingExecutor:
+    """
+    Bounded thread pool for SDK calls that have no async variant (the supabase
+    client). Keeps blocking I/O off the event loop while capping how many
+    threads one upstream can occupy, and tracks queue depth and wait time so
+    saturation is visible before it turns into latency.
+    With a `breaker` (CircuitBreaker), calls fail fast while the upstream is
+    down instead of occupying a thread, and every outcome is reported to it.
+    """
+
+    def __init__(self, max_workers, name, breaker=None):
+        self.name = name
+        self.breaker = breaker
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queued = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+
+    def _run(self, submitted_at, fn, args, kwargs):
+        started = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+            self.total_wait += started - submitted_at
+        ok = False
+        answered = True  # The upstream responded, even if with a client error
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        except Exception as e:
+            answered = is_client_error(e)
+            raise
+        finally:
+            if self.breaker:
+                self.breaker.success() if answered else self.breaker.failure()
+            with self._lock:
+                self.active -= 1
+                self.total_run += time.perf_counter() - started
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def _dropped(self, future):
+        # Cancelled before a thread picked it up (caller timed out, shutdown): _run never ran
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+            if self.breaker:
+                self.breaker.release()
+
+    async def run(self, fn, *args, **kwargs):
+        if self.breaker:
+            self.breaker.allow()
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        future = self._pool.submit(self._run, time.perf_counter(), fn, args, kwargs)
+        future.add_done_callback(self._dropped)
+        # Cancelling the awaiting coroutine cancels `future` too, if it hasn't started
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        finished = self.completed + self.failed
+        return {
+            "max_workers": self.max_workers,
+            "active": self.active,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait / finished * 1000, 2) if finished else 0.0,
+            "avg_run_ms": round(self.total_run / finished * 1000, 2) if finished else 0.0,
+        }
+
+
+# Shared by every supabase call made on the request path
+db_executor = BlockingExecutor(SUPABASE_EXECUTOR_WORKERS, "supabase", breaker=BREAKERS["supabase"])
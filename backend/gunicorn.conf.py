@@ -0,0 +1,32 @@
+"""
+gunicorn settings for running several uvicorn workers:
+
+    gunicorn main:app -c gunicorn.conf.py --workers 4 --bind 0.0.0.0:8000
+
+With PROMETHEUS_MULTIPROC_DIR set (environment or .env), every worker writes
+its metrics to files in that directory and /metrics aggregates them; the
+hooks below clear old files on start and retire the files of dead workers.
+"""
+import os
+import glob
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+worker_class = "uvicorn.workers.UvicornWorker"
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def on_starting(server):
+    if PROMETHEUS_MULTIPROC_DIR:
+        # Files from a previous run would be added to this one's counters
+        os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+        for path in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, "*.db")):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid, PROMETHEUS_MULTIPROC_DIR)
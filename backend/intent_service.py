@@ -0,0 +1,359 @@
+import os
+import re
+import json
+import time
+import asyncio
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from metrics import upstream_call
+from resilience import BREAKERS
+
+load_dotenv()
+
+INTENT_MODEL = "llama-3.3-70b-versatile"
+INTENT_CACHE_SIZE = int(os.environ.get("INTENT_CACHE_SIZE", "5000"))
+INTENT_CACHE_TTL = float(os.environ.get("INTENT_CACHE_TTL", str(7 * 24 * 3600)))
+INTENT_CACHE_PATH = os.environ.get("INTENT_CACHE_PATH")  # e.g. intent_cache.json, unset = memory only
+INTENT_CACHE_SAVE_SECONDS = 30
+INTENT_BATCH_SIZE = int(os.environ.get("INTENT_BATCH_SIZE", "20"))  # Moods per multi-mood completion
+INTENT_BATCH_TIMEOUT_SECONDS = float(os.environ.get("INTENT_BATCH_TIMEOUT_SECONDS", "20"))
+# JSONL of {"mood", "intent"} for every LLM answer, the dataset for bench/eval_local_intent.py
+INTENT_RECORD_PATH = os.environ.get("INTENT_RECORD_PATH")
+
+# Words that don't change what the mood asks for
+FILLER_WORDS = {
+    "a", "an", "the", "i", "im", "me", "my", "we", "want", "wanna", "need", "looking", "for", "to",
+    "watch", "see", "something", "some", "any", "movie", "movies", "film", "films", "tonight",
+    "today", "please", "give", "show", "recommend", "suggest", "feel", "like", "in", "of", "with",
+}
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def normalize_mood(mood_text):
+    """
+    Cache key for a mood: lowercase content words, deduplicated and sorted,
+    so "something scary" and "Scary movie tonight!" share one parse.
+    """
+    words = _WORD_RE.findall(mood_text.lower())
+    content = {w for w in words if w not in FILLER_WORDS}
+    return " ".join(sorted(content or set(words)))
+
+
+def build_prompt(mood_text):
+    return f"""
+            Analyze the user mood: "{mood_text}".
+            Return a JSON object with:
+            1. "target_genre": The single most dominant movie genre needed (e.g. Horror, Comedy, Sci-Fi, Romance). If ambiguous or mixed, use "General".
+            2. "keywords": list of 3-5 specific adjective keywords.
+            3. "search_term": A single best 1-2 word search phrase.
+            4. "target_language": The requested language (e.g. "English", "Hindi", "Telugu", "Korean", "Any"). Default to "Any" if not specified.
+
+            Example output: {{ "target_genre": "Horror", "keywords": ["scary", "dark"], "search_term": "horror", "target_language": "English" }}
+            """
+
+
+def build_batch_prompt(mood_texts):
+    moods = "\n".join(f"            {i}: {json.dumps(m)}" for i, m in enumerate(mood_texts))
+    return f"""
+            Analyze each of these user moods:
+{moods}
+            Return a JSON object with a "results" list holding one object per mood, in the same order, each with:
+            1. "index": The number of the mood it answers.
+            2. "target_genre": The single most dominant movie genre needed (e.g. Horror, Comedy, Sci-Fi, Romance). If ambiguous or mixed, use "General".
+            3. "keywords": list of 3-5 specific adjective keywords.
+            4. "search_term": A single best 1-2 word search phrase.
+            5. "target_language": The requested language (e.g. "English", "Hindi", "Telugu", "Korean", "Any"). Default to "Any" if not specified.
+
+            Example output: {{ "results": [{{ "index": 0, "target_genre": "Horror", "keywords": ["scary", "dark"], "search_term": "horror", "target_language": "English" }}] }}
+            """
+
+
+class IntentCache:
+    """
+    LRU + TTL cache of parsed intents keyed by normalized mood.
+    Each entry remembers how long the LLM took, so hits can report saved latency.
+    When `path` is set the cache is loaded from and periodically written to disk.
+    """
+
+    def __init__(self, max_size=INTENT_CACHE_SIZE, ttl=INTENT_CACHE_TTL, path=INTENT_CACHE_PATH):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()  # key -> (intent, latency, created_at)
+        self._dirty = False
+        self._last_save = time.monotonic()
+        if path:
+            self.load()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[2] > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, intent, latency):
+        self._entries[key] = (intent, latency, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self._dirty = True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                rows = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Could not load intent cache from {self.path}: {e}")
+            return
+        now = time.time()
+        for key, intent, latency, created_at in rows[-self.max_size:]:
+            if now - created_at <= self.ttl:
+                self._entries[key] = (intent, latency, created_at)
+        print(f"Loaded {len(self._entries)} cached intents from {self.path}")
+
+    def dump(self):
+        """Rows for `write`; call on the event loop, which keeps changing the entries while a thread writes"""
+        self._dirty = False
+        self._last_save = time.monotonic()
+        return [[key, intent, latency, created_at] for key, (intent, latency, created_at) in self._entries.items()]
+
+    def write(self, rows):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(rows, f)
+        os.replace(tmp_path, self.path)
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        self.write(self.dump())
+
+    def save_due(self):
+        return self._dirty and self.path and time.monotonic() - self._last_save >= INTENT_CACHE_SAVE_SECONDS
+
+
+class IntentParser:
+    """
+    Turns mood text into {target_genre, keywords, search_term, target_language}
+    with an AsyncGroq client, caching results and coalescing identical in-flight parses so
+    concurrent requests for the same mood share one completion. When a `local`
+    parser (LocalIntentParser) is confident about an uncached mood, its answer is
+    used and the LLM is skipped.
+    """
+
+    def __init__(self, groq_client, cache=None, local=None, record_path=INTENT_RECORD_PATH):
+        self.groq_client = groq_client
+        self.cache = cache if cache is not None else IntentCache()
+        self.local = local
+        self.record_path = record_path
+        self._inflight = {}
+        self._tasks = set()
+        self.local_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.saved_latency = 0.0
+
+    async def _complete(self, mood_text):
+        with BREAKERS["groq"].guard(), upstream_call("groq", "intent"):
+            chat_completion = await self.groq_client.chat.completions.create(
+                messages=[
+                    {"role": "system", "content": "You are a movie expert. Return strictly JSON."},
+                    {"role": "user", "content": build_prompt(mood_text)}
+                ],
+                model=INTENT_MODEL,
+                response_format={"type": "json_object"},
+            )
+            data = json.loads(chat_completion.choices[0].message.content)
+            if not isinstance(data, dict):
+                raise ValueError(f"Expected a JSON object, got {type(data).__name__}")
+        return data
+
+    async def _complete_batch(self, mood_texts):
+        """One completion for several moods; returns a parsed dict (or None) per mood."""
+        with BREAKERS["groq"].guard(), upstream_call("groq", "intent_batch"):
+            chat_completion = await self.groq_client.chat.completions.create(
+                messages=[
+                    {"role": "system", "content": "You are a movie expert. Return strictly JSON."},
+                    {"role": "user", "content": build_batch_prompt(mood_texts)}
+                ],
+                model=INTENT_MODEL,
+                response_format={"type": "json_object"},
+                timeout=INTENT_BATCH_TIMEOUT_SECONDS,  # Longer answer than the client's per-mood timeout
+            )
+            items = json.loads(chat_completion.choices[0].message.content).get("results", [])
+        parsed = [None] * len(mood_texts)
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            index = item.pop("index", position)
+            if isinstance(index, int) and 0 <= index < len(mood_texts) and parsed[index] is None:
+                parsed[index] = item
+        return parsed
+
+    def _local_answer(self, mood_text):
+        if self.local is None:
+            return None
+        intent, confident = self.local.parse(mood_text)
+        if not confident:
+            return None
+        self.local_hits += 1
+        return intent
+
+    def _append_records(self, lines):
+        with open(self.record_path, "a") as f:
+            f.write(lines)
+
+    async def _record(self, pairs):
+        if not self.record_path or not pairs:
+            return
+        lines = "".join(json.dumps({"mood": mood, "intent": data}) + "\n" for mood, data in pairs)
+        try:
+            await asyncio.to_thread(self._append_records, lines)
+        except Exception as e:
+            print(f"Intent record failed: {e}")
+
+    async def _save_cache(self):
+        if not self.cache.save_due():
+            return
+        rows = self.cache.dump()
+        try:
+            # Only the file write leaves the loop
+            await asyncio.to_thread(self.cache.write, rows)
+        except Exception as e:
+            print(f"Intent cache save failed: {e}")
+
+    async def _parse_uncached(self, key, mood_text):
+        started = time.perf_counter()
+        data = await self._complete(mood_text)
+        latency = time.perf_counter() - started
+        self.cache.put(key, data, latency)
+        await self._record([(mood_text, data)])
+        await self._save_cache()
+        return data
+
+    async def parse(self, mood_text):
+        """Parsed intent for `mood_text`; raises if the LLM call or its JSON fails."""
+        key = normalize_mood(mood_text)
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.saved_latency += entry[1]
+            return self._copy(entry[0])
+
+        local = self._local_answer(mood_text)
+        if local is not None:
+            return local
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return self._copy(await asyncio.shield(future))
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        # The completion runs on its own task: a caller that gives up (deadline)
+        # doesn't cancel it for the others, and a late answer still fills the cache
+        task = asyncio.create_task(self._fill(key, mood_text, future))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return self._copy(await asyncio.shield(future))
+
+    async def _fill(self, key, mood_text, future):
+        try:
+            future.set_result(await self._parse_uncached(key, mood_text))
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody was waiting
+        finally:
+            del self._inflight[key]
+
+    async def parse_many(self, mood_texts, timeout=None):
+        """
+        Parsed intents for many moods, in input order, using as few Groq calls
+        as possible: cached moods are answered directly, duplicates share one
+        slot, and the rest go out INTENT_BATCH_SIZE moods per completion.
+        Items that could not be parsed come back as the exception instead;
+        completions still running after `timeout` seconds are left to fill
+        the cache and their moods come back as asyncio.TimeoutError.
+        """
+        keys = [normalize_mood(m) for m in mood_texts]
+        resolved = {}
+        pending = {}  # key -> mood text sent to the LLM
+        for key, mood_text in zip(keys, mood_texts):
+            if key in resolved or key in pending:
+                continue
+            entry = self.cache.get(key)
+            if entry is not None:
+                self.hits += 1
+                self.saved_latency += entry[1]
+                resolved[key] = entry[0]
+            elif (local := self._local_answer(mood_text)) is not None:
+                resolved[key] = local
+            else:
+                self.misses += 1
+                pending[key] = mood_text
+
+        async def run_chunk(chunk):
+            started = time.perf_counter()
+            try:
+                parsed = await self._complete_batch([pending[key] for key in chunk])
+            except Exception as e:
+                for key in chunk:
+                    resolved[key] = e
+                return
+            latency = (time.perf_counter() - started) / len(chunk)
+            for key, data in zip(chunk, parsed):
+                if data is None:
+                    resolved[key] = ValueError("Mood missing from batch completion")
+                else:
+                    self.cache.put(key, data, latency)
+                    resolved[key] = data
+            await self._record([(pending[key], data) for key, data in zip(chunk, parsed) if data is not None])
+
+        pending_keys = list(pending)
+        chunks = [pending_keys[i:i + INTENT_BATCH_SIZE] for i in range(0, len(pending_keys), INTENT_BATCH_SIZE)]
+        tasks = [asyncio.create_task(run_chunk(chunk)) for chunk in chunks]
+        if tasks:
+            _, late = await asyncio.wait(tasks, timeout=timeout)
+            for task in late:
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        if chunks:
+            await self._save_cache()
+
+        timed_out = asyncio.TimeoutError("Intent batch completion still running at the deadline")
+        results = (resolved.get(key, timed_out) for key in keys)
+        return [r if isinstance(r, Exception) else self._copy(r) for r in results]
+
+    @staticmethod
+    def _copy(data):
+        data = dict(data)
+        if isinstance(data.get("keywords"), list):
+            data["keywords"] = list(data["keywords"])
+        return data
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "local_hits": self.local_hits,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "saved_latency_seconds": round(self.saved_latency, 3),
+            "cached_intents": len(self.cache),
+        }
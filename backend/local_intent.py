@@ -0,0 +1,185 @@
+import os
+import re
+
+from intent_service import FILLER_WORDS
+from text_index import stem
+
+# Share of a mood's content words that must be recognized before the local answer is trusted
+INTENT_LOCAL_MIN_COVERAGE = float(os.environ.get("INTENT_LOCAL_MIN_COVERAGE", "0.8"))
+INTENT_LOCAL_MAX_WORDS = 12  # Longer moods are left to the LLM
+MAX_KEYWORDS = 5
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+# Words and phrases naming a language or its film industry
+LANGUAGE_WORDS = {
+    "english": "English", "hollywood": "English",
+    "hindi": "Hindi", "bollywood": "Hindi",
+    "telugu": "Telugu", "tollywood": "Telugu",
+    "tamil": "Tamil", "kollywood": "Tamil",
+    "malayalam": "Malayalam", "mollywood": "Malayalam",
+    "kannada": "Kannada", "sandalwood": "Kannada",
+    "bengali": "Bengali", "marathi": "Marathi", "punjabi": "Punjabi",
+    "korean": "Korean", "kdrama": "Korean", "k drama": "Korean",
+    "japanese": "Japanese", "anime": "Japanese",
+    "chinese": "Mandarin", "mandarin": "Mandarin", "cantonese": "Cantonese",
+    "spanish": "Spanish", "french": "French", "italian": "Italian", "german": "German",
+    "danish": "Danish", "swedish": "Swedish", "turkish": "Turkish",
+}
+
+# Cue words (stemmed when matched) -> genre
+GENRE_WORDS = {
+    "Horror": ["horror", "scary", "scare", "spooky", "creepy", "terrifying", "haunted", "ghost", "zombie", "slasher"],
+    "Comedy": ["comedy", "funny", "hilarious", "laugh", "comic", "silly", "goofy"],
+    "Action": ["action", "explosive", "fight", "adrenaline", "martial", "shootout"],
+    "Romance": ["romance", "romantic", "romcom", "love", "date night"],
+    "Sci-Fi": ["scifi", "sci fi", "science fiction", "space", "futuristic", "alien", "robot", "cyberpunk"],
+    "Thriller": ["thriller", "suspense", "suspenseful", "tense", "gripping", "edge of my seat"],
+    "Drama": ["drama", "dramatic"],
+    "Animation": ["animation", "animated", "cartoon", "pixar", "anime"],
+    "Fantasy": ["fantasy", "magic", "magical", "dragon", "wizard", "fairy tale"],
+    "Crime": ["crime", "heist", "gangster", "mafia", "detective", "noir"],
+    "Mystery": ["mystery", "whodunit"],
+    "Documentary": ["documentary", "docu", "true story"],
+    "Biography": ["biopic", "biography"],
+    "Musical": ["musical"],
+    "Western": ["western", "cowboy"],
+    "War": ["war movie", "war film"],
+}
+
+# Mood words -> mood tags worth adding when the catalog uses them
+SYNONYMS = {
+    "scary": ["scary", "dark", "supernatural"],
+    "funny": ["funny", "quirky", "feel-good"],
+    "sad": ["sad", "emotional", "bittersweet"],
+    "cry": ["sad", "emotional"],
+    "happy": ["feel-good", "wholesome", "hopeful"],
+    "uplifting": ["inspiring", "hopeful", "feel-good"],
+    "motivating": ["inspiring", "sports"],
+    "cozy": ["cozy", "wholesome", "family"],
+    "chill": ["cozy", "feel-good"],
+    "dark": ["dark", "gritty"],
+    "intense": ["intense", "suspense"],
+    "mind": ["mind-bending", "psychological"],
+    "weird": ["quirky", "mind-bending"],
+    "old": ["classic", "nostalgic"],
+    "epic": ["epic"],
+}
+
+# Words that flip or qualify what follows; the LLM handles these
+NEGATIONS = {"not", "no", "without", "dont", "don", "nothing", "avoid", "except", "but", "instead", "neither", "nor"}
+
+IGNORED_WORDS = FILLER_WORDS | {
+    "really", "very", "so", "kind", "sort", "mood", "vibe", "vibes", "night", "evening", "weekend", "and", "or",
+    "something", "about", "is", "are", "be", "am", "that", "this", "get", "make", "makes", "feeling", "up", "on",
+    "good", "great", "nice", "best", "cool", "watching", "type", "one", "ones", "bit", "little",
+}
+
+
+def _phrases(words, max_len=3):
+    """(start, end, phrase) for every run of up to `max_len` words, longest first."""
+    for length in range(max_len, 0, -1):
+        for start in range(len(words) - length + 1):
+            yield start, start + length, " ".join(words[start:start + length])
+
+
+class LocalIntentParser:
+    """
+    On-box mood parser: language and genre lexicons plus the catalog's own
+    mood tags, matched on stemmed words and short phrases. `parse` returns
+    the intent and whether it is confident, i.e. every signal agrees, nothing
+    is negated and nearly every content word was recognized. Unconfident
+    moods should go to the LLM.
+    `catalog_source` returns the current catalog snapshot (anything with
+    `version` and `mood_tags`); the tag vocabulary is rebuilt when it changes.
+    """
+
+    def __init__(self, catalog_source=None, min_coverage=INTENT_LOCAL_MIN_COVERAGE):
+        self.catalog_source = catalog_source
+        self.min_coverage = min_coverage
+        self._vocab_version = object()
+        self.tag_phrases = {}  # stemmed phrase -> catalog tag
+        self.language_phrases = {self._key(p): lang for p, lang in LANGUAGE_WORDS.items()}
+        self.genre_phrases = {self._key(p): genre for genre, cues in GENRE_WORDS.items() for p in cues}
+        self.synonyms = {self._key(w): tags for w, tags in SYNONYMS.items()}
+        self.confident = 0
+        self.unconfident = 0
+
+    @staticmethod
+    def _key(phrase):
+        return " ".join(stem(w) for w in _WORD_RE.findall(phrase.lower()))
+
+    def set_vocabulary(self, tags):
+        self.tag_phrases = {self._key(tag): tag.lower() for tag in tags if _WORD_RE.search(tag)}
+
+    def _refresh_vocabulary(self):
+        snapshot = self.catalog_source() if self.catalog_source else None
+        if snapshot is None or snapshot.version == self._vocab_version:
+            return
+        self.set_vocabulary(getattr(snapshot, "mood_tags", ()))
+        self._vocab_version = snapshot.version
+
+    def parse(self, mood_text):
+        """(intent dict shaped like the LLM's answer, confident)"""
+        self._refresh_vocabulary()
+        words = _WORD_RE.findall(mood_text.lower())
+        stems = [stem(w) for w in words]
+
+        languages, genres, keywords = [], [], []
+        covered = [False] * len(words)
+        for start, end, phrase in _phrases(stems):
+            if any(covered[start:end]):
+                continue
+            language = self.language_phrases.get(phrase)
+            genre = self.genre_phrases.get(phrase)
+            tag = self.tag_phrases.get(phrase)
+            extras = [t for t in self.synonyms.get(phrase, ()) if self._key(t) in self.tag_phrases]
+            if language is None and genre is None and tag is None and not extras:
+                continue
+            covered[start:end] = [True] * (end - start)
+            if language is not None and language not in languages:
+                languages.append(language)
+            if genre is not None and genre not in genres:
+                genres.append(genre)
+            if tag is not None:
+                keywords.append(tag)
+            elif genre is not None and end - start > 1:
+                keywords.append(genre.lower())  # "sci fi" -> "sci-fi", "war movie" -> "war"
+            elif genre is not None or language is None:
+                # Genre cues double as keywords ("scary" also scores mood tags/text)
+                keywords.append(words[start])
+            keywords.extend(extras)
+
+        content = [i for i, w in enumerate(words) if w not in IGNORED_WORDS]
+        unknown = [words[i] for i in content if not covered[i]]
+        keywords.extend(unknown)
+        keywords = list(dict.fromkeys(keywords))[:MAX_KEYWORDS] or [w for w in words if w not in IGNORED_WORDS][:MAX_KEYWORDS]
+
+        coverage = (len(content) - len(unknown)) / len(content) if content else 0.0
+        confident = (
+            bool(content)
+            and len(content) <= INTENT_LOCAL_MAX_WORDS
+            and coverage >= self.min_coverage
+            and len(genres) <= 1
+            and len(languages) <= 1
+            and not NEGATIONS.intersection(words)
+        )
+        if confident:
+            self.confident += 1
+        else:
+            self.unconfident += 1
+
+        intent = {
+            "target_genre": genres[0] if len(genres) == 1 else "General",
+            "keywords": keywords,
+            "search_term": " ".join(keywords[:2]),
+            "target_language": languages[0] if len(languages) == 1 else "Any",
+        }
+        return intent, confident
+
+    def stats(self):
+        return {
+            "confident": self.confident,
+            "unconfident": self.unconfident,
+            "vocabulary": len(self.tag_phrases),
+        }
@@ -1,18 +1,37 @@
 from fastapi import FastAPI, HTTPException, Body, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
 import os
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from groq import Groq
-import json
+from supabase import create_client, Client, ClientOptions
+from groq import AsyncGroq
 import asyncio
-from watchmode_service import get_streaming_info
+from watchmode_service import WatchmodeService
+from catalog_service import CatalogService, RemoteCatalog, CATALOG_MODE
+from executor import db_executor
+from intent_service import IntentParser
+from local_intent import LocalIntentParser
+from profile_service import ProfileService
+from recommendation_log import RecommendationLog, RECOMMENDATION_LOG_ENABLED
+from response_cache import ResultCache, CatalogDerivedBody, dumps, etag_matches
+from auth_service import (
+    TokenVerifier, TokenError, AuthenticatedUser, api_key_role, SUPABASE_JWT_SECRET, SUPABASE_JWKS_URL,
+)
+import metrics
+from metrics import stage, upstream_call, fallback
+from resilience import (
+    BREAKERS, AdmissionMiddleware, admission, within, stage_timeout, remaining,
+    INTENT_TIMEOUT_SECONDS, INTENT_RESERVE_SECONDS, STREAMING_TIMEOUT_SECONDS, DB_TIMEOUT_SECONDS,
+    BATCH_DEADLINE_SECONDS, BATCH_RESERVE_SECONDS,
+)
 
 load_dotenv()
 
 app = FastAPI()
 
+# Load shedding and per-request deadlines for the recommendation routes (innermost, inside CORS)
+app.add_middleware(AdmissionMiddleware)
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -20,35 +39,151 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
+# Per-request stage timings (Server-Timing header, /metrics histograms)
+app.add_middleware(metrics.TimingMiddleware)
 
 # Initialize Clients
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
 groq_api_key: str = os.environ.get("GROQ_API_KEY")
 
+# Seconds the streaming endpoint waits for Watchmode after sending results
+STREAM_ENRICH_DEADLINE = float(os.environ.get("STREAM_ENRICH_DEADLINE", "3"))
+MAX_BATCH_MOODS = int(os.environ.get("MAX_BATCH_MOODS", "500"))
+# Rankings one batch runs at once; the rest wait, so /recommend's rankings don't queue behind a whole batch
+BATCH_RANK_CONCURRENCY = int(os.environ.get("BATCH_RANK_CONCURRENCY", "4"))
+
 supabase: Client = None
 if url and key:
-    supabase = create_client(url, key)
+    supabase = create_client(url, key, options=ClientOptions(postgrest_client_timeout=DB_TIMEOUT_SECONDS))
+
+# Answers clear-cut moods on-box; also the fallback when Groq is down or not configured
+local_intent = LocalIntentParser(lambda: catalog.snapshot if catalog else None)
 
 groq_client = None
+intent_parser: IntentParser = None
 if groq_api_key:
-    groq_client = Groq(api_key=groq_api_key)
+    # No SDK retries: a retry wouldn't fit the request's deadline, and the breaker counts failures instead
+    groq_client = AsyncGroq(api_key=groq_api_key, timeout=INTENT_TIMEOUT_SECONDS, max_retries=0)
+    intent_parser = IntentParser(groq_client, local=local_intent)
+
+async def _remote_get_user(token):
+    # Only used for tokens signed with a key we can't verify locally
+    with upstream_call("supabase", "get_user"):
+        res = await db_executor.run(supabase.auth.get_user, token)
+    if not res or not res.user:
+        return None
+    return AuthenticatedUser(id=res.user.id, email=res.user.email, role=res.user.role)
+
+
+token_verifier = TokenVerifier(
+    secret=SUPABASE_JWT_SECRET,
+    jwks_url=SUPABASE_JWKS_URL,
+    remote_verify=_remote_get_user if supabase else None,
+)
+
+catalog: CatalogService = None
+if supabase:
+    # rpc mode ranks inside Postgres (supabase/migrations/*_movie_ranking.sql) instead of loading the table
+    catalog = RemoteCatalog(supabase) if CATALOG_MODE == "rpc" else CatalogService(supabase)
+
+# Per-user preference profiles from ratings and watchlist, kept current in the background
+profiles: ProfileService = None
+if supabase:
+    profiles = ProfileService(supabase, lambda: catalog.snapshot)
+
+# Served recommendations, written to movie_recommendations in background batches. The table has
+# RLS on and no policies, so only the service role key can insert; with another key every batch
+# would be denied, spilled and replayed again on each start
+recommendation_log: RecommendationLog = None
+if supabase and RECOMMENDATION_LOG_ENABLED:
+    if api_key_role(key) in (None, "service_role"):
+        recommendation_log = RecommendationLog(supabase)
+    else:
+        print(f"Recommendation log off: movie_recommendations only accepts inserts from the service role key "
+              f"(SUPABASE_KEY is {api_key_role(key)!r})")
+
+
+async def _store_watchmode_id(title, watchmode_id):
+    # Lets later lookups skip the Watchmode search call entirely; returns how many rows took the id
+    # (RLS turns a denied update into 0 rows, not an error)
+    with upstream_call("supabase", "store_watchmode_id"):
+        res = await db_executor.run(
+            lambda: supabase.table("movies").update({"watchmode_id": str(watchmode_id)}, returning="representation")
+            .eq("title", title).is_("watchmode_id", "null").execute()
+        )
+    return len(res.data or [])
+
+
+watchmode = WatchmodeService(id_writer=_store_watchmode_id if supabase else None)
+_background_tasks = set()
+
+# Serialized once per catalog version; non-personalized /recommend bodies by resolved intent
+database_info_body = CatalogDerivedBody(lambda snapshot: snapshot.database_info())
+result_cache = ResultCache()
+
+metrics.register_stats({
+    "supabase_executor": db_executor.stats,
+    "catalog": catalog.stats if catalog else None,
+    "auth": token_verifier.stats,
+    "intent": intent_parser.stats if intent_parser else None,
+    "local_intent": local_intent.stats,
+    "watchmode": watchmode.stats,
+    "profiles": profiles.stats if profiles else None,
+    "recommendation_log": recommendation_log.stats if recommendation_log else None,
+    "result_cache": result_cache.stats,
+    "admission": admission.stats,
+    **{f"breaker_{name}": breaker.stats for name, breaker in BREAKERS.items()},
+})
+
+
+@app.on_event("startup")
+async def startup():
+    if catalog:
+        await catalog.start()
+    if profiles:
+        # After the catalog, so rated titles resolve from the snapshot
+        await profiles.start()
+    if recommendation_log:
+        await recommendation_log.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if catalog:
+        await catalog.stop()
+    if profiles:
+        await profiles.stop()
+    if recommendation_log:
+        # Before the executor goes away; unsent rows are inserted or spilled
+        await recommendation_log.stop()
+    await watchmode.close()
+    if groq_client:
+        await groq_client.close()
+    db_executor.shutdown()
+    if intent_parser:
+        intent_parser.cache.save()
 
 class MoodRequest(BaseModel):
     mood: str
 
+class BatchMoodRequest(BaseModel):
+    moods: list[str]
+    enrich: bool = True # Skip Watchmode lookups when only rankings are needed
+
 async def verify_token(authorization: str = Header(None)):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Authentication required")
     
     token = authorization.split(" ")[1]
     try:
-        # Use the supabase client to verify the user
-        res = supabase.auth.get_user(token)
-        if not res or not res.user:
-            raise HTTPException(status_code=401, detail="Invalid or expired token")
-        return res.user
+        # Verified locally against the cached signing keys
+        with stage("auth"):
+            return await token_verifier.verify(token)
+    except TokenError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
     except Exception as e:
         print(f"Auth Error: {e}")
         raise HTTPException(status_code=401, detail="Authentication failed")
@@ -58,218 +193,363 @@ async def verify_token(authorization: str = Header(None)):
 def read_root():
     return {"message": "Vibe Movie Recommender API Running (Groq Powered)"}
 
+@app.get("/stats")
+async def stats(user: any = Depends(verify_token)):
+    """Cache hit/miss counters and executor queue metrics"""
+    return {
+        "supabase_executor": db_executor.stats(),
+        "catalog": catalog.stats() if catalog else None,
+        "auth": token_verifier.stats(),
+        "intent": intent_parser.stats() if intent_parser else None,
+        "local_intent": local_intent.stats(),
+        "watchmode": watchmode.stats(),
+        "profiles": profiles.stats() if profiles else None,
+        "recommendation_log": recommendation_log.stats() if recommendation_log else None,
+        "result_cache": result_cache.stats(),
+        "admission": admission.stats(),
+        "breakers": {name: breaker.stats() for name, breaker in BREAKERS.items()},
+    }
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus scrape endpoint (stage/upstream latency histograms, error and fallback counters)"""
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
 @app.get("/database-info")
-async def database_info(user: any = Depends(verify_token)):
-    """Get information about available movies in the database"""
+async def database_info(request: Request, user: any = Depends(verify_token)):
+    """Get information about available movies in the database (304 while the client's ETag is current)"""
     if not supabase:
         raise HTTPException(status_code=500, detail="Supabase not configured")
     
     try:
-        response = supabase.table("movies").select("*").execute()
-        all_movies = response.data
-        
-        genres = {}
-        languages = set()
-        
-        for movie in all_movies:
-            # Count by genre
-            genre = movie.get('genre', 'Unknown')
-            genres[genre] = genres.get(genre, 0) + 1
-            
-            # Collect languages
-            movie_langs = movie.get('languages', [])
-            if isinstance(movie_langs, list):
-                for lang in movie_langs:
-                    languages.add(lang)
-        
-        return {
-            "total_movies": len(all_movies),
-            "genres": genres,
-            "languages": sorted(list(languages)),
-            "sample_movies": [m['title'] for m in all_movies[:10]]
-        }
+        with stage("catalog"):
+            snapshot = await catalog.get_snapshot()
+        body, etag = database_info_body.get(snapshot)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def sanitize_mood(raw_mood):
+    return "".join(c for c in raw_mood if ord(c) >= 32)[:300]
+
+
+def intent_fields(mood_text, data=None, error=None):
+    """(keywords, target_genre, target_language) from a parsed intent, or the keyword fallback"""
+    keywords = []
+    target_genre = None
+    target_language = "Any" # Default to Any
+
+    if error is not None:
+        print(f"Groq AI Error: {error}")
+        fallback("intent_error")
+        # On-box parse instead of the LLM's
+        data, _ = local_intent.parse(mood_text)
+
+    if data is not None:
+        keywords = data.get("keywords", [])
+        target_genre = data.get("target_genre", "General")
+        target_language = data.get("target_language", "Any")
+        if error is None:
+            print(f"AI Analysis: {data}")
+
+    if not keywords: 
+        keywords = mood_text.split()
+
+    return keywords, target_genre, target_language
+
+
+async def parse_mood(mood_text):
+    """Returns (keywords, target_genre, target_language) for the mood text"""
+    # Use Groq AI to parse mood (cached by normalized mood)
+    if not intent_parser:
+        return intent_fields(mood_text, data=local_intent.parse(mood_text)[0])
+    with stage("intent"):
+        try:
+            # Leaves part of the budget for ranking; a timed-out parse still lands in the cache
+            data = await within(intent_parser.parse(mood_text), INTENT_TIMEOUT_SECONDS, INTENT_RESERVE_SECONDS)
+            return intent_fields(mood_text, data=data)
+        except Exception as e:
+            return intent_fields(mood_text, error=e)
+
+
+def user_profile(user):
+    """The user's precomputed preference profile, or None (in-memory lookup, never a query)"""
+    return profiles.get(user.id) if profiles and user else None
+
+
+def log_served(user, scored_movies, keywords, target_genre, target_language, personalized):
+    if recommendation_log and user:
+        # Queued only; written to movie_recommendations in the background
+        recommendation_log.record(user.id, scored_movies, {
+            "keywords": keywords,
+            "target_genre": target_genre,
+            "target_language": target_language,
+            "personalized": personalized,
+        })
+
+
+async def build_recommendation(snapshot, keywords, target_genre, target_language, profile=None):
+    """
+    Ranked response body for one parsed mood, before Watchmode enrichment,
+    and the (score, movie) pairs it serves
+    """
+    # Top-k with duplicate titles dropped (in-process vectorized scoring, or the rank_movies RPC),
+    # blended with the user's profile and without titles they already watched
+    scored_movies = await catalog.rank(snapshot, keywords, target_genre, target_language, limit=10, profile=profile)
+    top_movies = [movie for _, movie in scored_movies]
+
+    # Better Fallback - show available database content
+    available_genres = snapshot.available_genres
+    available_languages = snapshot.available_languages
+
+    # If no matches, return message with database info
+    if not top_movies:
+        print(f"No strong matches found. Available genres: {available_genres}")
+        fallback("no_matches")
+
+    return {
+        # Copy so enrichment never mutates the shared catalog snapshot
+        "movies": [dict(m) for m in top_movies[:6]],
+        "generated_new": False, # Recommendations come from the database only (No AI Generation)
+        "target_genre": target_genre,
+        "target_language": target_language,
+        "match_type": "exact" if top_movies else "none",
+        "personalized": profile is not None,
+        "available_genres": available_genres,
+        "available_languages": available_languages,
+        "total_in_db": len(snapshot)
+    }, scored_movies[:6]
+
+
+async def enrich_movie(movie):
+    real_ott = await watchmode.get_streaming_info(movie['title'], movie.get('watchmode_id'))
+    if real_ott:
+        movie['ott'] = real_ott
+    return real_ott
+
+
+def _keep_running(task):
+    # Lookups past the deadline keep running so their answer lands in the cache
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def enrich_within(lookups, cap=STREAMING_TIMEOUT_SECONDS):
+    """
+    Runs (coroutine, movies) Watchmode lookups for up to `cap` seconds, less if the
+    request's budget runs out first. Movies whose lookup was cut off get
+    "ott_timed_out": true; returns how many lookups were cut off.
+    """
+    tasks = {_keep_running(asyncio.create_task(coro)): movies for coro, movies in lookups}
+    if not tasks:
+        return 0
+    _, pending = await asyncio.wait(tasks, timeout=stage_timeout(cap))
+    if pending:
+        fallback("enrich_deadline")
+    for task in pending:
+        for movie in tasks[task]:
+            movie['ott_timed_out'] = True
+    return len(pending)
+
+
+async def load_snapshot():
+    with stage("catalog"):
+        return await within(catalog.get_snapshot(), DB_TIMEOUT_SECONDS)
+
+
+async def rank_within(snapshot, keywords, target_genre, target_language, user=None):
+    """Ranks for the user (personalized, logged to their history), see build_recommendation"""
+    profile = user_profile(user)
+    with stage("scoring"):
+        result, scored_movies = await within(
+            build_recommendation(snapshot, keywords, target_genre, target_language, profile), DB_TIMEOUT_SECONDS
+        )
+    log_served(user, scored_movies, keywords, target_genre, target_language, profile is not None)
+    return result, scored_movies
 
 
 @app.post("/recommend")
 async def recommend_movies(request: MoodRequest, user: any = Depends(verify_token)):
     # Sanitize input
-    mood_text = "".join(c for c in request.mood if ord(c) >= 32)[:300]
+    mood_text = sanitize_mood(request.mood)
     print(f"\n--- REQUEST RECEIVED: {mood_text[:50]} ---")
     
     if not supabase:
         print("Supabase not configured, raising HTTPException.")
         raise HTTPException(status_code=500, detail="Supabase not configured")
 
-    keywords = []
-    target_genre = None
-    target_language = "Any" # Default to Any
+    keywords, target_genre, target_language = await parse_mood(mood_text)
+
+    # Score against the catalog snapshot
+    try:
+        snapshot = await load_snapshot()
+        # Without a profile the body depends only on the resolved intent and the catalog version
+        cache_key = ResultCache.key(keywords, target_genre, target_language) if user_profile(user) is None else None
+        cached = result_cache.get(snapshot.version, cache_key) if cache_key else None
+        if cached is not None:
+            log_served(user, cached.scored, keywords, target_genre, target_language, False)
+            return Response(cached.body, media_type="application/json")
+
+        result, scored_movies = await rank_within(snapshot, keywords, target_genre, target_language, user)
+
+        # --- WATCHMODE ENRICHMENT (whatever finishes within the deadline) ---
+        with stage("enrich"):
+            cut_off = await enrich_within((enrich_movie(m), [m]) for m in result["movies"])
+        body = dumps(result)
+        if cache_key and not cut_off:
+            # Bodies missing streaming info aren't kept, the next request may get it all
+            result_cache.put(snapshot.version, cache_key, body, scored_movies)
+        return Response(body, media_type="application/json")
+
+    except Exception as e:
+        print(f"Db Error: {e!r}")
+        fallback("db_error")
+        return {"movies": [], "error": str(e)}
+
+
+def _ndjson(event):
+    return dumps(event) + b"\n"
+
+
+@app.post("/recommend/stream")
+async def recommend_movies_stream(request: MoodRequest, user: any = Depends(verify_token)):
+    """
+    NDJSON variant of /recommend. Emits, one JSON object per line:
+    {"type": "intent"}, then {"type": "results"} with the ranked movies,
+    then one {"type": "ott", "index": i} patch per finished Watchmode lookup,
+    and finally {"type": "done"} listing lookups cut off by the deadline.
+    """
+    mood_text = sanitize_mood(request.mood)
+    print(f"\n--- STREAM REQUEST RECEIVED: {mood_text[:50]} ---")
+
+    if not supabase:
+        raise HTTPException(status_code=500, detail="Supabase not configured")
+
+    async def events():
+        keywords, target_genre, target_language = await parse_mood(mood_text)
+        yield _ndjson({
+            "type": "intent",
+            "keywords": keywords,
+            "target_genre": target_genre,
+            "target_language": target_language,
+        })
 
-    # 1. Use Groq AI to parse mood
-    if groq_client:
         try:
-            prompt = f"""
-            Analyze the user mood: "{mood_text}".
-            Return a JSON object with:
-            1. "target_genre": The single most dominant movie genre needed (e.g. Horror, Comedy, Sci-Fi, Romance). If ambiguous or mixed, use "General".
-            2. "keywords": list of 3-5 specific adjective keywords.
-            3. "search_term": A single best 1-2 word search phrase.
-            4. "target_language": The requested language (e.g. "English", "Hindi", "Telugu", "Korean", "Any"). Default to "Any" if not specified.
-            
-            Example output: {{ "target_genre": "Horror", "keywords": ["scary", "dark"], "search_term": "horror", "target_language": "English" }}
-            """
-            chat_completion = groq_client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": "You are a movie expert. Return strictly JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                model="llama-3.3-70b-versatile",
-                response_format={"type": "json_object"}, 
-            )
-            
-            content = chat_completion.choices[0].message.content
-            data = json.loads(content)
-            keywords = data.get("keywords", [])
-            target_genre = data.get("target_genre", "General")
-            target_language = data.get("target_language", "Any")
-            print(f"AI Analysis: {data}")
-            
+            snapshot = await load_snapshot()
+            result, _ = await rank_within(snapshot, keywords, target_genre, target_language, user)
         except Exception as e:
-            print(f"Groq AI Error: {e}")
-            keywords = mood_text.split()
-            target_genre = "General"
-            target_language = "Any"
+            print(f"Db Error: {e!r}")
+            fallback("db_error")
+            yield _ndjson({"type": "error", "error": str(e)})
+            return
+        yield _ndjson({"type": "results", **result})
 
-    if not keywords: 
-        keywords = mood_text.split()
+        # --- WATCHMODE ENRICHMENT (streamed as it completes) ---
+        loop = asyncio.get_running_loop()
+        left = remaining()
+        deadline = loop.time() + (STREAM_ENRICH_DEADLINE if left is None else min(STREAM_ENRICH_DEADLINE, left))
+        pending = {}
+        for index, movie in enumerate(result["movies"]):
+            pending[_keep_running(asyncio.create_task(enrich_movie(movie)))] = index
+
+        while pending:
+            wait = deadline - loop.time()
+            if wait <= 0:
+                break
+            done, _ = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = pending.pop(task)
+                ott = task.result()
+                if ott:
+                    yield _ndjson({"type": "ott", "index": index, "title": result["movies"][index]["title"], "ott": ott})
+
+        yield _ndjson({"type": "done", "timed_out": sorted(pending.values())})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/recommend/batch")
+async def recommend_movies_batch(request: BatchMoodRequest, user: any = Depends(verify_token)):
+    """
+    Recommendations for many moods at once (digests, homepage precompute).
+    Moods are parsed in as few Groq calls as possible, scored against one
+    catalog snapshot, and each distinct title is looked up on Watchmode once.
+    Results come back in input order; a failing mood gets an "error" entry
+    instead of failing the batch. Movies whose lookup didn't finish before
+    the batch deadline carry "ott_timed_out": true. Rankings are not personalized for the caller
+    or written to their recommendation history.
+    """
+    if not supabase:
+        raise HTTPException(status_code=500, detail="Supabase not configured")
+    if len(request.moods) > MAX_BATCH_MOODS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_MOODS} moods per batch")
+
+    mood_texts = [sanitize_mood(m) for m in request.moods]
+    print(f"\n--- BATCH REQUEST RECEIVED: {len(mood_texts)} moods ---")
 
-    # 2. Query Database (No AI Generation)
-    generated_new = False
+    valid = [i for i, m in enumerate(mood_texts) if m.strip()]
+    parsed = [None] * len(mood_texts)
+    if intent_parser and valid:
+        with stage("intent"):
+            # Moods still unparsed at the deadline fall back to the on-box parser
+            timeout = stage_timeout(BATCH_DEADLINE_SECONDS, BATCH_RESERVE_SECONDS)
+            for i, data in zip(valid, await intent_parser.parse_many([mood_texts[i] for i in valid], timeout)):
+                parsed[i] = data
 
-    # 3. Query Supabase
     try:
-        response = supabase.table("movies").select("*").execute()
-        all_movies = response.data
-        
-        scored_movies = []
-        non_english_triggers = ["bollywood", "tollywood", "hindi", "telugu", "tamil", "kannada", "malayalam", "korean", "japanese", "spanish", "french"]
-
-        for movie in all_movies:
-            score = 0
-            movie_features = set()
-            if movie['genre']: movie_features.add(movie['genre'].lower())
-            if movie['mood_tags']: 
-                for t in movie['mood_tags']: movie_features.add(t.lower())
-                
-            full_text = (f"{movie['title']} {movie['description'] or ''} {movie['genre'] or ''}").lower()
-            title_lower = movie['title'].lower()
-
-            # Improved Scoring Logic
-            for k in keywords:
-                k_lower = k.lower()
-                # Mood tag match (highest priority for vibe)
-                if k_lower in movie_features:
-                    score += 7
-                # Title match (important for specific movie requests)
-                elif k_lower in title_lower:
-                    score += 5
-                # Description match (contextual relevance)
-                elif k_lower in full_text:
-                    score += 2
-            
-            # Genre match (strong signal)
-            if target_genre and target_genre.lower() != "general":
-                 if target_genre.lower() in (movie['genre'] or '').lower():
-                     score += 10
-                 elif (movie['genre'] or '').lower().startswith(target_genre.lower()):
-                     score += 8
-
-            # --- LANGUAGE LOGIC (STRICT) ---
-            movie_langs = movie.get('languages') or []
-            if isinstance(movie_langs, str): movie_langs = [movie_langs] # Fallback
-            movie_langs = [l.lower() for l in movie_langs]
-            
-            if target_language and target_language.lower() != "any":
-                req_lang = target_language.lower()
-                
-                # Case 1: English Requested
-                if req_lang == "english":
-                    # If it has English in its list of languages, it's good
-                    if "english" in movie_langs:
-                        score += 5
-                    # If it has NO English but has other languages, it's a mismatch
-                    elif len(movie_langs) > 0:
-                        score = -100
-                    # Safety loop for description triggers
-                    elif any(t in full_text for t in non_english_triggers):
-                        score = -100
-                
-                # Case 2: Specific Foreign Language Requested (e.g., Telugu)
-                elif req_lang in movie_langs:
-                    # NATIVE BOOST: If it's the original language, give massive priority
-                    movie_orig = (movie.get('original_language') or '').lower()
-                    if req_lang == movie_orig:
-                        score += 50
-                    else:
-                        score += 5
-                
-                # Case 3: Foreign requested, but movie doesn't support it
-                elif req_lang in non_english_triggers:
-                    if len(movie_langs) > 0 and req_lang not in movie_langs:
-                        score = -100 # Strict separation
-
-            if score > 0:
-                scored_movies.append((score, movie))
-        
-        # Sort by score descending
-        scored_movies.sort(key=lambda x: x[0], reverse=True)
-        
-        # Dedup and Limit
-        seen_titles = set()
-        top_movies = []
-        for score, movie in scored_movies:
-            if movie['title'] not in seen_titles:
-                top_movies.append(movie)
-                seen_titles.add(movie['title'])
-            if len(top_movies) >= 10: break
-        
-        # Better Fallback - show available database content
-        available_genres = set()
-        available_languages = set()
-        for m in all_movies:
-            if m.get('genre'): available_genres.add(m['genre'])
-            if m.get('languages'):
-                for lang in m['languages']:
-                    available_languages.add(lang)
-        
-        # If no matches, return message with database info
-        if not top_movies:
-            print(f"No strong matches found. Available genres: {available_genres}")
-            # Return best-scored movies even if score is low
-            if scored_movies:
-                top_movies = [movie for _, movie in scored_movies[:6]]
-
-        # --- WATCHMODE ENRICHMENT ---
-        final_movies = top_movies[:6]
-        async def enrich_movie(movie):
-            real_ott = await get_streaming_info(movie['title'])
+        snapshot = await load_snapshot()
+    except Exception as e:
+        print(f"Db Error: {e!r}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # Rankings run off the event loop (worker threads, or rpc round trips), a few at a time
+    rank_slots = asyncio.Semaphore(BATCH_RANK_CONCURRENCY)
+
+    async def recommend_one(i, mood_text):
+        if not mood_text.strip():
+            return {"mood": request.moods[i], "error": "Empty mood"}
+        data = parsed[i]
+        if isinstance(data, Exception):
+            fields = intent_fields(mood_text, error=data)
+        elif data is None:
+            # No Groq: the on-box parse, as /recommend does
+            fields = intent_fields(mood_text, data=local_intent.parse(mood_text)[0])
+        else:
+            fields = intent_fields(mood_text, data=data)
+        try:
+            # Neither personalized nor logged to the caller's history: batches run for digests
+            # and precompute jobs, and nobody has been shown these yet
+            async with rank_slots:
+                result, _ = await build_recommendation(snapshot, *fields)
+            return {"mood": request.moods[i], **result}
+        except Exception as e:
+            print(f"Batch item error for {mood_text[:50]}: {e}")
+            return {"mood": request.moods[i], "error": str(e)}
+
+    with stage("scoring"):
+        results = await asyncio.gather(*[recommend_one(i, m) for i, m in enumerate(mood_texts)])
+
+    # --- WATCHMODE ENRICHMENT (once per distinct title) ---
+    if request.enrich:
+        by_title = {}
+        for result in results:
+            for movie in result.get("movies", []):
+                by_title.setdefault(movie['title'], []).append(movie)
+
+        async def enrich_title(title, movies):
+            real_ott = await watchmode.get_streaming_info(title, movies[0].get('watchmode_id'))
             if real_ott:
-                movie['ott'] = real_ott
-        
-        await asyncio.gather(*[enrich_movie(m) for m in final_movies])
+                for movie in movies:
+                    movie['ott'] = real_ott
 
-        return {
-            "movies": final_movies,
-            "generated_new": generated_new,
-            "target_genre": target_genre,
-            "target_language": target_language,
-            "match_type": "exact" if top_movies else "none",
-            "available_genres": list(available_genres),
-            "available_languages": list(available_languages),
-            "total_in_db": len(all_movies)
-        }
+        with stage("enrich"):
+            # Hundreds of titles don't fit the per-request streaming cap; use what's left of the batch budget
+            await enrich_within(((enrich_title(t, ms), ms) for t, ms in by_title.items()), BATCH_DEADLINE_SECONDS)
 
-    except Exception as e:
-        print(f"Db Error: {e}")
-        return {"movies": [], "error": str(e)}
+    return Response(dumps({"results": results}), media_type="application/json")
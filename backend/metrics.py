@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import random
+import contextvars
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+# Before prometheus_client: it picks in-process or multiprocess-file values when imported,
+# so PROMETHEUS_MULTIPROC_DIR from .env has to be in the environment by then
+load_dotenv()
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", "1.0"))
+SLOW_REQUEST_SAMPLE_RATE = float(os.environ.get("SLOW_REQUEST_SAMPLE_RATE", "0.1"))
+# Set when running several gunicorn workers so /metrics aggregates all of them
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Upstream calls sit between ~1ms (cache-warm Supabase) and several seconds (Groq)
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_SECONDS = Histogram(
+    "cinevibe_request_seconds", "End-to-end request latency", ["route", "method", "status"], buckets=_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "cinevibe_stage_seconds", "Time spent in each request stage", ["stage"], buckets=_BUCKETS,
+)
+UPSTREAM_SECONDS = Histogram(
+    "cinevibe_upstream_seconds", "Latency of calls to external services", ["upstream", "operation"], buckets=_BUCKETS,
+)
+UPSTREAM_ERRORS = Counter(
+    "cinevibe_upstream_errors_total", "Failed calls to external services", ["upstream", "operation"],
+)
+FALLBACKS = Counter(
+    "cinevibe_fallbacks_total", "Requests served with a degraded answer", ["reason"],
+)
+
+_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Stage durations for one request, in the order the stages first ran."""
+
+    __slots__ = ("started", "stages")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def server_timing(self, total):
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+@contextmanager
+def stage(name):
+    """Times a block as a request stage (histogram + this request's Server-Timing)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings.add(name, elapsed)
+
+
+@contextmanager
+def upstream_call(upstream, operation):
+    """Times one call to an external service and counts it if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_ERRORS.labels(upstream, operation).inc()
+        raise
+    finally:
+        UPSTREAM_SECONDS.labels(upstream, operation).observe(time.perf_counter() - started)
+
+
+def fallback(reason):
+    FALLBACKS.labels(reason).inc()
+
+
+class TimingMiddleware:
+    """
+    Pure ASGI middleware: records per-route latency, adds a Server-Timing
+    header listing the stages that finished before the response started,
+    and logs a sample of slow requests with their stage breakdown.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total = time.perf_counter() - timings.started
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing(total).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            total = time.perf_counter() - timings.started
+            route = scope.get("route")
+            # Route templates keep label cardinality bounded; unmatched paths share one label
+            path = route.path if route is not None else "unmatched"
+            REQUEST_SECONDS.labels(path, scope["method"], str(status)).observe(total)
+            if total >= SLOW_REQUEST_SECONDS and random.random() < SLOW_REQUEST_SAMPLE_RATE:
+                print("SLOW REQUEST " + json.dumps({
+                    "route": path,
+                    "method": scope["method"],
+                    "status": status,
+                    "total_ms": round(total * 1000, 1),
+                    "stages_ms": {name: round(s * 1000, 1) for name, s in timings.stages.items()},
+                }))
+
+
+class StatsCollector:
+    """
+    Exposes the services' existing stats() counters (cache hits, queue depth...)
+    as gauges, read only when Prometheus scrapes.
+    """
+
+    def __init__(self, sources):
+        self.sources = sources  # name -> callable returning a flat dict, or None
+
+    def collect(self):
+        gauge = GaugeMetricFamily("cinevibe_component_stat", "Counters reported by backend components",
+                                  labels=["component", "stat"])
+        for component, source in self.sources.items():
+            values = source() if source else None
+            for stat, value in (values or {}).items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauge.add_metric([component, stat], value)
+        yield gauge
+
+
+def register_stats(sources):
+    if not PROMETHEUS_MULTIPROC_DIR:
+        REGISTRY.register(StatsCollector(sources))
+
+
+def render():
+    """(body, content type) for the /metrics endpoint."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,252 @@
+import os
+import time
+import asyncio
+
+from executor import db_executor
+from metrics import upstream_call
+
+PROFILE_REFRESH_SECONDS = float(os.environ.get("PROFILE_REFRESH_SECONDS", "30"))
+PROFILE_FULL_RELOAD_SECONDS = float(os.environ.get("PROFILE_FULL_RELOAD_SECONDS", "3600"))
+# Share a recommendation's score can move up or down with the user's affinities (0 disables blending)
+PROFILE_WEIGHT = float(os.environ.get("PROFILE_WEIGHT", "0.3"))
+PROFILE_MAX_FEATURES = 8        # Strongest genre/tag/language affinities kept per user
+PROFILE_PRIOR = 2.0             # Pseudo-count that shrinks affinities backed by few titles
+PROFILE_WATCHLIST_WEIGHT = 0.5  # A watchlisted title counts like a 4-star rating
+PROFILE_PAGE_SIZE = 1000
+PROFILE_MOVIE_CHUNK = 200       # Movie ids per `in` filter when the catalog isn't in memory
+
+MOVIE_FEATURE_COLUMNS = "id,title,genre,mood_tags,languages"
+
+
+def movie_features(movie):
+    """(genre, genre and mood tags, spoken languages), lowercased, as CatalogEntry reads them."""
+    genre = (movie.get('genre') or '').lower()
+    tags = {t.lower() for t in movie.get('mood_tags') or []}
+    if genre:
+        tags.add(genre)
+    languages = movie.get('languages') or []
+    if isinstance(languages, str):
+        languages = [languages]
+    return genre, tags, [l.lower() for l in languages]
+
+
+def _strongest(sums):
+    """Shrunk mean weight per feature, only the PROFILE_MAX_FEATURES largest by magnitude"""
+    affinities = {f: total / (count + PROFILE_PRIOR) for f, (total, count) in sums.items()}
+    strongest = sorted(affinities.items(), key=lambda item: -abs(item[1]))[:PROFILE_MAX_FEATURES]
+    return {f: a for f, a in strongest if a}
+
+
+def _add(sums, feature, weight):
+    total, count = sums.get(feature, (0.0, 0))
+    sums[feature] = (total + weight, count + 1)
+
+
+class UserProfile:
+    """
+    Compact preference vector for one user: genre, tag and language affinities
+    in [-1, 1] (2-star ratings pull down, 5-star ratings and watchlist adds pull up)
+    and the ids of titles they have already rated, i.e. watched.
+    """
+    __slots__ = ("genres", "tags", "languages", "watched")
+
+    def __init__(self, genres, tags, languages, watched):
+        self.genres = genres
+        self.tags = tags
+        self.languages = languages
+        self.watched = watched
+
+    @classmethod
+    def build(cls, ratings, watchlist, movies):
+        """`ratings` maps movie id -> 1..5, `watchlist` is a set of movie ids, `movies` maps id -> row"""
+        events = [(movie_id, (rating - 3) / 2) for movie_id, rating in ratings.items()]
+        events += [(movie_id, PROFILE_WATCHLIST_WEIGHT) for movie_id in watchlist if movie_id not in ratings]
+        genres, tags, languages = {}, {}, {}
+        for movie_id, weight in events:
+            movie = movies.get(movie_id)
+            if movie is None:
+                continue
+            genre, movie_tags, movie_languages = movie_features(movie)
+            if genre:
+                _add(genres, genre, weight)
+            for tag in movie_tags - {genre}:
+                _add(tags, tag, weight)
+            for language in movie_languages:
+                _add(languages, language, weight)
+        return cls(_strongest(genres), _strongest(tags), _strongest(languages), frozenset(ratings))
+
+    def affinity(self, movie):
+        """Summed affinity for one movie row, clipped to [-1, 1] (ScoringEngine.personalize, one row at a time)"""
+        genre, tags, languages = movie_features(movie)
+        total = self.genres.get(genre, 0.0)
+        total += sum(self.tags.get(t, 0.0) for t in tags)
+        total += sum(self.languages.get(l, 0.0) for l in languages)
+        return max(-1.0, min(1.0, total))
+
+    def rerank(self, scored, limit, weight=PROFILE_WEIGHT):
+        """Blend into already-ranked (score, movie) pairs: drop watched titles, rescale, re-sort"""
+        blended = [
+            (score * (1 + weight * self.affinity(movie)), i, movie)
+            for i, (score, movie) in enumerate(scored)
+            if movie.get('id') not in self.watched
+        ]
+        blended.sort(key=lambda x: (-x[0], x[1]))
+        return [(score, movie) for score, _, movie in blended[:limit]]
+
+    def to_dict(self):
+        return {"genres": self.genres, "tags": self.tags, "languages": self.languages, "watched": len(self.watched)}
+
+
+class ProfileService:
+    """
+    Keeps a UserProfile per user in memory, built from user_movie_ratings and
+    user_watchlist by a background job. Refreshes fetch only rows newer than the
+    last seen `updated_at`/`added_at` and rebuild just the users they touch; a
+    periodic full reload picks up deletions. Requests only ever do `get`, a dict
+    lookup, so personalization adds no database round trip.
+    `movie_source` returns the current catalog snapshot; titles it can't resolve
+    (e.g. in rpc catalog mode) are fetched once and remembered.
+    """
+
+    def __init__(self, client, movie_source=None, refresh_seconds=PROFILE_REFRESH_SECONDS,
+                 full_reload_seconds=PROFILE_FULL_RELOAD_SECONDS, executor=db_executor):
+        self.client = client
+        self.movie_source = movie_source
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self.executor = executor
+        self.profiles = {}   # user id -> UserProfile
+        self._ratings = {}   # user id -> {movie id: rating}
+        self._watchlist = {}  # user id -> set of movie ids
+        self._movies = {}    # movie id -> feature row, for titles the catalog snapshot doesn't hold
+        self._watermarks = {}
+        self._last_full_reload = 0.0
+        self._lock = asyncio.Lock()
+        self._task = None
+        self.refreshes = 0
+        self.rebuilt_users = 0
+
+    def get(self, user_id):
+        return self.profiles.get(user_id)
+
+    # --- Fetching (blocking supabase calls) ---
+
+    def _fetch_pages(self, table, columns, time_column, since=None):
+        rows = []
+        start = 0
+        while True:
+            query = self.client.table(table).select(columns)
+            if since is not None:
+                query = query.gt(time_column, since)
+            with upstream_call("supabase", f"{table}_page"):
+                response = (query.order(time_column).order("user_id").order("movie_id")
+                            .range(start, start + PROFILE_PAGE_SIZE - 1).execute())
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < PROFILE_PAGE_SIZE:
+                return rows
+            start += PROFILE_PAGE_SIZE
+
+    def _resolve_movies(self, movie_ids):
+        """id -> feature row for every id the catalog snapshot or a fetch can find"""
+        snapshot = self.movie_source() if self.movie_source else None
+        lookup = getattr(snapshot, "movie", None)
+        found, missing = {}, []
+        for movie_id in movie_ids:
+            movie = (lookup(movie_id) if lookup else None) or self._movies.get(movie_id)
+            if movie is None:
+                missing.append(movie_id)
+            else:
+                found[movie_id] = movie
+        for start in range(0, len(missing), PROFILE_MOVIE_CHUNK):
+            chunk = missing[start:start + PROFILE_MOVIE_CHUNK]
+            with upstream_call("supabase", "profile_movies"):
+                rows = self.client.table("movies").select(MOVIE_FEATURE_COLUMNS).in_("id", chunk).execute().data or []
+            for row in rows:
+                self._movies[row['id']] = found[row['id']] = row
+        return found
+
+    def _sync(self, full):
+        """Fetch new ratings/watchlist rows and rebuild the touched users' profiles (runs on the executor)"""
+        since = {} if full else self._watermarks
+        ratings_rows = self._fetch_pages("user_movie_ratings", "user_id,movie_id,rating,updated_at", "updated_at",
+                                         since.get("user_movie_ratings"))
+        watchlist_rows = self._fetch_pages("user_watchlist", "user_id,movie_id,added_at", "added_at",
+                                           since.get("user_watchlist"))
+
+        ratings = {} if full else self._ratings
+        watchlist = {} if full else self._watchlist
+        touched = set()
+        for row in ratings_rows:
+            ratings.setdefault(row['user_id'], {})[row['movie_id']] = row['rating']
+            touched.add(row['user_id'])
+        for row in watchlist_rows:
+            watchlist.setdefault(row['user_id'], set()).add(row['movie_id'])
+            touched.add(row['user_id'])
+
+        movie_ids = set()
+        for user_id in touched:
+            movie_ids.update(ratings.get(user_id, ()))
+            movie_ids.update(watchlist.get(user_id, ()))
+        movies = self._resolve_movies(movie_ids)
+
+        profiles = {} if full else dict(self.profiles)
+        for user_id in touched:
+            profiles[user_id] = UserProfile.build(ratings.get(user_id, {}), watchlist.get(user_id, set()), movies)
+
+        watermarks = dict(self._watermarks)
+        for table, rows, column in (("user_movie_ratings", ratings_rows, "updated_at"),
+                                    ("user_watchlist", watchlist_rows, "added_at")):
+            seen = [row[column] for row in rows if row.get(column)]
+            if seen:
+                current = watermarks.get(table)
+                watermarks[table] = max(seen) if current is None else max(current, max(seen))
+
+        self._ratings, self._watchlist, self._watermarks = ratings, watchlist, watermarks
+        self.profiles = profiles  # Swapped in one assignment; readers see the old or the new dict
+        self.rebuilt_users += len(touched)
+        return len(ratings_rows) + len(watchlist_rows), len(touched)
+
+    # --- Refresh ---
+
+    async def refresh(self, full=False):
+        async with self._lock:
+            now = time.monotonic()
+            full = full or now - self._last_full_reload >= self.full_reload_seconds
+            rows, users = await self.executor.run(self._sync, full)
+            self.refreshes += 1
+            if full:
+                self._last_full_reload = now
+                print(f"User profiles loaded: {len(self.profiles)} users")
+            elif rows:
+                print(f"User profiles updated: {rows} new rows, {users} users rebuilt")
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Profile refresh error: {e}")
+
+    async def start(self):
+        try:
+            await self.refresh(full=True)
+        except Exception as e:
+            # Recommendations stay unpersonalized until a refresh succeeds
+            print(f"Initial profile load failed: {e}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        return {
+            "users": len(self.profiles),
+            "refreshes": self.refreshes,
+            "rebuilt_users": self.rebuilt_users,
+            "fetched_movies": len(self._movies),
+        }
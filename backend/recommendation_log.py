@@ -0,0 +1,194 @@
+import os
+import json
+import asyncio
+from collections import deque
+
+from executor import db_executor
+from metrics import upstream_call
+
+RECOMMENDATION_LOG_ENABLED = os.environ.get("RECOMMENDATION_LOG_ENABLED", "1") == "1"
+RECOMMENDATION_LOG_BATCH_SIZE = int(os.environ.get("RECOMMENDATION_LOG_BATCH_SIZE", "500"))
+RECOMMENDATION_LOG_FLUSH_SECONDS = float(os.environ.get("RECOMMENDATION_LOG_FLUSH_SECONDS", "5"))
+RECOMMENDATION_LOG_MAX_QUEUE = int(os.environ.get("RECOMMENDATION_LOG_MAX_QUEUE", "20000"))
+# JSONL file for rows that don't fit the queue or fail to insert; replayed on startup. Unset = drop them
+RECOMMENDATION_LOG_SPILL_PATH = os.environ.get("RECOMMENDATION_LOG_SPILL_PATH")
+
+
+class RecommendationLog:
+    """
+    Write-behind log of served recommendations into movie_recommendations.
+    `record` only appends to a bounded in-memory queue; a background task
+    bulk-inserts the queue every `flush_seconds`, or sooner once `batch_size`
+    rows are waiting. Rows that don't fit the queue, or whose insert fails,
+    go to the spill file (or are dropped and counted when there is none), and
+    the spill file is replayed the next time the service starts. `stop`
+    flushes whatever is still queued.
+    """
+
+    def __init__(self, client, batch_size=RECOMMENDATION_LOG_BATCH_SIZE, flush_seconds=RECOMMENDATION_LOG_FLUSH_SECONDS,
+                 max_queue=RECOMMENDATION_LOG_MAX_QUEUE, spill_path=RECOMMENDATION_LOG_SPILL_PATH, executor=db_executor):
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_queue = max_queue
+        self.spill_path = spill_path
+        self.executor = executor
+        self._queue = deque()
+        self._overflow = []  # Rows past the queue bound, waiting for the flusher to spill them
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._closing = False
+        self.enqueued = 0
+        self.written = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.replayed = 0
+        self.failed_batches = 0
+
+    # --- Request path (no I/O) ---
+
+    def record(self, user_id, scored_movies, intent):
+        """Queue one row per served movie. `scored_movies` are (score, movie) pairs in rank order."""
+        if not user_id:
+            return
+        rows = [
+            {
+                "user_id": user_id,
+                "movie_id": movie.get('id'),
+                "score": float(score),
+                "reason": json.dumps({"rank": rank, **intent}, separators=(",", ":")),
+            }
+            for rank, (score, movie) in enumerate(scored_movies, 1)
+            if movie.get('id') is not None
+        ]
+        room = max(self.max_queue - len(self._queue), 0)
+        self._queue.extend(rows[:room])
+        self.enqueued += min(len(rows), room)
+        overflow = rows[room:]
+        if overflow:
+            if self.spill_path and len(self._overflow) < self.max_queue:
+                self._overflow.extend(overflow)
+            else:
+                self.dropped += len(overflow)
+            self._wakeup.set()
+        elif len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    # --- Background flushing ---
+
+    def _insert(self, rows):
+        with upstream_call("supabase", "log_recommendations"):
+            self.client.table("movie_recommendations").insert(rows, returning="minimal").execute()
+
+    def _append_spill(self, rows):
+        with open(self.spill_path, "a") as f:
+            f.write("".join(json.dumps(row) + "\n" for row in rows))
+
+    async def _spill(self, rows):
+        if not rows:
+            return
+        if not self.spill_path:
+            self.dropped += len(rows)
+            return
+        try:
+            await asyncio.to_thread(self._append_spill, rows)
+            self.spilled += len(rows)
+        except Exception as e:
+            print(f"Recommendation log spill failed, dropping {len(rows)} rows: {e}")
+            self.dropped += len(rows)
+
+    async def flush(self, drain=False):
+        """
+        Insert everything queued, in batches. A failed batch is spilled and the
+        rest waits for the next flush, or with `drain` (shutdown) is spilled too.
+        """
+        async with self._lock:
+            overflow, self._overflow = self._overflow, []
+            await self._spill(overflow)
+            while self._queue:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                try:
+                    await self.executor.run(self._insert, batch)
+                    self.written += len(batch)
+                except Exception as e:
+                    print(f"Recommendation log insert failed ({len(batch)} rows): {e}")
+                    self.failed_batches += 1
+                    if drain:
+                        batch.extend(self._queue)
+                        self._queue.clear()
+                    await self._spill(batch)
+                    return
+
+    def _take_spill(self):
+        """Rows from the spill file, which is moved aside so new spills don't mix with the replay"""
+        replay_path = f"{self.spill_path}.replay"
+        # A leftover replay file (interrupted replay) goes first; the spill file waits for the next start
+        if not os.path.exists(replay_path):
+            try:
+                os.replace(self.spill_path, replay_path)
+            except FileNotFoundError:
+                return []
+        with open(replay_path) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        os.remove(replay_path)
+        return rows
+
+    async def replay(self):
+        if not self.spill_path:
+            return
+        try:
+            rows = await asyncio.to_thread(self._take_spill)
+        except Exception as e:
+            print(f"Recommendation log replay failed: {e}")
+            return
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            try:
+                await self.executor.run(self._insert, batch)
+                self.replayed += len(batch)
+                self.written += len(batch)
+            except Exception as e:
+                print(f"Recommendation log replay insert failed: {e}")
+                self.failed_batches += 1
+                await self._spill(rows[start:])
+                return
+        if rows:
+            print(f"Recommendation log replayed {len(rows)} spilled rows")
+
+    async def _flush_loop(self):
+        await self.replay()
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Recommendation log flush error: {e}")
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            # Let an in-flight batch finish rather than cancelling it halfway
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush(drain=True)
+
+    def stats(self):
+        return {
+            "queued": len(self._queue),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "spilled": self.spilled,
+            "dropped": self.dropped,
+            "replayed": self.replayed,
+            "failed_batches": self.failed_batches,
+        }
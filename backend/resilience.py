@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from metrics import fallback
+
+load_dotenv()
+
+# End-to-end budget for one recommendation request; stages get what is left of it
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "6"))
+BATCH_DEADLINE_SECONDS = float(os.environ.get("BATCH_DEADLINE_SECONDS", "30"))
+# Per-call caps, also used as the clients' own timeouts so hung calls end even off the request path
+INTENT_TIMEOUT_SECONDS = float(os.environ.get("INTENT_TIMEOUT_SECONDS", "3"))
+STREAMING_TIMEOUT_SECONDS = float(os.environ.get("STREAMING_TIMEOUT_SECONDS", "2"))
+DB_TIMEOUT_SECONDS = float(os.environ.get("DB_TIMEOUT_SECONDS", "5"))
+INTENT_RESERVE_SECONDS = 1.0  # Budget the intent stage leaves for ranking and enrichment
+BATCH_RESERVE_SECONDS = 10.0  # Same for a batch's intent stage (one snapshot, many rankings)
+# Consecutive failures that open a breaker, and how long it stays open before a trial call
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("BREAKER_RESET_SECONDS", "30"))
+# Recommendation requests handled at once; more are answered 503 straight away
+MAX_INFLIGHT_REQUESTS = int(os.environ.get("MAX_INFLIGHT_REQUESTS", "64"))
+ADMISSION_PATHS = ("/recommend", "/recommend/stream")
+BATCH_PATHS = ("/recommend/batch",)
+
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker for one upstream. After `failures` errors in a
+    row calls fail fast with CircuitOpenError for `reset_seconds`; then one
+    trial call is let through, which closes the breaker on success or opens it
+    again on failure. Thread-safe, so blocking SDK calls on executor threads
+    can report outcomes directly.
+    """
+
+    def __init__(self, name, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failures
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self._opened_at >= self.reset_seconds else "open"
+
+    def allow(self):
+        """Claims a call slot; raises CircuitOpenError while open (or while the trial call is out)"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at >= self.reset_seconds and not self._trial:
+                self._trial = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"{self.name} circuit open")
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+    def release(self):
+        """A call that ended without an answer either way (cancelled): free the trial slot"""
+        with self._lock:
+            self._trial = False
+
+    @contextmanager
+    def guard(self):
+        self.allow()
+        try:
+            yield
+        except Exception as e:
+            self.success() if is_client_error(e) else self.failure()
+            raise
+        except BaseException:
+            self.release()
+            raise
+        else:
+            self.success()
+
+    def stats(self):
+        return {"state": self.state, "consecutive_failures": self._failures, "opened": self.opened,
+                "rejected": self.rejected}
+
+
+BREAKERS = {name: CircuitBreaker(name) for name in ("groq", "watchmode", "supabase")}
+
+
+def is_client_error(exc):
+    """A 4xx answer (bad token, bad query) means the upstream is up; it shouldn't open its breaker"""
+    response = getattr(exc, "response", None)  # httpx.HTTPStatusError
+    status = getattr(exc, "status", None) or getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    return isinstance(status, int) and 400 <= status < 500 and status != 429
+
+
+# --- Deadlines ---
+
+class Deadline:
+    __slots__ = ("expires_at",)
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+
+def remaining():
+    """Seconds left in this request's budget, or None outside a budgeted request"""
+    deadline = _deadline.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def stage_timeout(cap, reserve=0.0):
+    """`cap`, shortened to what the request has left after keeping `reserve` for later stages"""
+    left = remaining()
+    return cap if left is None else max(0.0, min(cap, left - reserve))
+
+
+async def within(awaitable, cap, reserve=0.0):
+    """Awaits with the stage's share of the budget; raises asyncio.TimeoutError when it runs out"""
+    timeout = stage_timeout(cap, reserve)
+    if timeout <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise asyncio.TimeoutError("Request budget exhausted")
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise asyncio.TimeoutError(f"Stage timed out after {timeout:.2f}s") from None
+
+
+# --- Admission control ---
+
+class AdmissionController:
+    """In-flight count and limit shared by AdmissionMiddleware and /stats."""
+
+    def __init__(self, max_inflight=MAX_INFLIGHT_REQUESTS):
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.admitted = 0
+        self.shed = 0
+
+    def stats(self):
+        return {"inflight": self.inflight, "max_inflight": self.max_inflight, "admitted": self.admitted,
+                "shed": self.shed}
+
+
+admission = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware for the recommendation routes: answers 503 with
+    Retry-After as soon as `max_inflight` requests are already being handled,
+    instead of queueing work that would miss its deadline anyway, and starts
+    each admitted request's deadline.
+    """
+
+    def __init__(self, app, controller=admission):
+        self.app = app
+        self.controller = controller
+
+    async def _reject(self, send):
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [(b"content-type", b"application/json"), (b"retry-after", b"1")],
+        })
+        await send({"type": "http.response.body", "body": json.dumps({"detail": "Server busy, retry shortly"}).encode()})
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "") if scope["type"] == "http" else ""
+        if path in ADMISSION_PATHS:
+            budget = REQUEST_DEADLINE_SECONDS
+        elif path in BATCH_PATHS:
+            budget = BATCH_DEADLINE_SECONDS
+        else:
+            return await self.app(scope, receive, send)
+
+        controller = self.controller
+        if controller.inflight >= controller.max_inflight:
+            controller.shed += 1
+            fallback("load_shed")
+            return await self._reject(send)
+
+        controller.inflight += 1
+        controller.admitted += 1
+        token = _deadline.set(Deadline(budget))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
+            controller.inflight -= 1
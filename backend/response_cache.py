@@ -0,0 +1,121 @@
+import os
+import time
+import hashlib
+from collections import OrderedDict
+
+import orjson
+
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "2048"))  # 0 disables it
+# Bounds how stale the streaming availability inside a cached body can get
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("RESULT_CACHE_TTL_SECONDS", "600"))
+
+
+def dumps(data):
+    """JSON bytes for a response body (orjson: several times faster than json.dumps on movie rows)"""
+    return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def etag_for(body):
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match header (list of tags, weak or not, or *) against a strong ETag"""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class CatalogDerivedBody:
+    """
+    One JSON body computed from the catalog snapshot (e.g. /database-info),
+    serialized and hashed once per catalog version instead of per request.
+    The ETag is a hash of the body, so every worker agrees on it.
+    """
+
+    def __init__(self, build):
+        self.build = build
+        self._version = None
+        self.body = None
+        self.etag = None
+        self.builds = 0
+
+    def get(self, snapshot):
+        """(body, etag) for `snapshot`"""
+        if snapshot.version != self._version or self.body is None:
+            body = dumps(self.build(snapshot))
+            self.body, self.etag, self._version = body, etag_for(body), snapshot.version
+            self.builds += 1
+        return self.body, self.etag
+
+
+class CachedResult:
+    __slots__ = ("body", "scored", "expires_at")
+
+    def __init__(self, body, scored, expires_at):
+        self.body = body
+        self.scored = scored  # (score, movie) pairs served, for the recommendation log
+        self.expires_at = expires_at
+
+
+class ResultCache:
+    """
+    LRU of serialized /recommend bodies for non-personalized requests, keyed
+    by the resolved intent: target genre, target language and the keywords
+    as a sorted multiset (order doesn't change a ranking, repeats do). The
+    whole cache is dropped as soon as a request sees a new catalog version.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(keywords, target_genre, target_language):
+        return target_genre, target_language, tuple(sorted(k.lower() for k in keywords))
+
+    def _current(self, version):
+        """Moves the cache to `version` if it is newer; False for a request still on an older snapshot"""
+        if self._version is None or version > self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+        return version == self._version
+
+    def get(self, version, key):
+        if not self.max_entries or not self._current(version):
+            return None
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() >= entry.expires_at:
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, version, key, body, scored):
+        if not self.max_entries or not self._current(version):
+            return None
+        entry = self._entries[key] = CachedResult(body, scored, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
@@ -14,6 +14,16 @@ create table if not exists movies (
 -- Ensure original_language column exists if table was already created
 alter table movies add column if not exists original_language text;
 
+-- Watchmode title id, filled in by the backend the first time a title is looked up
+alter table movies add column if not exists watchmode_id text;
+
+-- Titles are unique so seed.py can bulk upsert on them
+create unique index if not exists movies_title_key on movies (title);
+
+-- Search columns, GIN/trigram indexes and the rank_movies() / catalog_summary()
+-- functions used with CATALOG_MODE=rpc live in
+-- supabase/migrations/20261018000100_movie_ranking.sql (run it after this file)
+
 -- Turn on Row Level Security
 alter table movies enable row level security;
 
@@ -0,0 +1,338 @@
+import re
+
+import numpy as np
+
+NON_ENGLISH_TRIGGERS = ["bollywood", "tollywood", "hindi", "telugu", "tamil", "kannada", "malayalam", "korean", "japanese", "spanish", "french"]
+
+# Score rules (kept identical to the original per-movie loop)
+TAG_MATCH = 7
+TITLE_MATCH = 5
+DESCRIPTION_MATCH = 2
+GENRE_MATCH = 10
+GENRE_PREFIX_MATCH = 8
+LANGUAGE_MATCH = 5
+NATIVE_LANGUAGE_MATCH = 50
+EXCLUDED = -100
+
+_VOCAB_CACHE_SIZE = 4096
+_SLICE_LIMIT = 32  # Above this many matching terms a full mask gather is cheaper
+
+# Runs of letters/digits. A keyword run that occurs inside a text must sit
+# entirely inside one text token, which is what makes substring lookups
+# over the token vocabulary a safe superset of the old `in` checks.
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class TokenPostings:
+    """
+    Token-id matrix for one text field, stored CSR style twice: row-major
+    (`tokens`, `rows`) for mask gathers and token-major (`rows_by_token`, `ptr`) for
+    cheap posting slices when only a few terms match.
+    """
+
+    def __init__(self, rows, tokens, rows_by_token, ptr):
+        self.rows = rows
+        self.tokens = tokens
+        self.rows_by_token = rows_by_token
+        self.ptr = ptr
+
+    @classmethod
+    def build(cls, token_lists, vocab):
+        ids = {t: i for i, t in enumerate(vocab)}
+        rows, tokens = [], []
+        for row, toks in enumerate(token_lists):
+            for tok in set(toks):
+                rows.append(row)
+                tokens.append(ids[tok])
+        rows = np.asarray(rows, dtype=np.int32)
+        tokens = np.asarray(tokens, dtype=np.int32)
+        order = np.argsort(tokens, kind="stable")
+        ptr = np.searchsorted(tokens[order], np.arange(len(vocab) + 1)).astype(np.int64)
+        return cls(rows, tokens, rows[order], ptr)
+
+    def columns(self, prefix):
+        return {f"{prefix}.{name}": getattr(self, name) for name in ("rows", "tokens", "rows_by_token", "ptr")}
+
+    @classmethod
+    def from_columns(cls, columns, prefix):
+        return cls(*(columns[f"{prefix}.{name}"] for name in ("rows", "tokens", "rows_by_token", "ptr")))
+
+    def rows_for(self, term_ids, size):
+        hits = np.zeros(size, dtype=bool)
+        if len(term_ids) == 0:
+            return hits
+        if len(term_ids) <= _SLICE_LIMIT:
+            for t in term_ids:
+                hits[self.rows_by_token[self.ptr[t]:self.ptr[t + 1]]] = True
+        else:
+            wanted = np.zeros(len(self.ptr) - 1, dtype=bool)
+            wanted[term_ids] = True
+            hits[self.rows[wanted[self.tokens]]] = True
+        return hits
+
+
+class ScoringEngine:
+    """
+    Columnar encoding of a catalog snapshot that scores every movie for a
+    parsed mood in one vectorized pass.
+    Genres and original languages are integer codes, spoken languages a boolean
+    matrix, mood tags and title/full-text tokens token-id postings. Keywords are
+    matched against the (small) vocabularies first, so the per-movie work is a
+    handful of array ops regardless of how many keywords the mood has.
+    With a `text_index` (BM25Index) keywords match whole stemmed terms instead of
+    substrings, and a description hit is weighted by its BM25 relevance.
+
+    The arrays live in `columns` (see `encode`), which may be memory-mapped
+    from a catalog store; `entries` is then only read for the rows a ranking
+    returns.
+    """
+
+    def __init__(self, entries, text_index=None, columns=None):
+        self.entries = entries
+        self.text_index = text_index
+        if columns is None:
+            columns = self.encode(entries, with_text=text_index is None)
+        self.columns = columns
+        self.size = len(columns["genre_ids"])
+
+        # Vocabularies are small and read per query, so they are plain lists
+        self.genre_vocab = list(columns["genre_vocab"])
+        self.genre_ids = columns["genre_ids"]
+        self.language_vocab = list(columns["language_vocab"])
+        self.language_ids = {l: i for i, l in enumerate(self.language_vocab)}
+        self.language_bits = columns["language_bits"]
+        self.has_languages = columns["has_languages"]
+        self.language_sets = columns["language_sets"]
+        self.language_set_ids = columns["language_set_ids"]
+        self.original_language = columns["original_language"]
+        self.trigger_text = columns["trigger_text"]
+        self.tag_vocab = list(columns["tag_vocab"])
+        self.tag_ids = {t: i for i, t in enumerate(self.tag_vocab)}
+        self.tags = TokenPostings.from_columns(columns, "tags")
+        self.ids = columns["ids"]
+        self.id_order = columns["id_order"]
+
+        self._vocab_hits = {}
+        if text_index is None:
+            self.text_vocab = list(columns["text_vocab"])
+            self.titles = TokenPostings.from_columns(columns, "titles")
+            self.full_text = TokenPostings.from_columns(columns, "full_text")
+
+    @staticmethod
+    def encode(entries, with_text=True):
+        """
+        Column arrays (and vocabulary lists) for `entries`: genre and original
+        language codes, spoken languages as a bitmask per movie, tag postings,
+        sorted ids and, `with_text`, title/full-text token postings.
+        """
+        n = len(entries)
+        columns = {}
+        genre_vocab = sorted({e.genre_lower for e in entries})
+        genre_ids = {g: i for i, g in enumerate(genre_vocab)}
+        columns["genre_vocab"] = genre_vocab
+        columns["genre_ids"] = np.fromiter((genre_ids[e.genre_lower] for e in entries), dtype=np.int32, count=n)
+
+        language_vocab = sorted({l for e in entries for l in e.languages} | {e.original_language for e in entries})
+        language_ids = {l: i for i, l in enumerate(language_vocab)}
+        language_mask = np.zeros((n, len(language_vocab)), dtype=bool)
+        for row, e in enumerate(entries):
+            for l in e.languages:
+                language_mask[row, language_ids[l]] = True
+        columns["language_vocab"] = language_vocab
+        columns["language_bits"] = np.packbits(language_mask, axis=1)
+        columns["has_languages"] = language_mask.any(axis=1)
+        # Distinct spoken-language combinations, so per-movie language sums are one gather
+        language_sets, language_set_ids = np.unique(language_mask, axis=0, return_inverse=True)
+        columns["language_sets"] = language_sets
+        columns["language_set_ids"] = language_set_ids.reshape(-1)
+        columns["original_language"] = np.fromiter(
+            (language_ids[e.original_language] for e in entries), dtype=np.int32, count=n
+        )
+        columns["trigger_text"] = np.fromiter(
+            (any(t in e.full_text for t in NON_ENGLISH_TRIGGERS) for e in entries), dtype=bool, count=n
+        )
+
+        tag_vocab = sorted({f for e in entries for f in e.features})
+        columns["tag_vocab"] = tag_vocab
+        columns.update(TokenPostings.build([e.features for e in entries], tag_vocab).columns("tags"))
+        ids = np.fromiter((e.movie.get('id') if isinstance(e.movie.get('id'), int) else -1 for e in entries),
+                          dtype=np.int64, count=n)
+        columns["ids"] = ids
+        columns["id_order"] = np.argsort(ids, kind="stable").astype(np.int32)
+
+        if with_text:
+            title_tokens = [tokenize(e.title_lower) for e in entries]
+            full_tokens = [tokenize(e.full_text) for e in entries]
+            text_vocab = sorted({t for toks in full_tokens for t in toks})
+            columns["text_vocab"] = text_vocab
+            columns.update(TokenPostings.build(title_tokens, text_vocab).columns("titles"))
+            columns.update(TokenPostings.build(full_tokens, text_vocab).columns("full_text"))
+        return columns
+
+    # --- Lookups ---
+
+    def positions_of(self, movie_ids):
+        """Catalog positions of the given movie ids, unknown ids skipped"""
+        ids = np.fromiter((i for i in movie_ids if isinstance(i, int)), dtype=np.int64)
+        if not self.size or not len(ids):
+            return np.zeros(0, dtype=np.int64)
+        at = np.minimum(np.searchsorted(self.ids, ids, sorter=self.id_order), self.size - 1)
+        found = self.id_order[at]
+        return found[self.ids[found] == ids].astype(np.int64)
+
+    def position(self, movie_id):
+        found = self.positions_of((movie_id,))
+        return int(found[0]) if len(found) else None
+
+    def speaks(self, lang_id):
+        """Boolean mask of movies whose spoken languages include `lang_id`"""
+        if lang_id is None:
+            return np.zeros(self.size, dtype=bool)
+        byte, bit = divmod(lang_id, 8)
+        return (self.language_bits[:, byte] & (0x80 >> bit)).astype(bool)
+
+    # --- Keyword matching ---
+
+    def _terms_containing(self, run):
+        hits = self._vocab_hits.get(run)
+        if hits is None:
+            hits = np.asarray([i for i, t in enumerate(self.text_vocab) if run in t], dtype=np.int32)
+            if len(self._vocab_hits) >= _VOCAB_CACHE_SIZE:
+                self._vocab_hits.clear()
+            self._vocab_hits[run] = hits
+        return hits
+
+    def _substring_hits(self, postings, keyword, field):
+        """Boolean mask of movies whose `field` contains `keyword` as a substring."""
+        runs = tokenize(keyword)
+        if not runs:
+            return np.fromiter((keyword in getattr(e, field) for e in self.entries), dtype=bool, count=self.size)
+        hits = None
+        for run in runs:
+            run_hits = postings.rows_for(self._terms_containing(run), self.size)
+            hits = run_hits if hits is None else hits & run_hits
+        if runs != [keyword]:
+            # Punctuation/spaces in the keyword: confirm the exact substring on the candidates
+            for row in np.flatnonzero(hits):
+                if keyword not in getattr(self.entries[row], field):
+                    hits[row] = False
+        return hits
+
+    # --- Scoring ---
+
+    def _text_hits(self, keyword):
+        """(title hits, text component) for one keyword under BM25 matching."""
+        terms = self.text_index.terms(keyword)
+        relevance, hits = self.text_index.match(terms)
+        best = relevance.max() if hits.any() else 0
+        # DESCRIPTION_MATCH for the weakest hit up to twice that for the most relevant one
+        text = np.where(hits, DESCRIPTION_MATCH * (1 + relevance / best) if best else 0, 0)
+        return self.text_index.title_hits(terms), text
+
+    def score(self, keywords, target_genre, target_language):
+        """Score for every movie, in catalog order."""
+        n = self.size
+        dtype = np.int32 if self.text_index is None else np.float32
+        scores = np.zeros(n, dtype=dtype)
+
+        for k_lower in (k.lower() for k in keywords):
+            tag_id = self.tag_ids.get(k_lower)
+            tag_hits = self.tags.rows_for([tag_id], n) if tag_id is not None else np.zeros(n, dtype=bool)
+            if self.text_index is None:
+                title_hits = self._substring_hits(self.titles, k_lower, "title_lower")
+                text = np.where(self._substring_hits(self.full_text, k_lower, "full_text"), DESCRIPTION_MATCH, 0)
+            else:
+                title_hits, text = self._text_hits(k_lower)
+            scores += np.where(tag_hits, TAG_MATCH, np.where(title_hits, TITLE_MATCH, text)).astype(dtype)
+
+        if target_genre and target_genre.lower() != "general":
+            tg = target_genre.lower()
+            contains = np.asarray([tg in g for g in self.genre_vocab], dtype=bool)
+            prefix = np.asarray([g.startswith(tg) for g in self.genre_vocab], dtype=bool)
+            scores += np.where(contains[self.genre_ids], GENRE_MATCH, np.where(prefix[self.genre_ids], GENRE_PREFIX_MATCH, 0)).astype(dtype)
+
+        if target_language and target_language.lower() != "any":
+            req_lang = target_language.lower()
+            lang_id = self.language_ids.get(req_lang)
+            speaks = self.speaks(lang_id)
+            if req_lang == "english":
+                scores = np.where(
+                    speaks, scores + LANGUAGE_MATCH,
+                    np.where(self.has_languages | self.trigger_text, EXCLUDED, scores),
+                )
+            else:
+                native = self.original_language == lang_id if lang_id is not None else np.zeros(n, dtype=bool)
+                boosted = scores + np.where(native, NATIVE_LANGUAGE_MATCH, LANGUAGE_MATCH)
+                excluded = self.has_languages if req_lang in NON_ENGLISH_TRIGGERS else np.zeros(n, dtype=bool)
+                scores = np.where(speaks, boosted, np.where(excluded, EXCLUDED, scores))
+
+        return scores
+
+    def personalize(self, scores, profile, weight):
+        """
+        Blend a UserProfile into `scores`: every matching movie is scaled by
+        1 + weight * (its summed genre/tag/language affinity, clipped to [-1, 1]),
+        and titles the user already watched drop out.
+        """
+        hits = np.flatnonzero(scores > 0)
+        affinity = np.zeros(len(hits), dtype=np.float32)
+        if profile.genres:
+            genres = np.asarray([profile.genres.get(g, 0.0) for g in self.genre_vocab], dtype=np.float32)
+            affinity += genres[self.genre_ids[hits]]
+        if profile.tags:
+            tags = np.zeros(self.size, dtype=np.float32)
+            for tag, value in profile.tags.items():
+                tag_id = self.tag_ids.get(tag)
+                if tag_id is not None:
+                    tags[self.tags.rows_by_token[self.tags.ptr[tag_id]:self.tags.ptr[tag_id + 1]]] += value
+            affinity += tags[hits]
+        if profile.languages:
+            languages = np.asarray([profile.languages.get(l, 0.0) for l in self.language_vocab], dtype=np.float32)
+            affinity += (self.language_sets @ languages)[self.language_set_ids[hits]]
+        scores = scores.astype(np.float32)
+        scores[hits] *= 1 + weight * np.clip(affinity, -1, 1)
+        scores[self.positions_of(profile.watched)] = 0
+        return scores
+
+    @staticmethod
+    def top_k(scores, k):
+        """
+        Positions of the k best positive scores, best first, ties in catalog order.
+        Uses a partial selection, so only the winners are ever sorted.
+        """
+        positive = np.flatnonzero(scores > 0)
+        if len(positive) > k:
+            values = scores[positive]
+            threshold = -np.partition(-values, k - 1)[k - 1]
+            above = positive[values > threshold]
+            at = positive[values == threshold][:k - len(above)]
+            positive = np.concatenate([above, at])
+        return positive[np.lexsort((positive, -scores[positive]))]
+
+    def rank(self, keywords, target_genre, target_language, limit, profile=None, profile_weight=0.0):
+        """
+        The first `limit` (score, movie) pairs of the full ranking with
+        duplicate titles dropped, plus the total number of positive scores.
+        A `profile` (UserProfile) personalizes the ranking, see `personalize`.
+        """
+        scores = self.score(keywords, target_genre, target_language)
+        if profile is not None:
+            scores = self.personalize(scores, profile, profile_weight)
+        total = int(np.count_nonzero(scores > 0))
+        k = limit
+        while True:
+            picked, seen_titles = [], set()
+            for pos in self.top_k(scores, k):
+                movie = self.entries[pos].movie
+                if movie['title'] not in seen_titles:
+                    seen_titles.add(movie['title'])
+                    picked.append((scores[pos].item(), movie))
+                    if len(picked) >= limit:
+                        return picked, total
+            if k >= total:
+                return picked, total
+            k *= 2
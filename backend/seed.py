@@ -1,19 +1,36 @@
+"""
+Seeds the movies table.
+
+Records come from the curated list below, from Groq-generated "vibes"
+(fetched concurrently under a rate limit) and/or from a local JSONL/CSV
+dump. They stream through a validate/normalize stage and are written with
+chunked bulk upserts. A checkpoint file records finished sources so a
+crashed run picks up where it stopped.
+
+    python seed.py                                  # curated list + AI vibes
+    python seed.py --no-generate                    # curated list only
+    python seed.py --from-file dump.jsonl --no-base # local dump, no LLM
+    python seed.py --reset                          # ignore the checkpoint
+"""
 import os
-from dotenv import load_dotenv
-from supabase import create_client
+import csv
+import json
 import time
-import random
+import asyncio
+import argparse
+from dotenv import load_dotenv
 
 load_dotenv()
 
-url = os.environ.get("SUPABASE_URL")
-key = os.environ.get("SUPABASE_KEY")
-
-if not url or not key:
-    print("Please set SUPABASE_URL and SUPABASE_KEY in .env")
-    exit(1)
-
-supabase = create_client(url, key)
+GENERATION_MODEL = "llama-3.1-8b-instant"
+DEFAULT_VIBES = [
+    "Tollywood Action", "Tollywood Comedy", "Tollywood Mass Masala",
+    "French New Wave", "Italian Neorealism", "Hong Kong Action",
+    "Bollywood Masala", "Japanese Horror", "Scandi Noir",
+    "90s Indie", "Classic Western", "Cyberpunk Sci-Fi"
+]
+# Columns written to the movies table; anything else a record carries is dropped
+MOVIE_COLUMNS = ["title", "description", "genre", "languages", "original_language", "mood_tags", "poster_url", "tmdb_id"]
 
 # Base list covering various vibes/moods including international
 movies_db = [
@@ -48,112 +65,343 @@ movies_db = [
   {"title": "Pushpa: The Rise", "genre": "Action", "languages": ["Telugu", "Hindi", "Tamil", "Malayalam", "Kannada"], "original_language": "Telugu", "mood_tags": ["Intense", "Emotional", "Gritty"], "poster_url": "https://image.tmdb.org/t/p/w500/7p2rXof30NLYuclU8788fU3S8mU.jpg", "description": "A laborer rises through the ranks of a red sandal smuggling syndicate, unfolding a story of power, survival, and personal loss."},
 ]
 
-# AI Generation to fill the rest up to 150
-import json
-try:
-    from groq import Groq
+
+# --- Validation / normalization ---
+
+# (vibe keyword, forced original language, languages every movie of that vibe gets)
+VIBE_LANGUAGE_RULES = [
+    ("Tollywood", "Telugu", ["Telugu", "Hindi", "Tamil", "Malayalam"]),
+    ("Bollywood", "Hindi", ["Hindi", "English"]),
+    ("French", "French", ["French"]),
+    ("Italian", "Italian", ["Italian"]),
+    ("Japanese", "Japanese", ["Japanese"]),
+    ("Korean", "Korean", ["Korean"]),
+    ("Hong Kong", "Cantonese", ["Cantonese", "Mandarin", "English"]),
+    ("Scandi", "Swedish", ["Swedish"]),
+    ("Spanish", "Spanish", ["Spanish"]),
+    ("Western", None, ["English"]),
+    ("Indie", None, ["English"]),
+]
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith("["):
+            return _as_list(json.loads(value))
+        return [v.strip() for v in value.split("|") if v.strip()]
+    return [str(v) for v in value if v]
+
+
+def normalize_movie(raw, vibe=None):
+    """Validated row for the movies table, or None if the record is unusable."""
+    if not isinstance(raw, dict):
+        return None
+    title = raw.get("title")
+    if not isinstance(title, str) or not title.strip():
+        return None
+
+    m = {col: raw.get(col) for col in MOVIE_COLUMNS}
+    m["title"] = title.strip()
+    m["languages"] = _as_list(m["languages"])
+    m["mood_tags"] = _as_list(m["mood_tags"])
+    if not m["original_language"]:
+        m["original_language"] = "English"
+
+    # FORCE FROM VIBE
+    if vibe:
+        for keyword, original_language, languages in VIBE_LANGUAGE_RULES:
+            if keyword in vibe:
+                if original_language:
+                    m["original_language"] = original_language
+                for l in languages:
+                    if l not in m["languages"]: m["languages"].append(l)
+                break
+
+    # Enrich with placeholder if missing
+    if not m["poster_url"]:
+        m["poster_url"] = f"https://placehold.co/600x900/1e293b/ffffff?text={m['title'].replace(' ', '+')}"
+    if m["tmdb_id"] is not None:
+        m["tmdb_id"] = str(m["tmdb_id"])
+    return m
+
+
+# --- Sources ---
+
+def read_dump(path):
+    """Yields raw records from a local .jsonl or .csv dump."""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class RateLimiter:
+    """Spaces call starts at least 60/rpm seconds apart."""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def generate_vibe(client, vibe, count, limiter, semaphore):
+    prompt = (
+        f"Return a JSON object with a 'movies' list containing {count} real "
+        f"{vibe} movies. Each movie must have keys: title, description, genre, "
+        "original_language (native), languages (list), mood_tags (list), poster_url. "
+        "Do not use null for lists."
+    )
+    async with semaphore:
+        await limiter.wait()
+        print(f"Fetching: {vibe}...")
+        completion = await client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": "You are a movie meta-data expert. Use strictly valid JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            model=GENERATION_MODEL,
+            response_format={"type": "json_object"}
+        )
+    data = json.loads(completion.choices[0].message.content)
+    new_movies = data if isinstance(data, list) else data.get("movies", [])
+    print(f"Generated {len(new_movies)} for vibe '{vibe}'")
+    return new_movies
+
+
+# --- Checkpoint ---
+
+class Checkpoint:
+    """
+    Finished sources plus, per resumable source, how many records have been written.
+    Saved atomically after every flushed chunk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self.offsets = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.done = set(data.get("done", []))
+            self.offsets = data.get("offsets", {})
+            print(f"Resuming from {path}: {len(self.done)} sources already seeded")
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"done": sorted(self.done), "offsets": self.offsets}, f)
+        os.replace(tmp_path, self.path)
+
+
+# --- Pipeline ---
+
+SOURCE_DONE = "source_done"
+END = "end"
+
+
+def resumable(source):
+    """
+    Whether a source yields the same records in the same order on every run
+    (the curated list, dump files), so a record offset can resume it. A vibe
+    is a fresh LLM generation each time: an unfinished one is regenerated in
+    full and the upsert skips the titles already written.
+    """
+    return not source.startswith("vibe:")
+
+
+class SeedPipeline:
+    """
+    producers -> raw queue -> normalize -> clean queue -> bulk writer.
+    Queues are FIFO, so a producer's SOURCE_DONE marker reaches the writer
+    after all of its records; the source is checkpointed once they're flushed.
+    """
+
+    def __init__(self, supabase, checkpoint, chunk_size=500, conflict_key="title", update_existing=False, dry_run=False):
+        self.supabase = supabase
+        self.checkpoint = checkpoint
+        self.chunk_size = chunk_size
+        self.conflict_key = conflict_key
+        self.update_existing = update_existing
+        self.dry_run = dry_run
+        self.raw = asyncio.Queue(maxsize=chunk_size * 4)
+        self.clean = asyncio.Queue(maxsize=chunk_size * 2)
+        self.seen = set()
+        self.written = 0
+        self.invalid = 0
+        self.duplicates = 0
+
+    # Producers put ("record", source, seq, raw, vibe) and finally (SOURCE_DONE, source)
+
+    async def produce(self, source, records, vibe=None):
+        start = self.checkpoint.offsets.get(source, 0) if resumable(source) else 0
+        for seq, raw in enumerate(records):
+            if seq < start:
+                continue
+            await self.raw.put(("record", source, seq, raw, vibe))
+        await self.raw.put((SOURCE_DONE, source))
+
+    async def normalize(self):
+        while True:
+            item = await self.raw.get()
+            if item[0] != "record":
+                await self.clean.put(item)
+                if item[0] == END:
+                    return
+                continue
+            _, source, seq, raw, vibe = item
+            movie = normalize_movie(raw, vibe)
+            if movie is None:
+                self.invalid += 1
+                continue
+            key = movie[self.conflict_key] or movie["title"]
+            if key in self.seen:
+                self.duplicates += 1
+                continue
+            self.seen.add(key)
+            await self.clean.put(("record", source, seq, movie))
+
+    def _upsert(self, rows):
+        self.supabase.table("movies").upsert(
+            rows, on_conflict=self.conflict_key, ignore_duplicates=not self.update_existing
+        ).execute()
+
+    async def _flush(self, batch, finished):
+        if batch:
+            rows = [movie for _, _, _, movie in batch]
+            if not self.dry_run:
+                for attempt in range(3):
+                    try:
+                        await asyncio.to_thread(self._upsert, rows)
+                        break
+                    except Exception as e:
+                        if attempt == 2:
+                            raise
+                        print(f"Upsert failed ({e}), retrying...")
+                        await asyncio.sleep(2 ** attempt)
+            self.written += len(rows)
+            for _, source, seq, _ in batch:
+                if resumable(source):
+                    self.checkpoint.offsets[source] = max(self.checkpoint.offsets.get(source, 0), seq + 1)
+            print(f"Upserted {len(rows)} movies ({self.written} total)")
+        for source in finished:
+            self.checkpoint.done.add(source)
+            self.checkpoint.offsets.pop(source, None)
+        self.checkpoint.save()
+
+    async def write(self):
+        batch, finished = [], []
+        while True:
+            item = await self.clean.get()
+            if item[0] == "record":
+                batch.append(item)
+                if len(batch) >= self.chunk_size:
+                    await self._flush(batch, finished)
+                    batch, finished = [], []
+            elif item[0] == SOURCE_DONE:
+                finished.append(item[1])
+            else:
+                await self._flush(batch, finished)
+                return
+
+
+async def run(args):
+    supabase = None
+    if not args.dry_run:
+        from supabase import create_client
+        url = os.environ.get("SUPABASE_URL")
+        key = os.environ.get("SUPABASE_KEY")
+        if not url or not key:
+            print("Please set SUPABASE_URL and SUPABASE_KEY in .env")
+            return 1
+        supabase = create_client(url, key)
+
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    checkpoint = Checkpoint(args.checkpoint)
+    pipeline = SeedPipeline(supabase, checkpoint, args.chunk_size, args.conflict_key, args.update_existing, args.dry_run)
+
+    producers = []
+    if not args.no_base and "base" not in checkpoint.done:
+        producers.append(pipeline.produce("base", movies_db))
+    for path in args.from_file or []:
+        if f"file:{path}" not in checkpoint.done:
+            producers.append(pipeline.produce(f"file:{path}", read_dump(path)))
+
+    vibes = [v for v in (args.vibes.split(",") if args.vibes else DEFAULT_VIBES) if f"vibe:{v}" not in checkpoint.done]
     groq_api_key = os.environ.get("GROQ_API_KEY")
-    if groq_api_key:
+    if args.generate and vibes and not groq_api_key:
+        print("GROQ_API_KEY not set, skipping AI generation.")
+    elif args.generate and vibes:
+        from groq import AsyncGroq
         print("Groq Key found! Generating international & diverse movies...")
-        client = Groq(api_key=groq_api_key)
-        
-        # 10 iterations of 10 movies = 100 new movies
-        vibes = [
-            "Tollywood Action", "Tollywood Comedy", "Tollywood Mass Masala",
-            "French New Wave", "Italian Neorealism", "Hong Kong Action", 
-            "Bollywood Masala", "Japanese Horror", "Scandi Noir",
-            "90s Indie", "Classic Western", "Cyberpunk Sci-Fi"
-        ]
-        
-        for vibe in vibes:
+        client = AsyncGroq(api_key=groq_api_key)
+        limiter = RateLimiter(args.rpm)
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def produce_vibe(vibe):
             try:
-                print(f"Fetching: {vibe}...")
-                prompt = (
-                    "Return a JSON object with a 'movies' list containing 8 real "
-                    f"{vibe} movies. Each movie must have keys: title, description, genre, "
-                    "original_language (native), languages (list), mood_tags (list), poster_url, ott. "
-                    "Do not use null for lists."
-                )
-                completion = client.chat.completions.create(
-                    messages=[
-                        {"role": "system", "content": "You are a movie meta-data expert. Use strictly valid JSON."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    model="llama-3.1-8b-instant",
-                    response_format={"type": "json_object"}
-                )
-                content = completion.choices[0].message.content
-                data = json.loads(content)
-                new_movies = data.get("movies", [])
-                if isinstance(data, list): new_movies = data 
-                
-                print(f"Generated {len(new_movies)} for vibe '{vibe}'")
-                for m in new_movies:
-                    # Enrich languages if missing
-                    if "languages" not in m: m["languages"] = []
-                    if "original_language" not in m: m["original_language"] = "English"
-
-                    # FORCE FROM VIBE
-                    if "Tollywood" in vibe: 
-                        m["original_language"] = "Telugu"
-                        for l in ["Telugu", "Hindi", "Tamil", "Malayalam"]:
-                            if l not in m["languages"]: m["languages"].append(l)
-                    elif "Bollywood" in vibe: 
-                        m["original_language"] = "Hindi"
-                        for l in ["Hindi", "English"]:
-                            if l not in m["languages"]: m["languages"].append(l)
-                    elif "French" in vibe: 
-                        m["original_language"] = "French"
-                        if "French" not in m["languages"]: m["languages"].append("French")
-                    elif "Italian" in vibe: 
-                        m["original_language"] = "Italian"
-                        if "Italian" not in m["languages"]: m["languages"].append("Italian")
-                    elif "Japanese" in vibe: 
-                        m["original_language"] = "Japanese"
-                        if "Japanese" not in m["languages"]: m["languages"].append("Japanese")
-                    elif "Korean" in vibe: 
-                        m["original_language"] = "Korean"
-                        if "Korean" not in m["languages"]: m["languages"].append("Korean")
-                    elif "Hong Kong" in vibe: 
-                        m["original_language"] = "Cantonese"
-                        for l in ["Cantonese", "Mandarin", "English"]:
-                            if l not in m["languages"]: m["languages"].append(l)
-                    elif "Scandi" in vibe: 
-                        m["original_language"] = "Swedish"
-                        if "Swedish" not in m["languages"]: m["languages"].append("Swedish")
-                    elif "Spanish" in vibe: 
-                        m["original_language"] = "Spanish"
-                        if "Spanish" not in m["languages"]: m["languages"].append("Spanish")
-                    elif "Western" in vibe or "Indie" in vibe: 
-                        if "English" not in m["languages"]: m["languages"].append("English")
-                    
-                    # Enrich with placeholder if missing
-                    if "poster_url" not in m:
-                        # Use a service that generates text images or just random placeholder
-                        m["poster_url"] = f"https://placehold.co/600x900/1e293b/ffffff?text={m['title'].replace(' ', '+')}"
-                    movies_db.append(m)
-                
-                time.sleep(1) 
+                movies = await generate_vibe(client, vibe, args.count, limiter, semaphore)
             except Exception as e:
+                # Not marked done, so the next run retries this vibe
                 print(f"Generative error for {vibe}: {e}")
-except ImportError:
-    print("Groq library not found or error, skipping AI generation.")
-except Exception as e:
-    print(f"Skipping AI generation due to configuration: {e}")
+                return
+            await pipeline.produce(f"vibe:{vibe}", movies, vibe=vibe)
 
-if __name__ == "__main__":
-    print(f"Total movies to process: {len(movies_db)}")
-
-    for movie in movies_db:
-        try:
-            # Check if exists
-            existing = supabase.table("movies").select("id").eq("title", movie["title"]).execute()
-            if not existing.data:
-                supabase.table("movies").insert(movie).execute()
-                print(f"Inserted: {movie['title']}")
-            else:
-                print(f"Skipped (Duplicate): {movie['title']}")
-        except Exception as e:
-            print(f"Error processing {movie.get('title')}: {e}")
+        producers.extend(produce_vibe(v) for v in vibes)
 
-    print("Seeding complete!")
+    async def feed():
+        await asyncio.gather(*producers)
+        await pipeline.raw.put((END,))
+
+    stages = [asyncio.create_task(feed()), asyncio.create_task(pipeline.normalize()), asyncio.create_task(pipeline.write())]
+    try:
+        await asyncio.gather(*stages)
+    except Exception as e:
+        for stage in stages:
+            stage.cancel()
+        print(f"Seeding stopped: {e}. Re-run to resume from {args.checkpoint}.")
+        return 1
+
+    print(f"Seeding complete! {pipeline.written} upserted, {pipeline.duplicates} duplicates, {pipeline.invalid} invalid")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the movies table.")
+    parser.add_argument("--from-file", action="append", help="Load records from a local .jsonl or .csv dump (repeatable)")
+    parser.add_argument("--no-base", action="store_true", help="Skip the curated list in this file")
+    parser.add_argument("--no-generate", dest="generate", action="store_false", help="Skip Groq generation")
+    parser.add_argument("--vibes", help="Comma separated vibes to generate (default: built-in list)")
+    parser.add_argument("--count", type=int, default=8, help="Movies requested per vibe")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent Groq requests")
+    parser.add_argument("--rpm", type=float, default=30, help="Max Groq requests per minute")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Rows per bulk upsert")
+    parser.add_argument("--conflict-key", choices=["title", "tmdb_id"], default="title")
+    parser.add_argument("--update-existing", action="store_true", help="Overwrite rows that already exist instead of skipping them")
+    parser.add_argument("--checkpoint", default="seed_checkpoint.json")
+    parser.add_argument("--reset", action="store_true", help="Start over, ignoring the checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="Run the pipeline without writing to Supabase")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
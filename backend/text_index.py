@@ -0,0 +1,279 @@
+import math
+import bisect
+from functools import lru_cache
+
+import numpy as np
+
+from scoring import tokenize
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 2  # Title terms count this many times towards a movie's term frequencies
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "he", "her", "his", "in",
+    "into", "is", "it", "its", "of", "on", "or", "she", "that", "the", "their", "them", "they", "this", "to",
+    "was", "were", "who", "will", "with", "when", "where", "while", "after", "before", "about", "must",
+}
+
+_EMPTY_POSITIONS = np.zeros(0, dtype=np.int32)
+_EMPTY_TFS = np.zeros(0, dtype=np.float32)
+
+
+@lru_cache(maxsize=65536)
+def stem(token):
+    """
+    Light suffix stripping (plurals, -ed, -ing, final -e/-y), applied the same
+    way to movies and moods so "movies"/"movie" and "loved"/"love" meet.
+    """
+    if len(token) <= 3 or not token.isalpha():
+        return token
+    if token.endswith("sses"):
+        token = token[:-2]
+    elif token.endswith("ies"):
+        token = token[:-2]
+    elif token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        token = token[:-1]
+    for suffix in ("ing", "ed"):
+        stem_part = token[:-len(suffix)]
+        if token.endswith(suffix) and len(stem_part) >= 3 and any(c in "aeiouy" for c in stem_part):
+            token = stem_part
+            if token[-1] == token[-2] and token[-1] not in "lsz":
+                token = token[:-1]  # running -> run
+            break
+    if len(token) > 3 and token.endswith("y"):
+        token = token[:-1] + "i"
+    elif len(token) > 3 and token.endswith("e"):
+        token = token[:-1]
+    return token
+
+
+def analyze(text):
+    """Stemmed, stopword-free terms of `text` in order."""
+    return [stem(t) for t in tokenize(text) if t not in STOPWORDS]
+
+
+def movie_fields(movie):
+    """(title terms, all terms with title counted TITLE_WEIGHT times) for one movie row."""
+    title = analyze(movie.get('title') or '')
+    terms = title * TITLE_WEIGHT + analyze(movie.get('description') or '')
+    for tag in movie.get('mood_tags') or []:
+        terms.extend(analyze(tag))
+    return title, terms
+
+
+def _term_counts(terms):
+    counts = {}
+    for term in terms:
+        counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+class CSRPostings:
+    """
+    Read-only term -> postings mapping over CSR arrays: a sorted vocabulary
+    (list or StringTable), `ptr` offsets and one or two value arrays. Lets a
+    memory-mapped catalog store back a BM25Index without building per-term
+    dicts in every worker.
+    """
+
+    def __init__(self, vocab, ptr, *values):
+        self.vocab = vocab
+        self.ptr = ptr
+        self.values = values
+
+    def get(self, term, default=None):
+        i = bisect.bisect_left(self.vocab, term)
+        if i == len(self.vocab) or self.vocab[i] != term or self.ptr[i] == self.ptr[i + 1]:
+            return default
+        start, end = self.ptr[i], self.ptr[i + 1]
+        slices = tuple(v[start:end] for v in self.values)
+        return slices if len(slices) > 1 else slices[0]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over title, description and mood tags, addressed by catalog
+    position. Postings are per-term position/frequency arrays, so a query
+    touches only the movies that contain its terms. Instances are never
+    mutated: `with_changes` returns a new index sharing every posting list
+    the change didn't touch.
+    """
+
+    def __init__(self, postings, title_postings, doc_len, k1=BM25_K1, b=BM25_B):
+        self.postings = postings              # term -> (positions int32, term frequencies float32)
+        self.title_postings = title_postings  # term -> positions int32
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        self.size = len(doc_len)
+        self.n_docs = int(np.count_nonzero(doc_len))
+        self.avg_len = float(doc_len.sum()) / self.n_docs if self.n_docs else 1.0
+
+    @classmethod
+    def build(cls, movies, k1=BM25_K1, b=BM25_B):
+        n = len(movies)
+        vocab = {}
+        rows, term_ids, title_rows, title_ids = [], [], [], []
+        doc_len = np.zeros(n, dtype=np.float32)
+        for pos, movie in enumerate(movies):
+            title, terms = movie_fields(movie)
+            doc_len[pos] = len(terms)
+            term_ids.extend([vocab.setdefault(t, len(vocab)) for t in terms])
+            rows.extend([pos] * len(terms))
+            title_ids.extend([vocab[t] for t in title])
+            title_rows.extend([pos] * len(title))
+
+        def grouped(ids, positions):
+            # (term, position) pairs sorted by term then position, with multiplicities
+            keys, counts = np.unique(np.asarray(ids, dtype=np.int64) * max(n, 1) + np.asarray(positions, dtype=np.int64),
+                                     return_counts=True)
+            ptr = np.searchsorted(keys // max(n, 1), np.arange(len(vocab) + 1))
+            return (keys % max(n, 1)).astype(np.int32), counts.astype(np.float32), ptr
+
+        positions, tfs, ptr = grouped(term_ids, rows)
+        postings = {term: (positions[ptr[i]:ptr[i + 1]], tfs[ptr[i]:ptr[i + 1]]) for term, i in vocab.items()}
+        positions, _, ptr = grouped(title_ids, title_rows)
+        title_postings = {term: positions[ptr[i]:ptr[i + 1]] for term, i in vocab.items() if ptr[i + 1] > ptr[i]}
+        return cls(postings, title_postings, doc_len, k1, b)
+
+    def columns(self):
+        """CSR arrays of the postings over one sorted vocabulary, for a catalog store"""
+        terms = sorted(self.postings)
+        ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(self.postings[t][0]) for t in terms], out=ptr[1:])
+        title_ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        title_rows = [self.title_postings.get(t, _EMPTY_POSITIONS) for t in terms]
+        np.cumsum([len(rows) for rows in title_rows], out=title_ptr[1:])
+
+        def joined(arrays, dtype):
+            return np.concatenate(arrays).astype(dtype) if arrays else np.zeros(0, dtype=dtype)
+
+        return {
+            "bm25.vocab": terms,
+            "bm25.ptr": ptr,
+            "bm25.rows": joined([self.postings[t][0] for t in terms], np.int32),
+            "bm25.tfs": joined([self.postings[t][1] for t in terms], np.float32),
+            "bm25.title_ptr": title_ptr,
+            "bm25.title_rows": joined(title_rows, np.int32),
+            "bm25.doc_len": self.doc_len,
+        }
+
+    @classmethod
+    def from_columns(cls, columns, k1=BM25_K1, b=BM25_B):
+        """Index over `columns` (see `columns`); `with_changes` isn't available on it"""
+        vocab = columns["bm25.vocab"]
+        postings = CSRPostings(vocab, columns["bm25.ptr"], columns["bm25.rows"], columns["bm25.tfs"])
+        title_postings = CSRPostings(vocab, columns["bm25.title_ptr"], columns["bm25.title_rows"])
+        return cls(postings, title_postings, columns["bm25.doc_len"], k1, b)
+
+    def with_changes(self, changes, size):
+        """
+        New index after replacing movies in place and/or appending new ones.
+        `changes` holds (position, old_movie or None, new_movie) triples and
+        `size` is the new catalog length; cost scales with the changed movies'
+        terms, not the catalog.
+        """
+        doc_len = np.zeros(size, dtype=np.float32)
+        doc_len[:self.size] = self.doc_len
+        changed = np.asarray(sorted({pos for pos, _, _ in changes}), dtype=np.int32)
+
+        affected, affected_titles = set(), set()
+        added, added_titles = {}, {}
+        for pos, old, new in changes:
+            if old is not None:
+                old_title, old_terms = movie_fields(old)
+                affected.update(old_terms)
+                affected_titles.update(old_title)
+            title, terms = movie_fields(new)
+            doc_len[pos] = len(terms)
+            for term, count in _term_counts(terms).items():
+                added.setdefault(term, []).append((pos, count))
+            for term in set(title):
+                added_titles.setdefault(term, []).append(pos)
+        affected.update(added)
+        affected_titles.update(added_titles)
+
+        postings = dict(self.postings)
+        for term in affected:
+            rows, tfs = postings.get(term, (_EMPTY_POSITIONS, _EMPTY_TFS))
+            keep = ~np.isin(rows, changed)
+            rows, tfs = rows[keep], tfs[keep]
+            if term in added:
+                new_rows, new_tfs = zip(*added[term])
+                rows = np.concatenate([rows, np.asarray(new_rows, dtype=np.int32)])
+                tfs = np.concatenate([tfs, np.asarray(new_tfs, dtype=np.float32)])
+                order = np.argsort(rows, kind="stable")
+                rows, tfs = rows[order], tfs[order]
+            if len(rows):
+                postings[term] = (rows, tfs)
+            else:
+                postings.pop(term, None)
+
+        title_postings = dict(self.title_postings)
+        for term in affected_titles:
+            rows = title_postings.get(term, _EMPTY_POSITIONS)
+            rows = rows[~np.isin(rows, changed)]
+            if term in added_titles:
+                rows = np.sort(np.concatenate([rows, np.asarray(added_titles[term], dtype=np.int32)]))
+            if len(rows):
+                title_postings[term] = rows
+            else:
+                title_postings.pop(term, None)
+
+        return BM25Index(postings, title_postings, doc_len, self.k1, self.b)
+
+    # --- Queries ---
+
+    @staticmethod
+    def terms(text):
+        return analyze(text)
+
+    def term_scores(self, term):
+        """(positions, BM25 contributions) of one analyzed term."""
+        entry = self.postings.get(term)
+        if entry is None:
+            return _EMPTY_POSITIONS, _EMPTY_TFS
+        rows, tfs = entry
+        df = len(rows)
+        idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len[rows] / self.avg_len)
+        return rows, (idf * tfs * (self.k1 + 1) / (tfs + norm)).astype(np.float32)
+
+    def match(self, terms):
+        """
+        Dense (scores, hits) for movies containing every term: the summed BM25
+        score and a boolean mask. No terms means no hits.
+        """
+        scores = np.zeros(self.size, dtype=np.float32)
+        hits = None
+        for term in terms:
+            rows, contributions = self.term_scores(term)
+            term_hits = np.zeros(self.size, dtype=bool)
+            term_hits[rows] = True
+            scores[rows] += contributions
+            hits = term_hits if hits is None else hits & term_hits
+        if hits is None:
+            hits = np.zeros(self.size, dtype=bool)
+        return np.where(hits, scores, 0).astype(np.float32), hits
+
+    def title_hits(self, terms):
+        """Boolean mask of movies whose title contains every term."""
+        hits = None
+        for term in terms:
+            term_hits = np.zeros(self.size, dtype=bool)
+            term_hits[self.title_postings.get(term, _EMPTY_POSITIONS)] = True
+            hits = term_hits if hits is None else hits & term_hits
+        return hits if hits is not None else np.zeros(self.size, dtype=bool)
+
+    def search(self, query, k=10):
+        """Top-k (position, score) for free text, any term matching, best first."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(analyze(query)):
+            rows, contributions = self.term_scores(term)
+            scores[rows] += contributions
+        positive = np.flatnonzero(scores > 0)
+        if len(positive) > k:
+            positive = positive[np.argpartition(-scores[positive], k - 1)[:k]]
+        order = positive[np.lexsort((positive, -scores[positive]))]
+        return [(int(pos), float(scores[pos])) for pos in order]
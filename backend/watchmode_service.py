@@ -1,46 +1,190 @@
 import os
+import time
+import asyncio
+from collections import OrderedDict
+
 import httpx
 from dotenv import load_dotenv
 
+from metrics import upstream_call, fallback
+from resilience import BREAKERS, CircuitOpenError, STREAMING_TIMEOUT_SECONDS
+
 load_dotenv()
 
 WATCHMODE_API_KEY = os.environ.get("WATCHMODE_API_KEY")
+WATCHMODE_BASE_URL = os.environ.get("WATCHMODE_BASE_URL", "https://api.watchmode.com/v1")
+WATCHMODE_MAX_CONCURRENCY = int(os.environ.get("WATCHMODE_MAX_CONCURRENCY", "8"))
+WATCHMODE_ID_TTL = float(os.environ.get("WATCHMODE_ID_TTL", str(30 * 24 * 3600)))
+WATCHMODE_SOURCES_TTL = float(os.environ.get("WATCHMODE_SOURCES_TTL", str(6 * 3600)))
+WATCHMODE_NEGATIVE_TTL = float(os.environ.get("WATCHMODE_NEGATIVE_TTL", "3600"))
+WATCHMODE_CACHE_SIZE = 10000
+
+NOT_FOUND = object()  # Cached "Watchmode has no such title"
+
+
+class TTLCache:
+    """Bounded dict whose entries expire after a per-entry TTL."""
+
+    def __init__(self, max_size=WATCHMODE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value, ttl):
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
 
-async def get_streaming_info(title):
+class WatchmodeService:
     """
-    Finds streaming availability for a movie title.
-    Returns a string like 'Netflix, Prime Video' or None.
+    Long-lived Watchmode client.
+    One pooled httpx client is shared by all lookups, title -> watchmode_id and
+    id -> sources are cached (misses included), and a semaphore bounds how many
+    upstream calls run at once. Freshly resolved ids are handed to `id_writer`
+    so they can be stored on the movie and the search call skipped for good;
+    it returns how many rows took the id.
     """
-    if not WATCHMODE_API_KEY:
-        return None
 
-    try:
-        async with httpx.AsyncClient() as client:
-            # 1. Search for titles
-            search_url = f"https://api.watchmode.com/v1/search/?apiKey={WATCHMODE_API_KEY}&search_field=name&search_value={title}&types=movie"
-            search_res = await client.get(search_url)
-            search_data = search_res.json()
+    def __init__(self, api_key=WATCHMODE_API_KEY, base_url=WATCHMODE_BASE_URL,
+                 max_concurrency=WATCHMODE_MAX_CONCURRENCY, id_writer=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.id_writer = id_writer
+        self.ids = TTLCache()
+        self.sources = TTLCache()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+        self._writes = set()
+        self.upstream_calls = 0
+        self.cache_hits = 0
+        self.ids_stored = 0
+        self.id_write_misses = 0
+        self.id_write_errors = 0
 
-            if not search_data.get("title_results"):
-                return None
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(STREAMING_TIMEOUT_SECONDS),
+                limits=httpx.Limits(max_connections=WATCHMODE_MAX_CONCURRENCY * 2, max_keepalive_connections=WATCHMODE_MAX_CONCURRENCY),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get(self, operation, path, **params):
+        async with self._semaphore:
+            self.upstream_calls += 1
+            with BREAKERS["watchmode"].guard(), upstream_call("watchmode", operation):
+                res = await self.client.get(f"{self.base_url}{path}", params={"apiKey": self.api_key, **params})
+                res.raise_for_status()
+                return res.json()
+
+    async def resolve_id(self, title):
+        """Watchmode title id for `title`, or None if Watchmode doesn't know it."""
+        cached = self.ids.get(title)
+        if cached is not None:
+            self.cache_hits += 1
+            return None if cached is NOT_FOUND else cached
+
+        search_data = await self._get("search", "/search/", search_field="name", search_value=title, types="movie")
+        if not search_data.get("title_results"):
+            self.ids.put(title, NOT_FOUND, WATCHMODE_NEGATIVE_TTL)
+            return None
+
+        # Get first result ID
+        title_id = search_data["title_results"][0]["id"]
+        self.ids.put(title, title_id, WATCHMODE_ID_TTL)
+        if self.id_writer:
+            task = asyncio.create_task(self._write_id(title, title_id))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+        return title_id
+
+    async def _write_id(self, title, title_id):
+        try:
+            stored = await self.id_writer(title, title_id)
+        except Exception as e:
+            self.id_write_errors += 1
+            print(f"Could not store watchmode_id for {title}: {e}")
+            return
+        if stored:
+            self.ids_stored += 1
+            return
+        # No row updated: the key may not update movies (RLS), or another worker stored it first
+        self.id_write_misses += 1
+        fallback("watchmode_id_not_stored")
+        if self.id_write_misses == 1:
+            print(f"watchmode_id for {title} updated no rows; storing ids needs a key allowed to "
+                  f"update movies (the service role key)")
+
+    async def get_sources(self, title_id):
+        """'Netflix, Prime Video' style summary of subscription sources."""
+        title_id = str(title_id)  # Stored ids come back from the DB as text
+        cached = self.sources.get(title_id)
+        if cached is not None:
+            self.cache_hits += 1
+            return None if cached is NOT_FOUND else cached
+
+        sources_data = await self._get("sources", f"/title/{title_id}/sources/")
+        if not sources_data:
+            self.sources.put(title_id, NOT_FOUND, WATCHMODE_NEGATIVE_TTL)
+            return None
 
-            # Get first result ID
-            title_id = search_data["title_results"][0]["id"]
+        # Extract unique source names
+        names = list(set([s["name"] for s in sources_data if s["type"] == "sub"]))
+        summary = ", ".join(names[:3]) if names else "Not Streaming"  # Return top 3
+        self.sources.put(title_id, summary, WATCHMODE_SOURCES_TTL)
+        return summary
 
-            # 2. Get sources
-            sources_url = f"https://api.watchmode.com/v1/title/{title_id}/sources/?apiKey={WATCHMODE_API_KEY}"
-            sources_res = await client.get(sources_url)
-            sources_data = sources_res.json()
+    async def get_streaming_info(self, title, watchmode_id=None):
+        """
+        Finds streaming availability for a movie title.
+        Returns a string like 'Netflix, Prime Video' or None.
+        Pass the stored `watchmode_id` when the movie already has one.
+        """
+        if not self.api_key:
+            return None
 
-            if not sources_data:
+        try:
+            title_id = watchmode_id or await self.resolve_id(title)
+            if not title_id:
                 return None
+            return await self.get_sources(title_id)
+        except CircuitOpenError:
+            fallback("watchmode_circuit_open")
+            return None
+        except Exception as e:
+            print(f"Watchmode Error for {title}: {e}")
+            fallback("watchmode_error")
+            return None
 
-            # Extract unique source names
-            names = list(set([s["name"] for s in sources_data if s["type"] == "sub"]))
-            if not names:
-                return "Not Streaming"
-            
-            return ", ".join(names[:3]) # Return top 3
-    except Exception as e:
-        print(f"Watchmode Error for {title}: {e}")
-        return None
+    def stats(self):
+        return {
+            "upstream_calls": self.upstream_calls,
+            "cache_hits": self.cache_hits,
+            "cached_ids": len(self.ids),
+            "cached_sources": len(self.sources),
+            "ids_stored": self.ids_stored,
+            "id_write_misses": self.id_write_misses,
+            "id_write_errors": self.id_write_errors,
+        }
@@ -1,5 +1,4 @@
 import React, { useState } from 'react';
-import axios from 'axios';
 import { motion } from 'framer-motion';
 import { Search, Sparkles } from 'lucide-react';
 import { Link, useNavigate } from 'react-router-dom';
@@ -49,22 +48,47 @@ const VibePage = () => {
             const { data: { session } } = await supabase.auth.getSession();
             const token = session?.access_token;
 
-            const response = await axios.post(`${API_URL}/recommend`,
-                { mood },
-                {
-                    headers: {
-                        'Authorization': `Bearer ${token}`
-                    }
+            // Stream results: ranked movies arrive first, streaming info is patched in as it resolves
+            const response = await fetch(`${API_URL}/recommend/stream`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': `Bearer ${token}`
+                },
+                body: JSON.stringify({ mood })
+            });
+            if (!response.ok || !response.body) {
+                throw new Error(`Request failed with status ${response.status}`);
+            }
+
+            const handleEvent = (event) => {
+                if (event.type === 'results') {
+                    setMovies(event.movies || []);
+                    setMatchType(event.match_type);
+                    setNewlyGenerated(event.generated_new);
+                    setTargetGenre(event.target_genre);
+                    setLoading(false);
+                } else if (event.type === 'ott') {
+                    setMovies(prev => prev.map((movie, index) => (
+                        index === event.index ? { ...movie, ott: event.ott } : movie
+                    )));
+                } else if (event.type === 'error') {
+                    setMovies([]);
                 }
-            );
-            if (response.data.movies) {
-                setMovies(response.data.movies);
-                setMatchType(response.data.match_type);
-                setNewlyGenerated(response.data.generated_new);
-                setTargetGenre(response.data.target_genre);
-            } else {
-                setMovies([])
+            };
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let chunk = await reader.read();
+            while (!chunk.done) {
+                buffer += decoder.decode(chunk.value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
+                chunk = await reader.read();
             }
+            if (buffer.trim()) handleEvent(JSON.parse(buffer));
             setLoading(false);
 
         } catch (error) {
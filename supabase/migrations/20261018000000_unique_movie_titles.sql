@@ -0,0 +1,3 @@
+-- Allow bulk upserts keyed on title (backend/seed.py --conflict-key title).
+-- Existing duplicate titles must be removed before this index can be built.
+CREATE UNIQUE INDEX IF NOT EXISTS movies_title_key ON public.movies (title);
@@ -0,0 +1,187 @@
+-- Columns the backend reads and seed.py writes
+ALTER TABLE public.movies ADD COLUMN IF NOT EXISTS genre TEXT;
+ALTER TABLE public.movies ADD COLUMN IF NOT EXISTS languages TEXT[];
+ALTER TABLE public.movies ADD COLUMN IF NOT EXISTS original_language TEXT;
+ALTER TABLE public.movies ADD COLUMN IF NOT EXISTS mood_tags TEXT[];
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Lowercases every element; immutable so it can back generated columns
+CREATE OR REPLACE FUNCTION public.lower_array(items TEXT[])
+RETURNS TEXT[] AS $$
+  SELECT coalesce(array_agg(lower(item)), '{}') FROM unnest(items) AS item;
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+-- Lowercased search fields, kept in sync by Postgres (same rules as backend/catalog_service.py CatalogEntry)
+ALTER TABLE public.movies ADD COLUMN IF NOT EXISTS search_features TEXT[]
+  GENERATED ALWAYS AS (public.lower_array(array_remove(ARRAY[nullif(genre, '')], NULL) || coalesce(mood_tags, '{}'))) STORED;
+ALTER TABLE public.movies ADD COLUMN IF NOT EXISTS search_languages TEXT[]
+  GENERATED ALWAYS AS (public.lower_array(coalesce(languages, '{}'))) STORED;
+ALTER TABLE public.movies ADD COLUMN IF NOT EXISTS search_text TEXT
+  GENERATED ALWAYS AS (lower(title || ' ' || coalesce(description, '') || ' ' || coalesce(genre, ''))) STORED;
+ALTER TABLE public.movies ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+  GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS movies_mood_tags_idx ON public.movies USING GIN (mood_tags);
+CREATE INDEX IF NOT EXISTS movies_languages_idx ON public.movies USING GIN (languages);
+CREATE INDEX IF NOT EXISTS movies_search_features_idx ON public.movies USING GIN (search_features);
+CREATE INDEX IF NOT EXISTS movies_search_languages_idx ON public.movies USING GIN (search_languages);
+CREATE INDEX IF NOT EXISTS movies_search_vector_idx ON public.movies USING GIN (search_vector);
+-- Keyword and genre matches are substring matches, which trigram indexes can answer
+CREATE INDEX IF NOT EXISTS movies_search_text_trgm_idx ON public.movies USING GIN (search_text gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS movies_genre_trgm_idx ON public.movies USING GIN (lower(coalesce(genre, '')) gin_trgm_ops);
+
+-- Top-k recommendations for one parsed mood, scored like backend/scoring.py:
+-- per keyword +7 mood tag/genre, else +5 title, else +2 title/description/genre text;
+-- +10 genre match; +5 spoken language (+50 if it is the original language);
+-- -100 for movies in a different language when a language is requested.
+-- Only rows matching some keyword, the genre or the language are scored,
+-- each condition is an indexed lookup, and duplicate titles keep their best row.
+CREATE OR REPLACE FUNCTION public.rank_movies(
+  keywords TEXT[] DEFAULT '{}',
+  target_genre TEXT DEFAULT NULL,
+  target_language TEXT DEFAULT NULL,
+  limit_count INTEGER DEFAULT 10
+)
+RETURNS TABLE (score INTEGER, movie JSONB) AS $$
+DECLARE
+  kws TEXT[] := ARRAY(SELECT lower(k) FROM unnest(coalesce(keywords, '{}')) AS k WHERE k IS NOT NULL);
+  patterns TEXT[];
+  genre_pattern TEXT;
+  tg TEXT := nullif(nullif(lower(target_genre), 'general'), '');
+  tl TEXT := nullif(nullif(lower(target_language), 'any'), '');
+  triggers CONSTANT TEXT[] := ARRAY['bollywood', 'tollywood', 'hindi', 'telugu', 'tamil', 'kannada',
+                                    'malayalam', 'korean', 'japanese', 'spanish', 'french'];
+  conditions TEXT[] := '{}';
+BEGIN
+  -- LIKE patterns with the keyword's own wildcards escaped
+  patterns := ARRAY(
+    SELECT '%' || replace(replace(replace(k, '\', '\\'), '%', '\%'), '_', '\_') || '%' FROM unnest(kws) AS k
+  );
+  genre_pattern := '%' || replace(replace(replace(tg, '\', '\\'), '%', '\%'), '_', '\_') || '%';
+
+  -- One OR branch per condition (not LIKE ANY) so each can use its index
+  IF cardinality(kws) > 0 THEN
+    conditions := conditions || 'm.search_features && $1'::TEXT;
+    FOR i IN 1 .. cardinality(patterns) LOOP
+      conditions := conditions || format('m.search_text LIKE $2[%s]', i);
+    END LOOP;
+  END IF;
+  IF tg IS NOT NULL THEN
+    conditions := conditions || 'lower(coalesce(m.genre, '''')) LIKE $7'::TEXT;
+  END IF;
+  IF tl IS NOT NULL THEN
+    conditions := conditions || 'm.search_languages @> ARRAY[$4]'::TEXT;
+  END IF;
+  IF cardinality(conditions) = 0 THEN
+    RETURN;
+  END IF;
+
+  RETURN QUERY EXECUTE format($q$
+    WITH candidates AS (
+      SELECT m.*,
+        (SELECT coalesce(sum(CASE
+            WHEN k = ANY(m.search_features) THEN 7
+            WHEN strpos(lower(m.title), k) > 0 THEN 5
+            WHEN strpos(m.search_text, k) > 0 THEN 2
+            ELSE 0 END), 0)::INTEGER
+         FROM unnest($1) AS k)
+        + CASE WHEN $3 IS NOT NULL AND strpos(lower(coalesce(m.genre, '')), $3) > 0 THEN 10 ELSE 0 END
+        AS base_score
+      FROM public.movies m
+      WHERE %s
+    ),
+    scored AS (
+      SELECT c.*,
+        CASE
+          WHEN $4 IS NULL THEN c.base_score
+          WHEN $4 = 'english' THEN CASE
+            WHEN 'english' = ANY(c.search_languages) THEN c.base_score + 5
+            WHEN cardinality(c.search_languages) > 0 THEN -100
+            WHEN EXISTS (SELECT 1 FROM unnest($5) AS t WHERE strpos(c.search_text, t) > 0) THEN -100
+            ELSE c.base_score END
+          WHEN $4 = ANY(c.search_languages) THEN
+            c.base_score + CASE WHEN $4 = lower(coalesce(c.original_language, '')) THEN 50 ELSE 5 END
+          WHEN $4 = ANY($5) AND cardinality(c.search_languages) > 0 THEN -100
+          ELSE c.base_score
+        END AS final_score
+      FROM candidates c
+    ),
+    best_per_title AS (
+      SELECT DISTINCT ON (s.title) s.*
+      FROM scored s
+      WHERE s.final_score > 0
+      ORDER BY s.title, s.final_score DESC, s.id
+    )
+    SELECT b.final_score,
+           to_jsonb(b) - 'base_score' - 'final_score' - 'search_features' - 'search_languages'
+                       - 'search_text' - 'search_vector'
+    FROM best_per_title b
+    -- Equal scores: better full-text relevance first, then catalog order
+    ORDER BY b.final_score DESC,
+             ts_rank(b.search_vector, to_tsquery('simple', array_to_string(ARRAY(
+               SELECT quote_literal(w) FROM unnest(tsvector_to_array(to_tsvector('simple', array_to_string($1, ' ')))) AS w
+             ), ' | '))) DESC,
+             b.id
+    LIMIT $6
+  $q$, array_to_string(conditions, ' OR '))
+  USING kws, patterns, tg, tl, triggers, limit_count, genre_pattern;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- When a row's content last changed. Unlike updated_at it ignores bookkeeping writes
+-- (watchmode_id write-backs; same rule as backend/catalog_service.py BOOKKEEPING_COLUMNS)
+ALTER TABLE public.movies ADD COLUMN IF NOT EXISTS content_updated_at TIMESTAMPTZ DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION public.touch_movie_content()
+RETURNS TRIGGER AS $$
+DECLARE
+  -- Generated search_* columns aren't computed yet in a BEFORE trigger; they follow the others anyway
+  ignored CONSTANT TEXT[] := ARRAY['updated_at', 'watchmode_id', 'content_updated_at', 'search_features',
+                                   'search_languages', 'search_text', 'search_vector'];
+BEGIN
+  IF (to_jsonb(NEW) - ignored) IS DISTINCT FROM (to_jsonb(OLD) - ignored) THEN
+    NEW.content_updated_at = NOW();
+  ELSE
+    NEW.content_updated_at = OLD.content_updated_at;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS touch_movies_content ON public.movies;
+CREATE TRIGGER touch_movies_content
+BEFORE UPDATE ON public.movies
+FOR EACH ROW EXECUTE FUNCTION public.touch_movie_content();
+
+-- Totals, genre counts, languages, sample titles and mood tags for /database-info,
+-- recommendation fallbacks and the local intent parser, without shipping the table to the app
+CREATE OR REPLACE FUNCTION public.catalog_summary()
+RETURNS JSONB AS $$
+  SELECT jsonb_build_object(
+    'total_movies', (SELECT count(*) FROM public.movies),
+    'genres', (
+      SELECT coalesce(jsonb_object_agg(coalesce(genre, 'Unknown'), n), '{}')
+      FROM (SELECT genre, count(*) AS n FROM public.movies GROUP BY genre) AS g
+    ),
+    'languages', (
+      SELECT coalesce(jsonb_agg(l ORDER BY l), '[]')
+      FROM (SELECT DISTINCT unnest(languages) AS l FROM public.movies) AS x
+    ),
+    'sample_movies', (
+      SELECT coalesce(jsonb_agg(title), '[]')
+      FROM (SELECT title FROM public.movies ORDER BY id LIMIT 10) AS s
+    ),
+    -- Vocabulary of the backend's on-box intent parser
+    'mood_tags', (
+      SELECT coalesce(jsonb_agg(t ORDER BY t), '[]')
+      FROM (SELECT DISTINCT unnest(mood_tags) AS t FROM public.movies) AS m
+    ),
+    -- Moves with any content edit (not watchmode_id write-backs), so the backend knows cached
+    -- rankings may be stale
+    'last_updated', (SELECT max(content_updated_at) FROM public.movies)
+  );
+$$ LANGUAGE sql STABLE;